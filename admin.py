@@ -1,25 +1,46 @@
 import os
-import requests
-import jwt  # pip install pyjwt
-from fastapi import APIRouter, Depends, HTTPException, Header, status
-from pydantic import BaseModel
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
+from auth import (
+    get_org_memberships,
+    membership_resolver,
+    verify_session_token,
+    MembershipLookupError,
+    TokenVerificationError,
+)
+from clerk import clerk
+from clerk_organizations import organization_directory, OrganizationListError
+from provisioning import (
+    create_organization,
+    membership_payload,
+    parse_members_csv,
+    provision_members,
+    user_payload,
+    validate_members,
+)
+from serialization import dumps
+from status_writer import status_writer
+from alert_queue import alert_queue
 
 # load_dotenv()
 
 router = APIRouter(prefix="/admin", tags=["Admin API"])
 
-# Use secure environment variable practices in production.
-CLERK_API_KEY = os.getenv("CLERK_API_KEY", os.getenv("CLERK_API_KEY"))
-CLERK_API_URL = os.getenv("CLERK_API_URL", "https://api.clerk.dev/v1")
+# Id (not name or slug, which can change or repeat) of the Clerk organization whose members are admins
+ADMIN_ORG_ID = os.getenv("ADMIN_ORG_ID", "")
+if not ADMIN_ORG_ID:
+    print("ADMIN_ORG_ID is not set: the admin API refuses every request")
 
-def verify_admin(authorization: str = Header(...)):
+async def verify_admin(authorization: str = Header(...)):
     """
     Dependency that:
     1. Extracts the Clerk token from the Authorization header.
-    2. Decodes the token (for demo purposes, signature verification is disabled).
-    3. Fetches the user's organization memberships from Clerk API.
-    4. Checks that the user is a member of an organization with name "status24".
+    2. Verifies the token signature locally against Clerk's JWKS.
+    3. Uses the token's org claims, or fetches the user's organization memberships from Clerk API.
+    4. Checks that the user is a member of the organization ADMIN_ORG_ID.
     """
     if not authorization:
         raise HTTPException(
@@ -34,12 +55,11 @@ def verify_admin(authorization: str = Header(...)):
         )
     token = parts[1]
     try:
-        # WARNING: Disable signature verification only for demonstration.
-        decoded_token = jwt.decode(token, options={"verify_signature": False})
-    except Exception as e:
+        decoded_token = await verify_session_token(token)
+    except TokenVerificationError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Token decode failed: {str(e)}"
+            detail=f"Token verification failed: {str(e)}"
         )
     user_id = decoded_token.get("sub")
     if not user_id:
@@ -48,29 +68,35 @@ def verify_admin(authorization: str = Header(...)):
             detail="User ID not found in token"
         )
 
-    # Fetch the user's organization memberships from Clerk.
-    clerk_resp = requests.get(
-        f"{CLERK_API_URL}/users/{user_id}/organization_memberships",
-        headers={"Authorization": f"Bearer {CLERK_API_KEY}"}
-    )
-    if clerk_resp.status_code != 200:
+    if not ADMIN_ORG_ID:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access is not configured (ADMIN_ORG_ID)."
+        )
+
+    # Active org in the token is the admin org: no need to ask Clerk.
+    if decoded_token.get("org_id") == ADMIN_ORG_ID:
+        return user_id
+
+    # Fetch the user's organization memberships (cached, shared resolver).
+    try:
+        org_memberships = await get_org_memberships(user_id)
+    except MembershipLookupError:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Failed to fetch user organization memberships from Clerk"
         )
-    # Expecting a payload with a "data" key containing org memberships.
-    org_memberships = clerk_resp.json().get("data", [])
     authorized = False
     for membership in org_memberships:
         org = membership.get("organization")
-        if org and org.get("name") == "status24":
+        if org and org.get("id") == ADMIN_ORG_ID:
             authorized = True
             break
 
     if not authorized:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="User is not authorized. Admin access required (org must be status24)."
+            detail="User is not authorized. Admin access required (member of the admin organization)."
         )
     # If authorized, return the user_id for further use.
     return user_id
@@ -90,30 +116,25 @@ class AddUserToOrgRequest(BaseModel):
     email: str
     name: str
 
+class ProvisionMember(BaseModel):
+    email: str
+    name: str
+    role: Optional[str] = None
+
+class ProvisionRequest(BaseModel):
+    orgId: Optional[str] = None
+    orgName: Optional[str] = None
+    members: list[ProvisionMember]
+
 # ---------------------------
 # Admin Endpoints Using Clerk API
 # ---------------------------
 @router.post("/create-user")
-def create_user(payload: CreateUserRequest, user_id: str = Depends(verify_admin)):
+async def create_user(payload: CreateUserRequest, user_id: str = Depends(verify_admin)):
     """
     Create a new user in the status24 organization using Clerk's API.
     """
-    # Example payload: adjust based on Clerk API documentation.
-    clerk_api_payload = {
-        "email_address": payload.email,
-        # Split the name into first and last if possible.
-        "first_name": payload.name.split()[0],
-        "last_name": payload.name.split()[1] if len(payload.name.split()) > 1 else "",
-        "public_metadata": {"organization": "status24"}
-    }
-    clerk_resp = requests.post(
-        f"{CLERK_API_URL}/users",
-        headers={
-            "Authorization": f"Bearer {CLERK_API_KEY}",
-            "Content-Type": "application/json"
-        },
-        json=clerk_api_payload
-    )
+    clerk_resp = await clerk.post("/users", json=user_payload(payload.email, payload.name))
     if clerk_resp.status_code < 200 or clerk_resp.status_code >= 300:
         raise HTTPException(
             status_code=clerk_resp.status_code,
@@ -122,47 +143,29 @@ def create_user(payload: CreateUserRequest, user_id: str = Depends(verify_admin)
     return clerk_resp.json()
 
 @router.post("/create-org")
-def create_org(payload: CreateOrgRequest, user_id: str = Depends(verify_admin)):
+async def create_org(payload: CreateOrgRequest, user_id: str = Depends(verify_admin)):
     """
     Create a new organization using Clerk's API.
     """
     clerk_api_payload = {
         "name": payload.orgName,
     }
-    clerk_resp = requests.post(
-        f"{CLERK_API_URL}/organizations",
-        headers={
-            "Authorization": f"Bearer {CLERK_API_KEY}",
-            "Content-Type": "application/json"
-        },
-        json=clerk_api_payload
-    )
+    clerk_resp = await clerk.post("/organizations", json=clerk_api_payload)
     if clerk_resp.status_code < 200 or clerk_resp.status_code >= 300:
         raise HTTPException(
             status_code=clerk_resp.status_code,
             detail=f"Error creating organization: {clerk_resp.text}"
         )
+    organization_directory.add(clerk_resp.json())
     return clerk_resp.json()
 
 @router.post("/add-user-to-org")
-def add_user_to_org(payload: AddUserToOrgRequest, user_id: str = Depends(verify_admin)):
+async def add_user_to_org(payload: AddUserToOrgRequest, user_id: str = Depends(verify_admin)):
     """
     Add a user to a specific organization using Clerk's API.
     """
-    # Example payload for adding a user to an organization.
-    # Adjust the payload keys as per Clerk's current API spec.
-    clerk_api_payload = {
-        "email_address": payload.email,
-        "organization_id": payload.orgId,
-        "public_metadata": {"full_name": payload.name}
-    }
-    clerk_resp = requests.post(
-        f"{CLERK_API_URL}/organization_memberships",
-        headers={
-            "Authorization": f"Bearer {CLERK_API_KEY}",
-            "Content-Type": "application/json"
-        },
-        json=clerk_api_payload
+    clerk_resp = await clerk.post(
+        "/organization_memberships", json=membership_payload(payload.orgId, payload.email, payload.name)
     )
     if clerk_resp.status_code < 200 or clerk_resp.status_code >= 300:
         raise HTTPException(
@@ -171,25 +174,100 @@ def add_user_to_org(payload: AddUserToOrgRequest, user_id: str = Depends(verify_
         )
     return clerk_resp.json()
 
+@router.post("/provision")
+async def provision(request: Request, orgId: Optional[str] = None, orgName: Optional[str] = None,
+                    user_id: str = Depends(verify_admin)):
+    """
+    Onboard an organization in one call: create it (orgName) or use an
+    existing one (orgId), then create and add every member concurrently.
+    Takes JSON ({"orgId" | "orgName", "members": [{"email", "name", "role"}]})
+    or a text/csv body with an email,name[,role] header and orgId/orgName
+    query parameters. Streams newline-delimited JSON: the organization, one
+    line per member as it completes, then a summary.
+    """
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            members = parse_members_csv((await request.body()).decode("utf-8"))
+        else:
+            payload = ProvisionRequest.model_validate_json(await request.body())
+            orgId, orgName = payload.orgId or orgId, payload.orgName or orgName
+            members = [member.model_dump() for member in payload.members]
+        if bool(orgId) == bool(orgName):
+            raise ValueError("Pass either orgId or orgName")
+        validate_members(members)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False)
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    if orgName:
+        try:
+            organization = await create_organization(orgName)
+            organization_directory.add(organization)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=str(e)
+            )
+    else:
+        organization = {"id": orgId}
+
+    async def stream():
+        yield dumps({"type": "organization", **organization}) + b"\n"
+        async for result in provision_members(organization["id"], members):
+            yield dumps(result) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @router.get("/organizations")
-def list_organizations(user_id: str = Depends(verify_admin)):
+async def list_organizations(
+    q: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    user_id: str = Depends(verify_admin),
+):
     """
-    Fetch a list of organizations from Clerk to populate the select element.
-    Returns a simplified list of organizations with id and name.
+    Fetch the organizations from Clerk to populate the select element: every
+    page, merged and cached for a short while. `q` keeps organizations whose
+    name contains it or whose id or slug starts with it (case-insensitive);
+    `limit` caps how many are returned. `total` counts all matches.
     """
-    clerk_resp = requests.get(
-        f"{CLERK_API_URL}/organizations",
-        headers={
-            "Authorization": f"Bearer {CLERK_API_KEY}"
-        }
-    )
-    if clerk_resp.status_code != 200:
+    try:
+        organizations, total = await organization_directory.search(q, limit)
+    except OrganizationListError as e:
         raise HTTPException(
-            status_code=clerk_resp.status_code,
-            detail="Error fetching organizations from Clerk"
+            status_code=e.status_code,
+            detail=str(e)
         )
-    # Assume Clerk API returns { "data": [ { "id": "...", "name": "..." }, ... ] }
-    orgs_data = clerk_resp.json().get("data", [])
-    # Simplify the list for frontend usage
-    organizations = [{"id": org.get("id"), "name": org.get("name")} for org in orgs_data]
-    return {"organizations": organizations} 
\ No newline at end of file
+    return {"organizations": organizations, "total": total}
+
+@router.get("/auth-cache")
+async def auth_cache_stats(user_id: str = Depends(verify_admin)):
+    """
+    Report hit/miss counters for the shared Clerk membership cache, the
+    state of the Clerk circuit breaker and the cached organization list.
+    """
+    return {
+        **membership_resolver.stats(),
+        "clerk_circuit": clerk.breaker.stats(),
+        "clerk_organizations": organization_directory.stats(),
+    }
+
+@router.get("/webhook-queue")
+async def webhook_queue_stats(user_id: str = Depends(verify_admin)):
+    """
+    Report depth, deduplication, retries and batch latency of the alert queue.
+    """
+    return alert_queue.stats()
+
+@router.get("/status-writer")
+async def status_writer_stats(user_id: str = Depends(verify_admin)):
+    """
+    Report queue depth, coalescing and flush latency of the status writer.
+    """
+    return status_writer.stats()
@@ -0,0 +1,315 @@
+"""
+In-process queue applying monitoring alerts received by /webhooks.
+
+The webhook endpoint only parses and enqueues, so senders get their 202
+in milliseconds whatever the store is doing. One worker drains the queue
+in batches of up to WEBHOOK_BATCH_SIZE alerts; a batch reads each
+organization once, writes all of its service status changes in one commit
+and opens or resolves the matching incidents, all through org.py's write
+helpers. A service takes the worst status of the alerts still open on it,
+stored or in the batch, and is operational again once none are; each alert
+incident keeps the status its alert asked for in alertServiceStatus.
+
+An alert is identified by its organization, fingerprint, status and start
+time. An alert already queued, or applied within WEBHOOK_DEDUPE_TTL
+seconds, is counted as a duplicate and not queued again. Generic events
+often carry no start time; for those only a change of status (firing after
+resolved, or the reverse) is queued, and a firing after its incident was
+resolved reopens that incident. A request's
+Idempotency-Key is remembered once all of its alerts are applied, and
+forgotten if they are dropped, so a sender retrying a failed delivery is
+not turned away; a repeat while they are queued is a duplicate. A batch that fails is retried with backoff up to
+WEBHOOK_MAX_ATTEMPTS times, and shutdown drains the queue. When
+WEBHOOK_QUEUE_SIZE alerts are waiting, new requests are refused so senders
+retry later instead of the process buffering without bound.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from cachetools import TTLCache
+
+import metrics
+import store
+from org import commit_service_statuses, open_incident, post_incident_update
+from status_page import ACTIVE_INCIDENT_STATUSES, SERVICE_STATUS_SEVERITY
+
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "200"))
+WEBHOOK_DEDUPE_TTL = float(os.getenv("WEBHOOK_DEDUPE_TTL", "3600"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_RETRY_BACKOFF = float(os.getenv("WEBHOOK_RETRY_BACKOFF", "1"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+
+
+class QueueFull(Exception):
+    pass
+
+
+def incident_id(alert: dict) -> str:
+    """
+    The same firing of an alert always maps to the same incident; without a
+    start time, every firing of a fingerprint shares one.
+    """
+    digest = hashlib.sha256(f"{alert['fingerprint']}|{alert['starts_at']}".encode()).hexdigest()
+    return "alert_" + digest[:20]
+
+
+def alert_key(org_id: str, alert: dict) -> Optional[tuple]:
+    """Dedupe key of an alert; None without a start time, when only status changes tell firings apart."""
+    if not alert["starts_at"]:
+        return None
+    return (org_id, alert["fingerprint"], alert["status"], alert["starts_at"])
+
+
+async def open_alert_statuses(org_id: str, service_id: str) -> dict:
+    """{incident id: service status} of the alert incidents still open on a service."""
+    statuses, cursor = {}, None
+    while True:
+        incidents, cursor = await store.list_incidents(
+            org_id, status=ACTIVE_INCIDENT_STATUSES, service_id=service_id, limit=100, cursor=cursor)
+        for incident in incidents:
+            if incident.get("alertServiceStatus"):
+                statuses[incident["id"]] = incident["alertServiceStatus"]
+        if cursor is None:
+            return statuses
+
+
+async def apply_alerts(org_id: str, alerts: list):
+    """
+    Apply one organization's alerts, in arrival order: set the status of the
+    services they name (by id or name) from the alerts left open on them,
+    open an incident per firing alert and resolve it when the alert
+    resolves. Safe to run again for the same alerts.
+    """
+    org_data = await store.get_organization(org_id)
+    services = (org_data or {}).get("services", {})
+    # Alert labels usually carry the service's name rather than its id
+    by_name = {(service.get("name") or "").lower(): service_id for service_id, service in services.items()}
+
+    def service_of(alert: dict):
+        if not alert["service_id"] or alert["service_id"] in services:
+            return alert["service_id"]
+        return by_name.get(alert["service_id"].lower())
+
+    # Another alert may still be firing on a service one of these resolves
+    open_alerts = {}
+    for alert in alerts:
+        service_id = service_of(alert)
+        if not service_id or not alert["service_status"]:
+            continue
+        if service_id not in open_alerts:
+            open_alerts[service_id] = await open_alert_statuses(org_id, service_id)
+        if alert["status"] == "firing":
+            open_alerts[service_id][incident_id(alert)] = alert["service_status"]
+        else:
+            open_alerts[service_id].pop(incident_id(alert), None)
+    statuses = {
+        service_id: min(firing.values(), key=SERVICE_STATUS_SEVERITY.index) if firing else "operational"
+        for service_id, firing in open_alerts.items()
+    }
+    changes = [
+        (service_id, new_status, services[service_id])
+        for service_id, new_status in statuses.items()
+        if services[service_id].get("status") != new_status
+    ]
+    if changes:
+        await commit_service_statuses(org_id, changes)
+
+    for alert in alerts:
+        affected = [service_of(alert)] if service_of(alert) else []
+        existing = await store.get_incident(org_id, incident_id(alert))
+        if alert["status"] == "firing" and existing is None:
+            await open_incident(org_id, alert["title"], alert["description"], "investigating",
+                                alert["started"], affected, incident_id=incident_id(alert),
+                                extra={"alertServiceStatus": alert["service_status"]})
+        elif alert["status"] == "firing" and existing.get("status") == "resolved":
+            # Fired again: the service status above counts it as open, so must the incident
+            await post_incident_update(org_id, incident_id(alert), "investigating",
+                                       alert["description"] or f"{alert['title']} is firing again.")
+        elif alert["status"] == "resolved" and existing is not None and existing.get("status") != "resolved":
+            await post_incident_update(org_id, incident_id(alert), "resolved",
+                                       alert["description"] or f"{alert['title']} has been resolved.")
+
+
+class AlertQueue:
+    def __init__(self, maxsize: int = WEBHOOK_QUEUE_SIZE, batch_size: int = WEBHOOK_BATCH_SIZE,
+                 dedupe_ttl: float = WEBHOOK_DEDUPE_TTL, max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+                 retry_backoff: float = WEBHOOK_RETRY_BACKOFF):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        # [org_id, alert, attempts, request]; request is the Idempotency-Key marker or None
+        self._items = deque()
+        # Keys of alerts queued, being applied or waiting for a retry
+        self._keys = set()
+        # Idempotency-Key marker -> number of its request's alerts not applied yet
+        self._requests = {}
+        # Keys of alerts applied, and Idempotency-Keys fully applied, recently
+        self._seen = TTLCache(maxsize=max(maxsize * 10, 1000), ttl=dedupe_ttl)
+        # (org_id, fingerprint) -> status last queued, for alerts without a start time
+        self._last_status = TTLCache(maxsize=max(maxsize * 10, 1000), ttl=dedupe_ttl)
+        self._retrying = 0
+        self._in_flight = 0
+        self._loop = None
+        self._wakeup = None
+        self._worker = None
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.applied = 0
+        self.retried = 0
+        self.failed = 0
+        self.batches = 0
+        self._latencies = deque(maxlen=1000)
+
+    def _bind(self):
+        # The event and worker belong to one event loop; tests may run several
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = metrics.spawn(self._run())
+
+    def depth(self) -> int:
+        return len(self._items) + self._retrying + self._in_flight
+
+    def offer(self, org_id: str, alerts: list, idempotency_key: str = None) -> tuple:
+        """
+        Queue `alerts` (see webhooks.parse_alerts) for `org_id`; return
+        (accepted, duplicates). Raises QueueFull, queueing nothing, when
+        they do not fit.
+        """
+        self._bind()
+        request = (org_id, "idempotency", idempotency_key) if idempotency_key else None
+        if request and (request in self._seen or request in self._requests):
+            self.duplicates += len(alerts)
+            return 0, len(alerts)
+
+        fresh, keys, last_status = [], set(), {}
+        for alert in alerts:
+            key = alert_key(org_id, alert)
+            if key is None:
+                firing = (org_id, alert["fingerprint"])
+                if last_status.get(firing, self._last_status.get(firing)) == alert["status"]:
+                    continue
+                last_status[firing] = alert["status"]
+            elif key in self._keys or key in self._seen or key in keys:
+                continue
+            else:
+                keys.add(key)
+            fresh.append(alert)
+        if self.depth() + len(fresh) > self.maxsize:
+            self.rejected += len(alerts)
+            raise QueueFull()
+
+        for alert in fresh:
+            self._items.append([org_id, alert, 0, request])
+        self._keys |= keys
+        self._last_status.update(last_status)
+        if request and fresh:
+            self._requests[request] = len(fresh)
+        self.accepted += len(fresh)
+        self.duplicates += len(alerts) - len(fresh)
+        self._wakeup.set()
+        return len(fresh), len(alerts) - len(fresh)
+
+    async def _run(self):
+        while True:
+            if not self._items:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch = [self._items.popleft() for _ in range(min(self.batch_size, len(self._items)))]
+            by_org = {}
+            for item in batch:
+                by_org.setdefault(item[0], []).append(item)
+            self._in_flight = len(batch)
+            start = time.perf_counter()
+            try:
+                await asyncio.gather(*(self._apply(org_id, items) for org_id, items in by_org.items()))
+            finally:
+                self._in_flight = 0
+            self.batches += 1
+            self._latencies.append(time.perf_counter() - start)
+
+    async def _apply(self, org_id: str, items: list):
+        try:
+            await apply_alerts(org_id, [alert for _, alert, _, _ in items])
+        except Exception as e:
+            attempts = max(attempts for _, _, attempts, _ in items) + 1
+            if attempts >= self.max_attempts:
+                print(f"Dropping {len(items)} alerts for {org_id} after {attempts} attempts:", e)
+                self.failed += len(items)
+                self._keys.difference_update(alert_key(org_id, alert) for _, alert, _, _ in items)
+                for _, alert, _, request in items:
+                    self._requests.pop(request, None)
+                    # So the sender repeating this status is not taken for a duplicate
+                    if self._last_status.get((org_id, alert["fingerprint"])) == alert["status"]:
+                        del self._last_status[(org_id, alert["fingerprint"])]
+                return
+            print(f"Error applying alerts for {org_id}, retrying:", e)
+            self.retried += len(items)
+            self._retrying += len(items)
+            self._loop.call_later(self.retry_backoff * 2 ** (attempts - 1), self._requeue,
+                                  [[org_id, alert, attempts, request] for _, alert, _, request in items])
+            return
+        for _, alert, _, request in items:
+            key = alert_key(org_id, alert)
+            if key is not None:
+                self._keys.discard(key)
+                self._seen[key] = True
+            if request in self._requests:
+                self._requests[request] -= 1
+                if not self._requests[request]:
+                    del self._requests[request]
+                    self._seen[request] = True
+        self.applied += len(items)
+
+    def _requeue(self, items: list):
+        self._retrying -= len(items)
+        # Ahead of newer alerts, so each organization's alerts keep their order
+        self._items.extendleft(reversed(items))
+        self._wakeup.set()
+
+    async def aclose(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        """Apply what is still queued, for up to `timeout` seconds; called on shutdown."""
+        if self._worker is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self.depth() and time.monotonic() < deadline and not self._worker.done():
+            await asyncio.sleep(0.05)
+        if self.depth():
+            print(f"Shutting down with {self.depth()} alerts not applied")
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        self._worker = None
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": self.depth(),
+            "capacity": self.maxsize,
+            "retrying": self._retrying,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "applied": self.applied,
+            "retried": self.retried,
+            "failed": self.failed,
+            "batches": self.batches,
+            "batch_latency_ms": {
+                "p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+                "max": round(latencies[-1] * 1000, 1) if latencies else None,
+            },
+        }
+
+
+alert_queue = AlertQueue()
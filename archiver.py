@@ -0,0 +1,87 @@
+"""
+Archival of resolved incidents.
+
+Incidents resolved more than INCIDENT_ARCHIVE_DAYS days ago are moved, with
+their messages, out of the live incidents into monthly archive documents
+(see store.archive_resolved_incidents). That keeps the collection the
+dashboard, status page and incident queries read from down to open and
+recent incidents. The organization keeps only a {month: {"count", ...}}
+summary; archived months are read back through
+GET /public/{org_id}/incidents/archive/{month}.
+
+Run it from cron:
+
+    python archiver.py                   # every organization
+    python archiver.py --org org_123 --days 90
+
+or inside one API worker with INCIDENT_ARCHIVE_INTERVAL=<seconds>.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import status_page  # noqa: E402
+import store  # noqa: E402
+import uptime  # noqa: E402
+
+INCIDENT_ARCHIVE_DAYS = float(os.getenv("INCIDENT_ARCHIVE_DAYS", "30"))
+# 0 disables the in-process archiver
+INCIDENT_ARCHIVE_INTERVAL = float(os.getenv("INCIDENT_ARCHIVE_INTERVAL", "0"))
+
+
+def parse_month(value: str) -> str:
+    """Validate an archive partition key ("YYYY-MM")."""
+    if not uptime.MONTH_PATTERN.match(value):
+        raise ValueError("Month must be formatted as YYYY-MM")
+    return value
+
+
+async def archive_organization(org_id: str, days: float = INCIDENT_ARCHIVE_DAYS) -> int:
+    """Archive one organization's old resolved incidents and return how many moved."""
+    resolved_before = datetime.now(timezone.utc) - timedelta(days=days)
+    archived = await store.archive_resolved_incidents(org_id, resolved_before)
+    if archived:
+        # Archived incidents may still be among the snapshot's recent ones
+        status_page.invalidate(org_id)
+        print(f"{org_id}: archived {archived} incidents")
+    return archived
+
+
+async def archive_all(org_ids: list = None, days: float = INCIDENT_ARCHIVE_DAYS) -> int:
+    if not org_ids:
+        org_ids = [org_id async for org_id in store.iter_organization_ids()]
+    total = 0
+    for org_id in org_ids:
+        try:
+            total += await archive_organization(org_id, days)
+        except Exception as e:
+            print(f"Error archiving incidents of {org_id}:", e)
+    return total
+
+
+async def archive_every(interval: float, days: float = INCIDENT_ARCHIVE_DAYS):
+    while True:
+        try:
+            await archive_all(days=days)
+        except Exception as e:
+            print("Error archiving incidents:", e)
+        await asyncio.sleep(interval)
+
+
+async def main(org_ids: list, days: float):
+    total = await archive_all(org_ids, days)
+    print(f"Done: archived {total} incidents")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--org", action="append", default=[], help="organization id (repeatable)")
+    parser.add_argument("--days", type=float, default=INCIDENT_ARCHIVE_DAYS,
+                        help="archive incidents resolved more than this many days ago")
+    args = parser.parse_args()
+    asyncio.run(main(args.org, args.days))
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import time
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+from clerk import clerk, ClerkUnavailableError
+
+load_dotenv()
+
+# Memberships change rarely (an admin adding someone to an org), so a short TTL
+# keeps every dashboard click from paying a Clerk round trip.
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", "60"))
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "10000"))
+# While Clerk is unavailable, memberships it returned up to this long ago are
+# still served. Removing a user from an org takes effect once Clerk is back.
+MEMBERSHIP_STALE_TTL = float(os.getenv("MEMBERSHIP_STALE_TTL", "3600"))
+
+# Session tokens are verified locally against Clerk's JWKS. CLERK_JWKS_FILE points
+# at a local key set instead (useful for tests and air-gapped setups).
+CLERK_JWKS_PATH = os.getenv("CLERK_JWKS_PATH", "/jwks")
+CLERK_JWKS_FILE = os.getenv("CLERK_JWKS_FILE")
+JWKS_CACHE_TTL = float(os.getenv("JWKS_CACHE_TTL", "3600"))
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))
+JWT_LEEWAY = float(os.getenv("JWT_LEEWAY", "5"))
+CLERK_AUTHORIZED_PARTIES = [p for p in os.getenv("CLERK_AUTHORIZED_PARTIES", "").split(",") if p]
+
+
+class MembershipLookupError(Exception):
+    """Raised when Clerk does not return a user's organization memberships."""
+
+
+class TokenVerificationError(Exception):
+    """Raised when a session token is malformed, expired or not signed by Clerk."""
+
+
+class JwksCache:
+    """
+    Holds Clerk's signing keys, indexed by key id.
+    - The key set is fetched once and refreshed after JWKS_CACHE_TTL.
+    - An unknown kid triggers an early refresh (key rotation), rate limited
+      so that forged kids cannot hammer Clerk.
+    - If a refresh fails the previously known keys stay in use.
+    """
+
+    def __init__(self, path=CLERK_JWKS_PATH, file=CLERK_JWKS_FILE, ttl=JWKS_CACHE_TTL,
+                 min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL):
+        self.path = path
+        self.file = file
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._fetched_at = float("-inf")
+        self._attempted_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def _load(self) -> dict:
+        if self.file:
+            with open(self.file) as f:
+                return json.load(f)
+        resp = await clerk.get(self.path)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _refresh(self, force: bool = False):
+        import jwt
+
+        async with self._lock:
+            now = time.monotonic()
+            if now - self._attempted_at < self.min_refresh_interval:
+                return
+            if not force and self._keys and now - self._fetched_at < self.ttl:
+                return
+            self._attempted_at = now
+            try:
+                jwk_set = await self._load()
+                keys = {}
+                for jwk in jwk_set.get("keys", []):
+                    try:
+                        keys[jwk.get("kid")] = jwt.PyJWK(jwk)
+                    except jwt.PyJWTError as e:
+                        print("Skipping unusable JWKS key:", e)
+                if keys:
+                    self._keys = keys
+                    self._fetched_at = now
+            except Exception as e:
+                print("Error refreshing JWKS:", e)
+
+    async def get_key(self, kid):
+        if not self._keys or time.monotonic() - self._fetched_at >= self.ttl:
+            await self._refresh()
+        key = self._keys.get(kid)
+        if key is None and kid is None and len(self._keys) == 1:
+            key = next(iter(self._keys.values()))
+        if key is None:
+            # Possibly a freshly rotated key: refetch once, then give up.
+            await self._refresh(force=True)
+            key = self._keys.get(kid)
+        if key is None:
+            raise TokenVerificationError(f"Unknown signing key id: {kid}")
+        return key
+
+
+jwks_cache = JwksCache()
+
+
+async def verify_session_token(token: str) -> dict:
+    """
+    Verify a Clerk session token locally and return its claims.
+    Raises TokenVerificationError on any signature or claim problem.
+    """
+    # PyJWT and cryptography load on the first token, not at process start
+    import jwt
+
+    try:
+        header = jwt.get_unverified_header(token)
+        key = await jwks_cache.get_key(header.get("kid"))
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=[key.algorithm_name or "RS256"],
+            leeway=JWT_LEEWAY,
+            options={"require": ["exp", "sub"], "verify_aud": False},
+        )
+    except jwt.PyJWTError as e:
+        raise TokenVerificationError(str(e))
+    if CLERK_AUTHORIZED_PARTIES and claims.get("azp") not in CLERK_AUTHORIZED_PARTIES:
+        raise TokenVerificationError("Token issued for an unauthorized party")
+    return claims
+
+
+def membership_from_claims(claims: dict):
+    """
+    Build a membership dict, shaped like Clerk's organization_memberships items,
+    from the active organization carried in the token. Returns None when the
+    token has no org claims and the membership has to be looked up.
+    """
+    org_id = claims.get("org_id")
+    if not org_id:
+        return None
+    return {
+        "organization": {"id": org_id, "slug": claims.get("org_slug")},
+        "role": claims.get("org_role"),
+    }
+
+
+class MembershipResolver:
+    """
+    Resolves a user's Clerk organization memberships.
+    - Results are kept in a bounded LRU cache with a TTL, keyed by user id.
+    - Requests go through the shared pooled Clerk client.
+    - Concurrent lookups for the same user share one upstream call.
+    - While Clerk is down (or its circuit is open) the last memberships it
+      returned for the user are served, for up to MEMBERSHIP_STALE_TTL.
+    """
+
+    def __init__(self, ttl=MEMBERSHIP_CACHE_TTL, maxsize=MEMBERSHIP_CACHE_SIZE, stale_ttl=MEMBERSHIP_STALE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._last_good = TTLCache(maxsize=maxsize, ttl=stale_ttl)
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+
+    async def _fetch(self, user_id: str) -> list:
+        try:
+            clerk_resp = await clerk.get(f"/users/{user_id}/organization_memberships")
+        except ClerkUnavailableError as e:
+            return self._last_known_good(user_id, MembershipLookupError(str(e)))
+        if clerk_resp.status_code != 200:
+            error = MembershipLookupError(f"Clerk returned {clerk_resp.status_code} for user {user_id}")
+            if clerk_resp.status_code == 429 or clerk_resp.status_code >= 500:
+                return self._last_known_good(user_id, error)
+            raise error
+        memberships = clerk_resp.json().get("data", [])
+        self._last_good[user_id] = memberships
+        return memberships
+
+    def _last_known_good(self, user_id: str, error: MembershipLookupError) -> list:
+        memberships = self._last_good.get(user_id)
+        if memberships is None:
+            raise error
+        self.stale_hits += 1
+        return memberships
+
+    def _on_done(self, user_id: str, task: asyncio.Task):
+        self._inflight.pop(user_id, None)
+        if not task.cancelled() and task.exception() is None:
+            self._cache[user_id] = task.result()
+
+    async def get(self, user_id: str) -> list:
+        """
+        Return the user's organization memberships, from cache when possible.
+        Raises MembershipLookupError if Clerk cannot be queried.
+        """
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(user_id))
+            task.add_done_callback(lambda t: self._on_done(user_id, t))
+            self._inflight[user_id] = task
+        else:
+            # Another request is already asking Clerk about this user.
+            self.coalesced += 1
+        # Shielded so one caller disconnecting does not cancel the shared lookup.
+        return await asyncio.shield(task)
+
+    def invalidate(self, user_id: str = None):
+        """Drop one user's cached memberships, or the whole cache if no user is given."""
+        if user_id is None:
+            self._cache.clear()
+            self._last_good.clear()
+        else:
+            self._cache.pop(user_id, None)
+            self._last_good.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_hits": self.stale_hits,
+            "size": len(self._cache),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+membership_resolver = MembershipResolver()
+
+
+async def get_org_memberships(user_id: str) -> list:
+    """Shared entry point used by the org, admin and user auth dependencies."""
+    return await membership_resolver.get(user_id)
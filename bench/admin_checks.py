@@ -0,0 +1,55 @@
+"""
+Checks that /admin accepts the same users whether their session token
+carries organization claims or their memberships are looked up in Clerk.
+
+Runs the app against bench/fake_clerk.py with ADMIN_ORG_ID=org_admin and
+fails when an admin is refused or a non-admin let in, on either path:
+
+    python bench/admin_checks.py
+"""
+import os
+import sys
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import httpx
+
+import fake_clerk
+from endpoints import REPO_ROOT, make_signing_key, session_token, start_app
+
+ADMIN_ORG_ID = os.environ["ADMIN_ORG_ID"]
+
+
+def main():
+    clerk_server, clerk_url = fake_clerk.start_in_thread(latency=0)
+    os.environ["CLERK_API_URL"] = clerk_url
+    key = make_signing_key()
+    sys.path.insert(0, REPO_ROOT)
+    from main import app
+
+    # A renamed admin organization, and another organization that took its old name
+    fake_clerk.set_memberships("user_admin", [{"id": ADMIN_ORG_ID, "name": "Renamed"}])
+    fake_clerk.set_memberships("user_other", [{"id": "org_other", "name": "status24"}])
+    cases = [
+        ("claims: admin organization", 200, {"sub": "user_admin", "org_id": ADMIN_ORG_ID, "org_slug": "renamed"}),
+        ("claims: another organization", 403, {"sub": "user_other", "org_id": "org_other", "org_slug": "status24"}),
+        ("memberships: admin organization", 200, {"sub": "user_admin"}),
+        ("memberships: another organization", 403, {"sub": "user_other"}),
+    ]
+
+    server, base_url = start_app(app)
+    failed = False
+    with httpx.Client(base_url=base_url, timeout=30) as http:
+        for name, expected, claims in cases:
+            response = http.get("/admin/webhook-queue",
+                                headers={"Authorization": "Bearer " + session_token(key, **claims)})
+            ok = response.status_code == expected
+            failed = failed or not ok
+            print(f"{name:36} {response.status_code} (expected {expected})  {'ok' if ok else 'FAILED'}")
+    server.should_exit = True
+    clerk_server.should_exit = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Concurrency benchmark for the Clerk client against the local fake.
+
+Runs the same N concurrent organization lookups inside one event loop twice:
+once with blocking requests.get (what the handlers used to do) and once with
+the async ClerkClient. Reports wall time and the worst event-loop stall seen
+by a 10 ms heartbeat task, which is what every other request on the worker
+would have experienced.
+
+    python bench/clerk_concurrency.py --requests 200 --latency 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import requests
+
+from fake_clerk import start_in_thread
+
+# Imported after uvicorn: pickle probes for a Jython "org" package, which the
+# repo's org.py would otherwise shadow.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clerk import ClerkClient  # noqa: E402
+
+
+async def heartbeat(stalls: list, stop: asyncio.Event, interval: float = 0.01):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+async def run(name: str, call, n: int) -> dict:
+    stalls, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stalls, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return {
+        "client": name,
+        "requests": n,
+        "wall_seconds": round(elapsed, 3),
+        "throughput_rps": round(n / elapsed, 1),
+        "max_loop_stall_ms": round(max(stalls, default=0) * 1000, 1),
+    }
+
+
+async def main(n: int, latency: float, concurrency: int):
+    server, base_url = start_in_thread(latency=latency)
+    session = requests.Session()
+
+    async def blocking_call(i):
+        session.get(f"{base_url}/organizations/org_{i}")
+
+    client = ClerkClient(base_url=base_url, api_key="bench", max_concurrency=concurrency,
+                         pool_size=concurrency)
+
+    async def async_call(i):
+        await client.get(f"/organizations/org_{i}")
+
+    results = [
+        await run("requests (blocking)", blocking_call, n),
+        await run("ClerkClient (async)", async_call, n),
+    ]
+    await client.aclose()
+    server.should_exit = True
+    print(json.dumps({"latency_seconds": latency, "concurrency_cap": concurrency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency, args.concurrency))
@@ -0,0 +1,139 @@
+"""
+Clerk outage drill for the circuit breaker and the stale-serving caches.
+
+Boots the app (in-memory store) against bench/fake_clerk.py, warms the
+membership and organization caches, then injects an outage into the fake
+(calls hang, then calls fail with 503) and finally heals it. For every phase
+it reports latency and status codes of the Clerk-backed routes, the Clerk
+calls that reached the fake and the breaker state:
+
+    python bench/clerk_outage.py --requests 50
+
+During the outage, membership, org-details and admin organization list
+lookups should keep answering 200 from cache within milliseconds, calls
+with nothing cached should fail fast with 503, and after healing one trial
+call should close the circuit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+# Short timeouts and TTLs so the drill takes seconds, not minutes
+os.environ.setdefault("CLERK_TIMEOUT", "1")
+os.environ.setdefault("CLERK_MAX_RETRIES", "1")
+os.environ.setdefault("CLERK_RETRY_BACKOFF", "0.05")
+os.environ.setdefault("CLERK_BREAKER_FAILURES", "5")
+os.environ.setdefault("CLERK_BREAKER_RESET", "2")
+os.environ.setdefault("MEMBERSHIP_CACHE_TTL", "0.5")
+os.environ.setdefault("ORG_DETAILS_TTL", "0.5")
+os.environ.setdefault("ORG_DETAILS_STALE_TTL", "1")
+
+import httpx
+
+import fake_clerk
+from endpoints import REPO_ROOT, make_signing_key, session_token, start_app
+
+ORG_ID = "org_bench"
+
+
+def routes(plain: dict, admin: dict) -> list:
+    return [
+        ("GET /user/org (membership)", "/user/org", plain),
+        ("GET /org-details", f"/org-details?org_id={ORG_ID}", {}),
+        ("GET /admin/organizations", "/admin/organizations", admin),
+    ]
+
+
+async def run_phase(http: httpx.AsyncClient, clerk_url: str, phase: str, plain: dict, admin: dict,
+                    requests: int, concurrency: int) -> list:
+    from clerk import clerk
+
+    results = []
+    for name, path, headers in routes(plain, admin):
+        clerk_before = (await http.get(f"{clerk_url}/_stats")).json()["total"]
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], {}
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await http.get(path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        await asyncio.gather(*(one() for _ in range(requests)))
+        clerk_calls = (await http.get(f"{clerk_url}/_stats")).json()["total"] - clerk_before
+        latencies.sort()
+        result = {
+            "phase": phase,
+            "route": name,
+            "status_codes": statuses,
+            "latency_ms": {
+                "p50": round(statistics.median(latencies) * 1000, 1),
+                "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+                "max": round(latencies[-1] * 1000, 1),
+            },
+            "clerk_calls": clerk_calls,
+            "circuit": clerk.breaker.state,
+        }
+        print(f"{phase:14} {name:30} {json.dumps(statuses):20} p50={result['latency_ms']['p50']}ms "
+              f"max={result['latency_ms']['max']}ms clerk_calls={clerk_calls} circuit={result['circuit']}",
+              file=sys.stderr)
+        results.append(result)
+    return results
+
+
+async def main(args):
+    clerk_server, clerk_url = fake_clerk.start_in_thread(latency=0.02)
+    os.environ["CLERK_API_URL"] = clerk_url
+    key = make_signing_key()
+
+    sys.path.insert(0, REPO_ROOT)
+    from main import app
+    from auth import membership_resolver
+    from org_details import org_details_cache
+
+    server, base_url = start_app(app)
+    plain = {"Authorization": "Bearer " + session_token(key)}
+    admin = {"Authorization": "Bearer " + session_token(key, org_id="org_admin", org_slug="status24")}
+    ttl_wait = float(os.environ["ORG_DETAILS_STALE_TTL"]) + 0.2
+    reset_wait = float(os.environ["CLERK_BREAKER_RESET"]) + 0.2
+
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        phase = lambda name: run_phase(http, clerk_url, name, plain, admin, args.requests, args.concurrency)
+        results += await phase("healthy")
+
+        # Past every cache TTL, so each lookup has to ask Clerk again
+        await asyncio.sleep(ttl_wait)
+        fake_clerk.set_fault("hang")
+        results += await phase("outage:hang")
+
+        await asyncio.sleep(ttl_wait)
+        fake_clerk.set_fault("error", status=503)
+        results += await phase("outage:503")
+
+        fake_clerk.set_fault(None)
+        await asyncio.sleep(max(reset_wait, ttl_wait))
+        results += await phase("recovered")
+
+        results.append({
+            "memberships": membership_resolver.stats(),
+            "org_details": org_details_cache.stats(),
+        })
+
+    server.should_exit = True
+    clerk_server.should_exit = True
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
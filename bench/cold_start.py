@@ -0,0 +1,126 @@
+"""
+Cold start of the API process.
+
+For --runs fresh interpreters it measures:
+- import time of main.py, and which heavy client stacks (Google, gRPC,
+  httpx, PyJWT) the import loaded;
+- whether health checks (GET /, GET /metrics) created any client from
+  the resources registry;
+- time from spawning uvicorn to the first answer on /, and to the first
+  answer of a route that needs the storage backend.
+
+    python bench/cold_start.py --runs 5
+    python bench/cold_start.py --runs 5 --prewarm store
+
+The in-memory store is used unless STORAGE_BACKEND says otherwise (with
+firestore, point FIRESTORE_EMULATOR_HOST at an emulator).
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("google.cloud.firestore", "grpc", "httpx", "jwt")
+
+# Imported before the repo is on sys.path: pickle probes for a Jython "org"
+# package, which the repo's org.py would otherwise shadow.
+PRELUDE = f"import json, pickle, sys, time; sys.path.insert(0, {REPO_ROOT!r})\n"
+
+IMPORT_PROBE = PRELUDE + f"""
+started = time.perf_counter()
+import main
+import_seconds = time.perf_counter() - started
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+
+from fastapi.testclient import TestClient
+from resources import registry
+with TestClient(main.app) as client:
+    client.get("/")
+    client.get("/metrics")
+    created = list(registry.stats()["created"])
+print(json.dumps({{"import_seconds": import_seconds, "loaded_at_import": loaded, "created_by_health_checks": created}}))
+"""
+
+SERVER = PRELUDE + """
+import uvicorn
+uvicorn.run("main:app", host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, started: float, timeout: float = 60) -> float:
+    """Poll `url` until it answers; return the seconds since `started`."""
+    while time.perf_counter() - started < timeout:
+        try:
+            httpx.get(url, timeout=timeout).raise_for_status()
+            return time.perf_counter() - started
+        except httpx.TransportError:
+            time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def cold_start(env: dict) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-c", SERVER, str(port)], cwd="/", env=env)
+    try:
+        first_response = wait_for(f"{base_url}/", started)
+        before_store = time.perf_counter()
+        httpx.get(f"{base_url}/public/org_cold_start/incidents", timeout=60).raise_for_status()
+        first_store_request = time.perf_counter() - before_store
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first_response_seconds": first_response, "first_store_request_seconds": first_store_request}
+
+
+def median_ms(runs: list, key: str) -> float:
+    return round(statistics.median(run[key] for run in runs) * 1000, 1)
+
+
+def main(args):
+    env = {**os.environ}
+    env.setdefault("STORAGE_BACKEND", "memory")
+    if args.prewarm:
+        env["PREWARM_RESOURCES"] = args.prewarm
+
+    imports, starts = [], []
+    for _ in range(args.runs):
+        # Without prewarming, so only the health checks could create clients
+        probe_env = {key: value for key, value in env.items() if key != "PREWARM_RESOURCES"}
+        output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd="/", env=probe_env,
+                                capture_output=True, text=True, check=True).stdout
+        imports.append(json.loads(output.strip().splitlines()[-1]))
+        starts.append(cold_start(env))
+
+    result = {
+        "storage_backend": env["STORAGE_BACKEND"],
+        "prewarm": args.prewarm,
+        "runs": args.runs,
+        "import_main_ms": median_ms(imports, "import_seconds"),
+        "loaded_at_import": imports[-1]["loaded_at_import"],
+        "created_by_health_checks": imports[-1]["created_by_health_checks"],
+        "time_to_first_response_ms": median_ms(starts, "first_response_seconds"),
+        "first_store_request_ms": median_ms(starts, "first_store_request_seconds"),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--prewarm", default="", help="PREWARM_RESOURCES for the cold-started server")
+    main(parser.parse_args())
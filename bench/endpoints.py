@@ -0,0 +1,306 @@
+"""
+Latency benchmark of the API's endpoints.
+
+Boots the FastAPI app from main.py with uvicorn (in a background thread)
+against the Firestore emulator and bench/fake_clerk.py, signs its own
+session tokens with a throwaway JWKS, then drives every route of main.py,
+org.py, admin.py and public.py at each concurrency level. Per route and
+level it reports p50/p95/p99 latency, throughput, status codes and the
+upstream calls made (Clerk requests and Firestore RPCs), and writes them
+to a JSON file that a later run can be compared against:
+
+    gcloud emulators firestore start --host-port=127.0.0.1:8080
+    export FIRESTORE_EMULATOR_HOST=127.0.0.1:8080
+    python bench/endpoints.py --concurrency 1,10,50 --requests 200 --out before.json
+    # ... change something ...
+    python bench/endpoints.py --concurrency 1,10,50 --requests 200 --out after.json --compare before.json
+
+With STORAGE_BACKEND=memory the app runs on the in-memory SQLite store
+instead and no emulator is needed (Firestore RPC counts are then zero).
+
+--only takes a comma separated list of route name substrings. The SSE
+stream is covered by bench/sse_streams.py instead. The load generator
+shares the process (and the GIL) with the app, so absolute numbers are
+pessimistic; the comparison between runs on the same machine is the point.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+if os.getenv("STORAGE_BACKEND", "firestore") == "firestore" and not os.getenv("FIRESTORE_EMULATOR_HOST"):
+    sys.exit("Set FIRESTORE_EMULATOR_HOST to a running Firestore emulator, or STORAGE_BACKEND=memory.")
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "status24-bench")
+# The organization the admin session tokens below are issued for
+os.environ.setdefault("ADMIN_ORG_ID", "org_admin")
+
+import httpx
+import jwt
+import uvicorn
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.cloud.firestore_v1.services.firestore.async_client import FirestoreAsyncClient
+from jwt.algorithms import RSAAlgorithm
+
+import fake_clerk
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORG_ID = "org_bench"
+KID = "bench"
+
+firestore_rpcs = Counter()
+
+
+def count_firestore_rpcs():
+    def counted(name, method):
+        def wrapper(self, *args, **kwargs):
+            firestore_rpcs[name] += 1
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    for name in ("get_document", "batch_get_documents", "list_documents", "run_query",
+                 "run_aggregation_query", "commit", "batch_write", "begin_transaction", "rollback"):
+        setattr(FirestoreAsyncClient, name, counted(name, getattr(FirestoreAsyncClient, name)))
+
+
+def make_signing_key() -> rsa.RSAPrivateKey:
+    """Write a JWKS file for the app to verify our tokens with."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(key.public_key()))
+    jwk.update(kid=KID, alg="RS256", use="sig")
+    jwks_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump({"keys": [jwk]}, jwks_file)
+    jwks_file.close()
+    os.environ["CLERK_JWKS_FILE"] = jwks_file.name
+    return key
+
+
+def session_token(key, hours: int = 12, **claims) -> str:
+    claims = {"sub": "user_bench", "exp": int(time.time()) + hours * 3600, **claims}
+    return jwt.encode(claims, key, algorithm="RS256", headers={"kid": KID})
+
+
+def start_app(app):
+    """Run uvicorn on its own event loop in a thread; returns (server, base_url)."""
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def scenarios(member: dict, admin: dict, plain: dict, seed: dict) -> list:
+    """(name, method, path, headers, body factory or None) for every route."""
+    now = datetime.now(timezone.utc).isoformat()
+    service_id, incident_id = seed.get("service_id"), seed.get("incident_id")
+    statuses = ["operational", "degraded"]
+    return [
+        ("GET /", "GET", "/", {}, None),
+        ("GET /user/org (token claims)", "GET", "/user/org", member, None),
+        ("GET /user/org (Clerk lookup)", "GET", "/user/org", plain, None),
+        ("GET /organizations-list", "GET", "/organizations-list", {}, None),
+        ("GET /org-details", "GET", f"/org-details?org_id={ORG_ID}", {}, None),
+        ("GET /org-details?ids", "GET", f"/org-details?ids={ORG_ID},org_a,org_b", {}, None),
+        ("POST /org/add-service", "POST", "/org/add-service", member, lambda i: {
+            "organizationId": ORG_ID, "name": f"bench {i}", "type": "api", "status": "operational",
+        }),
+        ("PUT /org/update-service", "PUT", "/org/update-service", member, lambda i: {
+            "organizationId": ORG_ID, "serviceId": service_id, "status": statuses[i % 2],
+        }),
+        ("PUT /org/services:batch", "PUT", "/org/services:batch", member, lambda i: {
+            "organizationId": ORG_ID, "updates": [{"serviceId": service_id, "status": statuses[i % 2]}],
+        }),
+        ("PUT /org/service-check", "PUT", "/org/service-check", member, lambda i: {
+            "organizationId": ORG_ID, "serviceId": service_id,
+            "check": {"kind": "http", "url": "http://127.0.0.1:9/health", "interval": 60},
+        }),
+        ("DELETE /org/delete-service", "DELETE", "/org/delete-service", member, lambda i: {
+            "organizationId": ORG_ID, "serviceId": f"svc_missing_{i}",
+        }),
+        ("POST /org/add-incident", "POST", "/org/add-incident", member, lambda i: {
+            "organizationId": ORG_ID, "title": f"bench {i}", "description": "bench",
+            "status": "investigating", "datetime": now, "affectedServices": [service_id],
+        }),
+        ("PUT /org/update-incident", "PUT", "/org/update-incident", member, lambda i: {
+            "organizationId": ORG_ID, "incidentId": incident_id, "status": "monitoring", "message": f"update {i}",
+        }),
+        ("GET /org/incidents", "GET", "/org/incidents?limit=20", member, None),
+        ("GET /org/incidents/{id}/messages", "GET", f"/org/incidents/{incident_id}/messages", member, None),
+        ("GET /org/{id}/uptime", "GET", f"/org/{ORG_ID}/uptime?days=90", {}, None),
+        ("GET /public/{id}/status", "GET", f"/public/{ORG_ID}/status", {}, None),
+        ("POST /admin/create-user", "POST", "/admin/create-user", admin, lambda i: {
+            "email": f"bench{i}@example.com", "name": f"Bench User{i}",
+        }),
+        ("POST /admin/create-org", "POST", "/admin/create-org", admin, lambda i: {
+            "orgName": f"bench {i}",
+        }),
+        ("POST /admin/add-user-to-org", "POST", "/admin/add-user-to-org", admin, lambda i: {
+            "orgId": ORG_ID, "email": f"bench{i}@example.com", "name": f"Bench User{i}",
+        }),
+        ("GET /admin/organizations", "GET", "/admin/organizations", admin, None),
+        ("GET /admin/auth-cache", "GET", "/admin/auth-cache", admin, None),
+        ("GET /admin/status-writer", "GET", "/admin/status-writer", admin, None),
+    ]
+
+
+async def seed_org(http: httpx.AsyncClient, member: dict) -> dict:
+    service = await http.post("/org/add-service", headers=member, json={
+        "organizationId": ORG_ID, "name": "bench", "type": "api", "status": "operational",
+    })
+    incident = await http.post("/org/add-incident", headers=member, json={
+        "organizationId": ORG_ID, "title": "bench", "description": "bench", "status": "investigating",
+        "datetime": datetime.now(timezone.utc).isoformat(), "affectedServices": [],
+    })
+    service.raise_for_status()
+    incident.raise_for_status()
+    return {"service_id": service.json()["data"]["id"], "incident_id": incident.json()["data"]["id"]}
+
+
+def percentile(values: list, fraction: float):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 2)
+
+
+async def run_level(http, clerk_url, scenario, concurrency: int, requests: int) -> dict:
+    name, method, path, headers, body = scenario
+    latencies, codes = [], Counter()
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await http.request(method, path, headers=headers,
+                                              json=body(i) if body else None)
+                codes[response.status_code] += 1
+            except httpx.HTTPError as e:
+                codes[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    # One warm-up request so caches are measured in steady state
+    try:
+        await http.request(method, path, headers=headers, json=body(-1) if body else None)
+    except httpx.HTTPError:
+        pass
+    clerk_before = (await http.get(f"{clerk_url}/_stats")).json()["total"]
+    firestore_rpcs.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    clerk_calls = (await http.get(f"{clerk_url}/_stats")).json()["total"] - clerk_before
+    latencies.sort()
+    return {
+        "route": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+        },
+        "status_codes": {str(code): count for code, count in codes.items()},
+        "upstream": {
+            "clerk_calls": clerk_calls,
+            "firestore_rpcs": sum(firestore_rpcs.values()),
+        },
+    }
+
+
+def compare(results: list, baseline_file: str):
+    with open(baseline_file) as f:
+        baseline = {(r["route"], r["concurrency"]): r for r in json.load(f)["results"]}
+    print(f"{'route':40} {'conc':>4} {'p50 ms':>16} {'p99 ms':>16} {'rps':>16}", file=sys.stderr)
+    for result in results:
+        before = baseline.get((result["route"], result["concurrency"]))
+        if before is None:
+            continue
+
+        def delta(get):
+            old, new = get(before), get(result)
+            if not old or new is None:
+                return f"{new}"
+            return f"{new} ({(new - old) / old:+.0%})"
+
+        print(f"{result['route']:40} {result['concurrency']:>4} "
+              f"{delta(lambda r: r['latency_ms']['p50']):>16} "
+              f"{delta(lambda r: r['latency_ms']['p99']):>16} "
+              f"{delta(lambda r: r['rps']):>16}", file=sys.stderr)
+
+
+async def main(args):
+    clerk_server, clerk_url = fake_clerk.start_in_thread(latency=args.clerk_latency)
+    os.environ["CLERK_API_URL"] = clerk_url
+    key = make_signing_key()
+
+    # Imported after uvicorn and google.cloud: pickle probes for a Jython "org"
+    # package, which the repo's org.py would otherwise shadow.
+    sys.path.insert(0, REPO_ROOT)
+    from main import app
+
+    count_firestore_rpcs()
+    server, base_url = start_app(app)
+    member = {"Authorization": "Bearer " + session_token(key, org_id=ORG_ID, org_slug="bench", org_role="org:admin")}
+    admin = {"Authorization": "Bearer " + session_token(key, org_id="org_admin", org_slug="status24", org_role="org:admin")}
+    plain = {"Authorization": "Bearer " + session_token(key)}
+
+    only = [o.strip() for o in args.only.split(",") if o.strip()] if args.only else None
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 10)
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        needs_seed = only is None or any("/org/" in o or "public" in o for o in only)
+        seed = await seed_org(http, member) if needs_seed else {}
+        for scenario in scenarios(member, admin, plain, seed):
+            if only and not any(o in scenario[0] for o in only):
+                continue
+            for concurrency in args.concurrency:
+                result = await run_level(http, clerk_url, scenario, concurrency, args.requests)
+                print(f"{result['route']:40} c={concurrency:<4} p50={result['latency_ms']['p50']}ms "
+                      f"p99={result['latency_ms']['p99']}ms rps={result['rps']}", file=sys.stderr)
+                results.append(result)
+
+    server.should_exit = True
+    clerk_server.should_exit = True
+
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    report = {
+        "revision": revision,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "clerk_latency": args.clerk_latency,
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clerk-latency", type=float, default=0.1)
+    parser.add_argument("--only", help="comma separated route name substrings")
+    parser.add_argument("--out", default="bench-endpoints.json")
+    parser.add_argument("--compare", help="an earlier --out file to compare against")
+    asyncio.run(main(parser.parse_args()))
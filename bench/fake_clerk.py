@@ -0,0 +1,163 @@
+"""
+Local stand-in for Clerk's backend API, used by the benchmarks.
+
+Every response is delayed by FAKE_CLERK_LATENCY seconds (asyncio sleep, so the
+fake itself never becomes the bottleneck). Call counts per route are exposed at
+GET /_stats so benchmarks can report upstream calls.
+
+Outages can be injected with POST /_fault (or set_fault() in-process):
+{"mode": "error", "status": 503} answers every call with that status,
+{"mode": "hang", "seconds": 30} holds calls open, {"mode": null} heals.
+With a rate limit (--rate-limit or set_rate_limit()), calls beyond that many
+per second are answered 429 with a Retry-After header, like Clerk's.
+GET /organizations pages (limit/offset, total_count) through the
+organizations set with set_organizations() or --organizations.
+
+    python bench/fake_clerk.py --port 8801 --latency 0.1 --fault hang
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY = float(os.getenv("FAKE_CLERK_LATENCY", "0.1"))
+
+app = FastAPI()
+app.state.latency = LATENCY
+app.state.calls = Counter()
+app.state.fault = {"mode": None}
+app.state.rate_limit = {"per_second": None, "second": 0, "calls": 0}
+app.state.organizations = [{"id": "org_bench", "name": "status24", "slug": "status24"}]
+# user id -> organizations the user is a member of; other users are members of org_bench
+app.state.memberships = {}
+
+
+def set_fault(mode: str = None, status: int = 503, seconds: float = 3600):
+    app.state.fault = {"mode": mode, "status": status, "seconds": seconds}
+
+
+def set_organizations(count: int):
+    """status24 plus `count` - 1 generated organizations."""
+    app.state.organizations = [{"id": "org_bench", "name": "status24", "slug": "status24"}] + [
+        {"id": f"org_{i:06d}", "name": f"Tenant {i}", "slug": f"tenant-{i}"} for i in range(1, count)
+    ]
+
+
+def set_memberships(user_id: str, organizations: list):
+    app.state.memberships[user_id] = organizations
+
+
+def set_rate_limit(per_second: int = None):
+    app.state.rate_limit = {"per_second": per_second, "second": 0, "calls": 0}
+
+
+def rate_limited() -> bool:
+    limit = app.state.rate_limit
+    if not limit["per_second"]:
+        return False
+    second = int(time.time())
+    if second != limit["second"]:
+        limit.update(second=second, calls=0)
+    limit["calls"] += 1
+    return limit["calls"] > limit["per_second"]
+
+
+@app.middleware("http")
+async def delay_and_count(request: Request, call_next):
+    if not request.url.path.startswith("/_"):
+        resource = request.url.path.strip("/").split("/")[0]
+        app.state.calls[f"{request.method} /{resource}"] += 1
+        fault = app.state.fault
+        if fault["mode"] == "hang":
+            await asyncio.sleep(fault["seconds"])
+        elif fault["mode"] == "error":
+            return JSONResponse({"errors": [{"message": "injected fault"}]}, status_code=fault["status"])
+        if rate_limited():
+            app.state.calls["429"] += 1
+            return JSONResponse({"errors": [{"message": "Too many requests"}]}, status_code=429,
+                                headers={"Retry-After": "1"})
+        await asyncio.sleep(app.state.latency)
+    return await call_next(request)
+
+
+@app.get("/_stats")
+async def stats():
+    return {"calls": dict(app.state.calls), "total": sum(app.state.calls.values())}
+
+
+@app.post("/_fault")
+async def fault(request: Request):
+    body = await request.json()
+    set_fault(body.get("mode"), body.get("status", 503), body.get("seconds", 3600))
+    return app.state.fault
+
+
+@app.get("/users/{user_id}/organization_memberships")
+async def memberships(user_id: str):
+    organizations = app.state.memberships.get(user_id, [{"id": "org_bench", "name": "status24"}])
+    return {"data": [{"role": "org:admin", "organization": organization} for organization in organizations]}
+
+
+@app.get("/organizations/{org_id}")
+async def organization(org_id: str):
+    return {"id": org_id, "name": f"Org {org_id}", "image_url": None}
+
+
+@app.get("/organizations")
+async def organizations(limit: int = 10, offset: int = 0):
+    page = app.state.organizations[offset:offset + min(limit, 500)]
+    return {"data": page, "total_count": len(app.state.organizations)}
+
+
+@app.post("/users")
+async def create_user(request: Request):
+    body = await request.json()
+    return {"id": f"user_{time.time_ns()}", "email_address": body.get("email_address")}
+
+
+@app.post("/organizations")
+async def create_org(request: Request):
+    body = await request.json()
+    org = {"id": f"org_{time.time_ns()}", "name": body.get("name")}
+    app.state.organizations.append(org)
+    return org
+
+
+@app.post("/organization_memberships")
+async def create_membership(request: Request):
+    return {"id": f"orgmem_{time.time_ns()}", **(await request.json())}
+
+
+def start_in_thread(port: int = 0, latency: float = None):
+    """Run the fake in a background thread; returns (server, base_url)."""
+    if latency is not None:
+        app.state.latency = latency
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{bound_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--fault", choices=["error", "hang"], help="start in an injected outage")
+    parser.add_argument("--rate-limit", type=int, help="answer 429 beyond this many calls per second")
+    parser.add_argument("--organizations", type=int, default=1, help="organizations GET /organizations pages through")
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    set_fault(args.fault)
+    set_rate_limit(args.rate_limit)
+    set_organizations(args.organizations)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
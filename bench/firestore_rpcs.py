@@ -0,0 +1,134 @@
+"""
+Counts the Firestore RPCs each org.py write endpoint issues.
+
+Calls the endpoints in-process through FastAPI's TestClient (with the
+membership check overridden) against the Firestore emulator, counting the
+calls made on the Firestore gRPC API, and fails when an endpoint needs more
+round trips than expected:
+
+    gcloud emulators firestore start --host-port=127.0.0.1:8080
+    FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 python bench/firestore_rpcs.py
+
+Without an emulator it runs on the in-memory store and counts calls on the
+storage backend interface instead (store.Store methods). Each of the
+methods these endpoints use is a single read or a single commit in the
+Firestore backend, so the budgets are the same:
+
+    python bench/firestore_rpcs.py
+"""
+import functools
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+
+import pickle  # noqa: F401
+
+EMULATOR = bool(os.getenv("FIRESTORE_EMULATOR_HOST"))
+if EMULATOR:
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "status24-bench")
+    os.environ["STORAGE_BACKEND"] = "firestore"
+else:
+    os.environ["STORAGE_BACKEND"] = "memory"
+
+from fastapi.testclient import TestClient
+
+# Imported after pickle: it probes for a Jython "org" package, which the
+# repo's org.py would otherwise shadow.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import org  # noqa: E402
+import store  # noqa: E402
+from main import app  # noqa: E402
+
+ORG_ID = f"org_bench_rpcs_{int(datetime.now(timezone.utc).timestamp())}"
+
+RPC_METHODS = [
+    "get_document", "batch_get_documents", "list_documents", "run_query",
+    "run_aggregation_query", "commit", "batch_write", "update_document",
+    "begin_transaction", "rollback",
+]
+rpcs = Counter()
+
+
+def counted(name, method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        rpcs[name] += 1
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def count_rpcs():
+    if EMULATOR:
+        from google.cloud.firestore_v1.services.firestore.async_client import FirestoreAsyncClient
+        for name in RPC_METHODS:
+            setattr(FirestoreAsyncClient, name, counted(name, getattr(FirestoreAsyncClient, name)))
+        return
+    backend_class = type(store.backend())
+    for name, method in vars(store.Store).items():
+        if not name.startswith("_") and name != "close" and callable(method):
+            setattr(backend_class, name, counted(name, getattr(backend_class, name)))
+
+
+def measure(client: TestClient, method: str, path: str, body: dict, expected_status: int = 200):
+    rpcs.clear()
+    response = client.request(method, path, json=body)
+    if response.status_code != expected_status:
+        sys.exit(f"{method} {path}: expected {expected_status}, got {response.status_code} {response.text}")
+    return response.json(), sum(rpcs.values()), dict(rpcs)
+
+
+def main():
+    count_rpcs()
+    app.dependency_overrides[org.verify_org_member] = lambda: {
+        "organization": {"id": ORG_ID, "slug": "bench"},
+        "role": "org:admin",
+    }
+
+    rows = []
+    failed = False
+
+    def check(name, expected, result):
+        nonlocal failed
+        _, total, detail = result
+        ok = total <= expected
+        failed = failed or not ok
+        rows.append((name, total, expected, detail, "ok" if ok else "TOO MANY"))
+        return result[0]
+
+    with TestClient(app) as client:
+        service = check("add-service", 1, measure(client, "POST", "/org/add-service", {
+            "organizationId": ORG_ID, "name": "API", "type": "api", "status": "operational",
+        }))["data"]
+        check("update-service", 2, measure(client, "PUT", "/org/update-service", {
+            "organizationId": ORG_ID, "serviceId": service["id"], "status": "degraded",
+        }))
+        incident = check("add-incident", 1, measure(client, "POST", "/org/add-incident", {
+            "organizationId": ORG_ID, "title": "Outage", "description": "API down",
+            "status": "investigating", "datetime": datetime.now(timezone.utc).isoformat(),
+            "affectedServices": [service["id"]],
+        }))["data"]
+        check("update-incident", 1, measure(client, "PUT", "/org/update-incident", {
+            "organizationId": ORG_ID, "incidentId": incident["id"],
+            "status": "resolved", "message": "Fixed",
+        }))
+        check("update-incident (missing)", 1, measure(client, "PUT", "/org/update-incident", {
+            "organizationId": ORG_ID, "incidentId": "missing",
+            "status": "resolved", "message": "Fixed",
+        }, expected_status=404))
+        check("update-service (missing)", 1, measure(client, "PUT", "/org/update-service", {
+            "organizationId": ORG_ID, "serviceId": "missing", "status": "degraded",
+        }, expected_status=404))
+        check("delete-service", 1, measure(client, "DELETE", "/org/delete-service", {
+            "organizationId": ORG_ID, "serviceId": service["id"],
+        }))
+
+    unit = "rpc(s)" if EMULATOR else "store call(s)"
+    for name, total, expected, detail, verdict in rows:
+        print(f"{name:28} {total} {unit} (max {expected})  {verdict}  {detail}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
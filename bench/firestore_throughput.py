@@ -0,0 +1,92 @@
+"""
+Throughput comparison of the blocking and async Firestore clients.
+
+Runs the update-service flow (read the org document, then update one
+service's status) from N concurrent coroutines on one event loop, first with
+the blocking firestore.Client the handlers used to call and then through
+the store's Firestore backend (one shared AsyncClient). Needs the Firestore emulator:
+
+    gcloud emulators firestore start --host-port=127.0.0.1:8080
+    FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 python bench/firestore_throughput.py --ops 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+    sys.exit("Set FIRESTORE_EMULATOR_HOST to a running Firestore emulator.")
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "status24-bench")
+os.environ["STORAGE_BACKEND"] = "firestore"
+
+from google.cloud import firestore
+
+# Imported after google.cloud: pickle probes for a Jython "org" package, which
+# the repo's org.py would otherwise shadow.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import store  # noqa: E402
+import store_firestore  # noqa: E402
+
+ORG_ID = "org_bench_firestore"
+
+
+def seed(sync_db: firestore.Client, services: int) -> list:
+    service_ids = [f"svc_{i}" for i in range(services)]
+    sync_db.collection(store_firestore.ORGANIZATIONS).document(ORG_ID).set({
+        "services": {
+            sid: {"id": sid, "name": sid, "type": "api", "status": "operational"}
+            for sid in service_ids
+        }
+    })
+    return service_ids
+
+
+async def run(name: str, op, ops: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(i):
+        async with semaphore:
+            await op(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(ops)))
+    elapsed = time.perf_counter() - start
+    return {"client": name, "ops": ops, "seconds": round(elapsed, 3), "ops_per_second": round(ops / elapsed, 1)}
+
+
+async def main(ops: int, concurrency: int, services: int):
+    sync_db = firestore.Client()
+    service_ids = seed(sync_db, services)
+    statuses = ["operational", "degraded", "down"]
+
+    async def blocking_op(i):
+        ref = sync_db.collection(store_firestore.ORGANIZATIONS).document(ORG_ID)
+        ref.get()
+        sid = service_ids[i % len(service_ids)]
+        ref.update({
+            f"services.{sid}.status": statuses[i % 3],
+            f"services.{sid}.updated_at": firestore.SERVER_TIMESTAMP,
+        })
+
+    async def async_op(i):
+        await store.get_organization(ORG_ID)
+        sid = service_ids[i % len(service_ids)]
+        await store.update_service_status(ORG_ID, sid, statuses[i % 3])
+
+    results = [
+        await run("firestore.Client (blocking)", blocking_op, ops, concurrency),
+        await run("store / AsyncClient", async_op, ops, concurrency),
+    ]
+    print(json.dumps({"concurrency": concurrency, "services": services, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--services", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.ops, args.concurrency, args.services))
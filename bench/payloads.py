@@ -0,0 +1,139 @@
+"""
+Response size and serialization cost for a large organization.
+
+Seeds the in-memory store with one big organization (services, incidents
+with messages, 90 days of uptime rollups), then for the heaviest routes
+reports the bytes on the wire without compression, with gzip and with
+brotli (when installed), plus the CPU time per request. It also times
+serializing each payload the old way (jsonable_encoder + json.dumps)
+against serialization.dumps:
+
+    python bench/payloads.py --services 200 --incidents 500 --messages 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import uvicorn  # noqa: F401
+
+# Imported after uvicorn: pickle probes for a Jython "org" package, which the
+# repo's org.py would otherwise shadow.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["STORAGE_BACKEND"] = "memory"
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import compression  # noqa: E402
+import org  # noqa: E402
+import serialization  # noqa: E402
+import status_page  # noqa: E402
+import store  # noqa: E402
+import uptime  # noqa: E402
+from main import app  # noqa: E402
+
+ORG_ID = "org_bench_payloads"
+STATUSES = ["operational", "degraded", "partial_outage", "major_outage"]
+INCIDENT_STATUSES = ["investigating", "identified", "monitoring", "resolved"]
+
+
+async def seed(services: int, incidents: int, messages: int):
+    now = datetime.now(timezone.utc)
+    service_ids = []
+    for i in range(services):
+        service_id = store.new_id()
+        service_ids.append(service_id)
+        await store.create_service(ORG_ID, {
+            "id": service_id, "name": f"Service {i}", "type": random.choice(["api", "db", "website"]),
+            "status": random.choice(STATUSES), "status_since": now - timedelta(hours=i),
+            "created_at": now - timedelta(days=120), "updated_at": now,
+        })
+
+    rollups = {}
+    for day in range(90):
+        key = uptime.day_key((now - timedelta(days=day)).date())
+        rollups[key] = {
+            service_id: {"operational": 86000.0, "degraded": 300.0, "down": 100.0}
+            for service_id in service_ids
+        }
+    await store.backend().apply_status_changes(ORG_ID, {}, [], rollups)
+
+    for i in range(incidents):
+        incident_id = store.new_id()
+        await store.create_incident(ORG_ID, {
+            "id": incident_id, "title": f"Elevated error rates on service {i % services}",
+            "description": "We are investigating elevated error rates and increased latency for some requests.",
+            "status": random.choice(INCIDENT_STATUSES), "datetime": now - timedelta(hours=i),
+            "affectedServices": random.sample(service_ids, min(3, services)),
+            "created_at": store.SERVER_TIMESTAMP, "updated_at": store.SERVER_TIMESTAMP,
+        })
+        for j in range(messages):
+            await store.add_incident_message(ORG_ID, incident_id, {
+                "id": store.new_id(), "message": f"Update {j}: the fix is being rolled out to all regions.",
+                "status": INCIDENT_STATUSES[j % 4], "timestamp": store.SERVER_TIMESTAMP,
+            }, INCIDENT_STATUSES[j % 4])
+
+
+def cpu_per_call(function, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        function()
+    return (time.process_time() - start) / repeat
+
+
+def main(args):
+    asyncio.run(seed(args.services, args.incidents, args.messages))
+    app.dependency_overrides[org.verify_org_member] = lambda: {"organization": {"id": ORG_ID}}
+    client = TestClient(app)
+
+    routes = [
+        ("GET /public/{id}/status", f"/public/{ORG_ID}/status"),
+        ("GET /public/{id}/incidents", f"/public/{ORG_ID}/incidents?limit=100&include_messages=true"),
+        ("GET /org/incidents", "/org/incidents?limit=100&include_messages=true"),
+        ("GET /org/{id}/uptime", f"/org/{ORG_ID}/uptime?days=90"),
+    ]
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+    results = []
+    for name, path in routes:
+        payload = client.get(path).json()
+        result = {
+            "route": name,
+            "serialize_ms": {
+                "jsonable_encoder+json": round(cpu_per_call(
+                    lambda: json.dumps(jsonable_encoder(payload), separators=(",", ":")), args.repeat) * 1000, 3),
+                "serialization.dumps": round(cpu_per_call(
+                    lambda: serialization.dumps(payload), args.repeat) * 1000, 3),
+            },
+            "bytes": {},
+            "request_cpu_ms": {},
+        }
+        for encoding in encodings:
+            headers = {"Accept-Encoding": encoding}
+            response = client.get(path, headers=headers)
+            result["bytes"][encoding] = response.num_bytes_downloaded
+            # The status snapshot is cached; drop it so every request rebuilds it
+            result["request_cpu_ms"][encoding] = round(cpu_per_call(
+                lambda: (status_page.status_cache.invalidate(ORG_ID), client.get(path, headers=headers)),
+                args.repeat) * 1000, 3)
+        results.append(result)
+        print(f"{name:30} bytes={result['bytes']} serialize_ms={result['serialize_ms']} "
+              f"request_cpu_ms={result['request_cpu_ms']}", file=sys.stderr)
+
+    print(json.dumps({
+        "services": args.services, "incidents": args.incidents, "messages": args.messages,
+        "orjson": serialization.orjson is not None, "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--incidents", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,132 @@
+"""
+Load test for the health-check prober against local stub servers.
+
+Starts a stub HTTP server (paths /ok, /slow, /error) and a TCP listener on
+localhost, registers N checks spread over them with a ProbeEngine whose
+status changes are only recorded in memory, runs for a while and reports
+probe throughput, event loop lag and whether every check settled on the
+expected status. No Firestore or network access needed.
+
+    python bench/prober_load.py --checks 5000 --interval 5 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+
+# Imported after httpx: pickle probes for a Jython "org" package, which the
+# repo's org.py would otherwise shadow.
+import httpx  # noqa: F401
+
+# The stub servers listen on localhost
+os.environ.setdefault("PROBER_ALLOW_PRIVATE", "true")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prober  # noqa: E402
+
+SLOW_SECONDS = 0.3
+
+
+async def http_stub(reader, writer):
+    try:
+        while True:
+            request = await reader.readuntil(b"\r\n\r\n")
+            path = request.split(b" ", 2)[1]
+            if path == b"/slow":
+                await asyncio.sleep(SLOW_SECONDS)
+            code = b"500 Internal Server Error" if path == b"/error" else b"200 OK"
+            writer.write(b"HTTP/1.1 " + code + b"\r\nContent-Length: 2\r\n\r\nok")
+            await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def tcp_stub(reader, writer):
+    writer.close()
+
+
+async def main(checks: int, interval: float, duration: float, hosts: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    http_server = await asyncio.start_server(http_stub, "0.0.0.0", 0, backlog=4096)
+    tcp_server = await asyncio.start_server(tcp_stub, "0.0.0.0", 0, backlog=4096)
+    http_port = http_server.sockets[0].getsockname()[1]
+    tcp_port = tcp_server.sockets[0].getsockname()[1]
+
+    changes = {}
+
+    async def record(check, result):
+        changes[check.key] = result
+
+    engine = prober.ProbeEngine(on_change=record, tick=0.1)
+    await engine.start()
+
+    # Every check starts out "operational"; /slow should settle on degraded,
+    # /error and the closed TCP port on down.
+    kinds = [
+        ("ok", {"kind": "http", "path": "/ok"}, "operational"),
+        ("slow", {"kind": "http", "path": "/slow", "degraded_latency_ms": SLOW_SECONDS * 500}, "degraded"),
+        ("error", {"kind": "http", "path": "/error"}, "down"),
+        ("tcp", {"kind": "tcp", "port": tcp_port}, "operational"),
+        ("closed", {"kind": "tcp", "port": 1}, "down"),
+    ]
+    expected = {}
+    for i in range(checks):
+        name, spec, outcome = kinds[i % len(kinds)]
+        # 127.0.0.x addresses give the per-host limit several hosts to spread over
+        host = f"127.0.0.{1 + i % hosts}"
+        check = {"interval": interval, "timeout": 2, "degraded_latency_ms": spec.get("degraded_latency_ms")}
+        if spec["kind"] == "http":
+            check.update(kind="http", url=f"http://{host}:{http_port}{spec['path']}")
+        else:
+            check.update(kind="tcp", host=host, port=spec["port"])
+        engine.upsert("org_bench_prober", {"id": f"{name}_{i}", "status": "operational", "check": check})
+        expected[("org_bench_prober", f"{name}_{i}")] = outcome
+
+    # Event loop lag: how late a 50 ms sleep wakes up while probes run
+    lags = []
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        before = loop.time()
+        await asyncio.sleep(0.05)
+        lags.append(loop.time() - before - 0.05)
+    elapsed = time.perf_counter() - start
+    await engine.stop()
+    http_server.close()
+    tcp_server.close()
+
+    settled = sum(1 for key, outcome in expected.items() if changes.get(key, "operational") == outcome)
+    lags.sort()
+    print(json.dumps({
+        "checks": checks,
+        "interval": interval,
+        "seconds": round(elapsed, 1),
+        "probes_per_second": round(engine.probes / elapsed, 1),
+        "expected_probes_per_second": round(checks / interval, 1),
+        "settled_as_expected": settled,
+        "loop_lag_ms": {
+            "p50": round(statistics.median(lags) * 1000, 1),
+            "p99": round(lags[int(len(lags) * 0.99) - 1] * 1000, 1),
+        },
+        "engine": engine.stats(),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=5000)
+    parser.add_argument("--interval", type=float, default=5)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--hosts", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.checks, args.interval, args.duration, args.hosts))
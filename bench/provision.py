@@ -0,0 +1,113 @@
+"""
+Bulk onboarding benchmark: the admin UI's one-call-per-step flow against
+POST /admin/provision.
+
+Boots the app (in-memory store) against bench/fake_clerk.py with a per-call
+latency and, optionally, a Clerk rate limit, then onboards the same number
+of members twice: sequentially through /admin/create-user and
+/admin/add-user-to-org (what the admin page does), and in one streamed
+/admin/provision call. Reports wall time, Clerk calls, 429s and failures:
+
+    python bench/provision.py --members 500 --latency 0.1 --rate-limit 100
+
+--serial-members caps the sequential run (it is slow by design); its time
+is scaled up to --members in the report.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import httpx
+
+import fake_clerk
+from endpoints import REPO_ROOT, make_signing_key, session_token, start_app
+
+
+def members(count: int, prefix: str) -> list:
+    return [{"email": f"{prefix}{i}@example.com", "name": f"Bench User{i}"} for i in range(count)]
+
+
+async def clerk_calls(http: httpx.AsyncClient, clerk_url: str) -> dict:
+    return (await http.get(f"{clerk_url}/_stats")).json()["calls"]
+
+
+def delta(before: dict, after: dict) -> dict:
+    return {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+
+
+async def serial(http: httpx.AsyncClient, admin: dict, count: int) -> dict:
+    start = time.perf_counter()
+    response = await http.post("/admin/create-org", json={"orgName": "Bench serial"}, headers=admin)
+    org_id = response.json()["id"]
+    failed = 0
+    for member in members(count, "serial"):
+        created = await http.post("/admin/create-user", json=member, headers=admin)
+        added = await http.post("/admin/add-user-to-org", json={"orgId": org_id, **member}, headers=admin)
+        failed += created.status_code != 200 or added.status_code != 200
+    return {"seconds": time.perf_counter() - start, "failed": failed}
+
+
+async def bulk(http: httpx.AsyncClient, admin: dict, count: int) -> dict:
+    start = time.perf_counter()
+    first_result = None
+    summary = None
+    payload = {"orgName": "Bench bulk", "members": members(count, "bulk")}
+    async with http.stream("POST", "/admin/provision", json=payload, headers=admin) as response:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            item = json.loads(line)
+            if item["type"] == "member" and first_result is None:
+                first_result = time.perf_counter() - start
+            if item["type"] == "summary":
+                summary = item
+    return {"seconds": time.perf_counter() - start, "first_result_seconds": first_result, "summary": summary}
+
+
+async def main(args):
+    clerk_server, clerk_url = fake_clerk.start_in_thread(latency=args.latency)
+    fake_clerk.set_rate_limit(args.rate_limit)
+    os.environ["CLERK_API_URL"] = clerk_url
+    key = make_signing_key()
+
+    sys.path.insert(0, REPO_ROOT)
+    from main import app
+
+    server, base_url = start_app(app)
+    admin = {"Authorization": "Bearer " + session_token(key, org_id="org_admin", org_slug="status24")}
+
+    results = {"members": args.members, "clerk_latency": args.latency, "clerk_rate_limit": args.rate_limit}
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as http:
+        serial_members = min(args.serial_members, args.members)
+        before = await clerk_calls(http, clerk_url)
+        result = await serial(http, admin, serial_members)
+        result["clerk_calls"] = delta(before, await clerk_calls(http, clerk_url))
+        result["seconds_scaled"] = round(result["seconds"] * args.members / serial_members, 2)
+        results["serial"] = {"members": serial_members, **result}
+        print(f"serial: {serial_members} members in {result['seconds']:.2f}s "
+              f"(~{result['seconds_scaled']}s for {args.members})", file=sys.stderr)
+
+        before = await clerk_calls(http, clerk_url)
+        result = await bulk(http, admin, args.members)
+        result["clerk_calls"] = delta(before, await clerk_calls(http, clerk_url))
+        results["provision"] = result
+        print(f"provision: {args.members} members in {result['seconds']:.2f}s, "
+              f"summary={result['summary']}", file=sys.stderr)
+
+    server.should_exit = True
+    clerk_server.should_exit = True
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--serial-members", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rate-limit", type=int, default=None, help="Clerk calls per second before 429s")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+"""
+Load test for the /public/{orgId}/events SSE fan-out.
+
+Boots the FastAPI app on one uvicorn worker (in a background thread), opens
+N concurrent event streams for one organization, then publishes status
+events and measures how long they take to reach every client. The snapshot
+builder is replaced with a static snapshot so the run measures the fan-out
+path only, without Firestore.
+
+    python bench/sse_streams.py --clients 2000 --events 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+# Imported after uvicorn: pickle probes for a Jython "org" package, which the
+# repo's org.py would otherwise shadow.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("FIRESTORE_EMULATOR_HOST", "127.0.0.1:8080")
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "status24-bench")
+
+import events  # noqa: E402
+import status_page  # noqa: E402
+from main import app  # noqa: E402
+
+ORG_ID = "org_bench_sse"
+
+
+async def static_snapshot(org_id):
+    return {"organizationId": org_id, "status": "operational", "services": [],
+            "active_incidents": [], "recent_incidents": []}
+
+
+def start_server():
+    """Run uvicorn on its own event loop in a thread; returns (server, loop, base_url)."""
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, loop, f"http://127.0.0.1:{port}"
+
+
+async def client(http: httpx.AsyncClient, url: str, ready: asyncio.Event, connected: list,
+                 latencies: list, expected: int):
+    received = 0
+    event = None
+    async with http.stream("GET", url) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "snapshot":
+                connected.append(1)
+                if len(connected) == ready.target:
+                    ready.set()
+            elif line.startswith("data: ") and event == "service.status":
+                latencies.append(time.time() - json.loads(line[len("data: "):])["sent"])
+                received += 1
+                if received >= expected:
+                    return
+
+
+async def main(clients: int, event_count: int, interval: float):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    status_page.build_status_snapshot = static_snapshot
+    server, server_loop, base_url = start_server()
+    url = f"{base_url}/public/{ORG_ID}/events"
+
+    ready = asyncio.Event()
+    ready.target = clients
+    connected, latencies = [], []
+    limits = httpx.Limits(max_connections=clients + 10, max_keepalive_connections=0)
+    async with httpx.AsyncClient(limits=limits, timeout=None) as http:
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(client(http, url, ready, connected, latencies, event_count))
+                 for _ in range(clients)]
+        await asyncio.wait_for(ready.wait(), timeout=120)
+        connect_seconds = time.perf_counter() - start
+
+        for i in range(event_count):
+            server_loop.call_soon_threadsafe(
+                events.publish, ORG_ID, "service.status",
+                {"serviceId": "svc", "status": "degraded", "sent": time.time()},
+            )
+            await asyncio.sleep(interval)
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=120)
+
+    server.should_exit = True
+    latencies.sort()
+    print(json.dumps({
+        "clients": clients,
+        "connected": len(connected),
+        "connect_seconds": round(connect_seconds, 2),
+        "events": event_count,
+        "deliveries": len(latencies),
+        "latency_ms": {
+            "p50": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+            "max": round(latencies[-1] * 1000, 1) if latencies else None,
+        },
+        "broker": events.broker.stats(),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.events, args.interval))
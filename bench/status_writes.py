@@ -0,0 +1,90 @@
+"""
+Checks the status history the coalescing status writer (status_writer.py)
+records when a change arrives while an earlier flush is still committing.
+
+Runs on the in-memory store with every commit slowed down by --commit-delay
+seconds. Each scenario reads the service once, writes a first status, and
+writes a second one, made against that now stale read, during the first
+flush. It fails when the history or the uptime rollups are off:
+
+    python bench/status_writes.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pickle  # noqa: F401
+
+os.environ["STORAGE_BACKEND"] = "memory"
+
+# Imported after pickle: it probes for a Jython "org" package, which the
+# repo's org.py would otherwise shadow.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import store  # noqa: E402
+from status_writer import StatusWriter  # noqa: E402
+from store_sqlite import loads  # noqa: E402
+
+SCENARIOS = [
+    # name, first status, second status, expected (from, to) transitions
+    ("second change", "degraded", "major_outage",
+     [("operational", "degraded"), ("degraded", "major_outage")]),
+    ("same change twice", "degraded", "degraded", [("operational", "degraded")]),
+    ("change and back", "degraded", "operational",
+     [("operational", "degraded"), ("degraded", "operational")]),
+]
+
+
+def history(org_id: str) -> list:
+    rows = store.backend().conn.execute(
+        "SELECT data FROM status_history WHERE org_id = ? ORDER BY id", (org_id,)
+    ).fetchall()
+    return [(entry["from"], entry["to"]) for entry in map(loads, (row[0] for row in rows))]
+
+
+async def run(name: str, first: str, second: str, commit_delay: float) -> tuple:
+    org_id = "org_" + name.replace(" ", "_")
+    # Operational for the last hour
+    await store.create_service(org_id, {
+        "id": "api", "name": "API", "status": "operational",
+        "status_since": datetime.now(timezone.utc) - timedelta(hours=1),
+    })
+    read = (await store.get_organization(org_id))["services"]["api"]
+
+    writer = StatusWriter(window=0.01)
+    first_write = asyncio.ensure_future(writer.write(org_id, "api", first, previous=read))
+    await asyncio.sleep(commit_delay / 3)
+    second_write = asyncio.ensure_future(writer.write(org_id, "api", second, previous=read))
+    await asyncio.gather(first_write, second_write)
+
+    rollups = await store.get_uptime_rollups(org_id, (datetime.now(timezone.utc) - timedelta(days=1)).date())
+    operational = sum(day.get("api", {}).get("operational", 0) for day in rollups.values())
+    return history(org_id), operational
+
+
+async def main(args):
+    backend = store.backend()
+    apply_status_changes = backend.apply_status_changes
+
+    async def slow_apply_status_changes(*a, **kw):
+        await asyncio.sleep(args.commit_delay)
+        return await apply_status_changes(*a, **kw)
+
+    backend.apply_status_changes = slow_apply_status_changes
+
+    failed = False
+    for name, first, second, expected in SCENARIOS:
+        transitions, operational = await run(name, first, second, args.commit_delay)
+        # The hour spent operational is credited once, not once per transition out of it
+        ok = transitions == expected and 3600 <= operational < 3600 + 60
+        failed = failed or not ok
+        print(f"{name:20} {transitions}  operational {operational:.0f}s  {'ok' if ok else 'FAILED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commit-delay", type=float, default=0.3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""
+Checks of the alert webhook behaviour that the load benchmark
+(bench/webhooks.py) does not look at.
+
+Calls the app in-process through FastAPI's TestClient (with the membership
+check overridden) on the in-memory store, or on the Firestore emulator
+when FIRESTORE_EMULATOR_HOST is set, and fails when a check does:
+
+    python bench/webhook_checks.py
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import pickle  # noqa: F401
+
+if os.getenv("FIRESTORE_EMULATOR_HOST"):
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "status24-bench")
+    os.environ["STORAGE_BACKEND"] = "firestore"
+else:
+    os.environ["STORAGE_BACKEND"] = "memory"
+
+import anyio
+from fastapi.testclient import TestClient
+
+# Imported after pickle: it probes for a Jython "org" package, which the
+# repo's org.py would otherwise shadow.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import org  # noqa: E402
+import store  # noqa: E402
+from alert_queue import alert_queue  # noqa: E402
+from main import app  # noqa: E402
+
+ORG_ID = f"org_bench_webhooks_{int(datetime.now(timezone.utc).timestamp())}"
+
+
+def wait_until_applied():
+    deadline = time.monotonic() + 10
+    while alert_queue.depth() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def main():
+    app.dependency_overrides[org.verify_org_member] = lambda: {
+        "organization": {"id": ORG_ID, "slug": "bench"},
+        "role": "org:admin",
+    }
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append((name, ok, detail))
+
+    with TestClient(app) as client:
+        client.post("/org/add-service", json={
+            "organizationId": ORG_ID, "name": "API", "type": "api", "status": "operational",
+        })
+        secret = client.post("/webhooks/secret", json={"organizationId": ORG_ID}).json()["secret"]
+        headers = {"Authorization": "Bearer " + secret}
+
+        # Clients read organization documents directly, so the secret must not be in one
+        org_data = anyio.run(store.get_organization, ORG_ID)
+        check("secret not in organization document", secret not in json.dumps(org_data, default=str),
+              sorted(org_data or {}))
+        public = client.get(f"/public/{ORG_ID}/status")
+        check("secret not in public status", public.status_code == 200 and secret not in public.text,
+              public.status_code)
+        accepted = client.post(f"/webhooks/{ORG_ID}/alerts", json={"title": "Check"}, headers=headers)
+        check("secret accepted", accepted.status_code == 202, accepted.status_code)
+        wait_until_applied()
+
+        # A generic event without a start time that fires, resolves and fires again
+        def send(alert_status: str) -> dict:
+            response = client.post(f"/webhooks/{ORG_ID}/alerts", headers=headers, json={
+                "id": "no-start", "status": alert_status, "title": "Queue backlog",
+                "service": "API", "severity": "warning",
+            })
+            wait_until_applied()
+            page = client.get(f"/public/{ORG_ID}/status").json()
+            active = [i["id"] for i in page["active_incidents"] if i["title"] == "Queue backlog"]
+            return {"accepted": response.json()["accepted"], "service": page["services"][0]["status"],
+                    "active_incidents": len(active)}
+
+        for name, alert_status, expected in [
+            ("fire", "firing", {"accepted": 1, "service": "degraded", "active_incidents": 1}),
+            ("fire (repeat)", "firing", {"accepted": 0, "service": "degraded", "active_incidents": 1}),
+            ("resolve", "resolved", {"accepted": 1, "service": "operational", "active_incidents": 0}),
+            ("fire again", "firing", {"accepted": 1, "service": "degraded", "active_incidents": 1}),
+            ("resolve again", "resolved", {"accepted": 1, "service": "operational", "active_incidents": 0}),
+        ]:
+            result = send(alert_status)
+            check(f"no start time: {name}", result == expected, result)
+        # The same once the dedupe window has passed (or the process restarted)
+        alert_queue._last_status.clear()
+        result = send("firing")
+        check("no start time: fire after dedupe window", result == {
+            "accepted": 1, "service": "degraded", "active_incidents": 1}, result)
+
+    failed = False
+    for name, ok, detail in results:
+        failed = failed or not ok
+        print(f"{name:44} {'ok' if ok else 'FAILED'}  {detail}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
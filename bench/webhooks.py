@@ -0,0 +1,111 @@
+"""
+Alert webhook benchmark: acknowledgement latency and time until applied.
+
+Boots the app (in-memory store), gives --orgs organizations a service and
+a webhook secret, then posts --alerts Alertmanager-style alerts spread over
+them from --concurrency senders, every one of them twice (Alertmanager
+re-sends). Reports the 202 latency, how long the queue took to apply
+everything, the duplicates caught and the store writes made:
+
+    python bench/webhooks.py --orgs 20 --alerts 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import httpx
+
+from endpoints import REPO_ROOT, make_signing_key, session_token, start_app
+
+
+def alert(number: int, service: str) -> dict:
+    return {
+        "status": "firing",
+        "labels": {"alertname": f"Bench{number}", "service": service, "severity": "warning"},
+        "annotations": {"summary": f"Bench alert {number}"},
+        "startsAt": "2026-01-01T00:00:00Z",
+        "fingerprint": f"bench{number}",
+    }
+
+
+def store_writes(metrics_text: str) -> dict:
+    writes = {}
+    for line in metrics_text.splitlines():
+        if line.startswith("upstream_requests_total") and 'outcome="ok"' in line:
+            operation = line.split('operation="')[1].split('"')[0]
+            if operation in ("update_service_statuses", "create_incident"):
+                writes[operation] = writes.get(operation, 0) + int(float(line.rsplit(" ", 1)[1]))
+    return writes
+
+
+async def main(args):
+    key = make_signing_key()
+    sys.path.insert(0, REPO_ROOT)
+    from main import app
+
+    server, base_url = start_app(app)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        secrets = {}
+        for number in range(args.orgs):
+            org_id = f"org_bench{number}"
+            member = {"Authorization": "Bearer " + session_token(key, org_id=org_id, org_slug=org_id, org_role="admin")}
+            await http.post("/org/add-service", headers=member, json={
+                "organizationId": org_id, "name": "api", "type": "api", "status": "operational"})
+            secrets[org_id] = (await http.post("/webhooks/secret", headers=member,
+                                               json={"organizationId": org_id})).json()["secret"]
+
+        before = store_writes((await http.get("/metrics")).text)
+        org_ids = list(secrets)
+        requests = [(org_ids[number % len(org_ids)], alert(number, "api")) for number in range(args.alerts)] * 2
+        latencies, statuses = [], {}
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def send(org_id: str, payload: dict):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await http.post(f"/webhooks/{org_id}/alerts", json={"alerts": [payload]},
+                                           headers={"Authorization": "Bearer " + secrets[org_id]})
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(org_id, payload) for org_id, payload in requests))
+        acknowledged = time.perf_counter() - start
+        while True:
+            metrics_text = (await http.get("/metrics")).text
+            if "webhook_queue_depth 0" in metrics_text.splitlines():
+                break
+            await asyncio.sleep(0.01)
+        applied = time.perf_counter() - start
+        after = store_writes(metrics_text)
+
+    latencies.sort()
+    result = {
+        "orgs": args.orgs,
+        "alerts": args.alerts,
+        "requests": len(requests),
+        "statuses": statuses,
+        "ack_ms": {
+            "p50": round(statistics.median(latencies) * 1000, 2),
+            "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        },
+        "all_acknowledged_seconds": round(acknowledged, 3),
+        "all_applied_seconds": round(applied, 3),
+        "store_writes": {operation: count - before.get(operation, 0) for operation, count in after.items()},
+    }
+    server.should_exit = True
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orgs", type=int, default=20)
+    parser.add_argument("--alerts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,82 @@
+"""
+Circuit breaker for calls to an upstream service.
+
+- closed: calls go through. After `failure_threshold` consecutive failures
+  the circuit opens.
+- open: calls are refused at once for `reset_timeout` seconds, so an outage
+  costs callers nothing instead of a timeout (and retries) each.
+- half-open: then up to `half_open_max_calls` trial calls go through. A
+  success closes the circuit, a failure opens it again.
+
+The breaker only keeps state; callers ask `allow()` before each attempt and
+report its outcome with `record_success()` / `record_failure()`.
+"""
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+# Index of each state, e.g. for a metrics gauge
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self._changed_at = time.monotonic()
+        self._trials = 0
+        self.opened = 0
+        self.rejected = 0
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            print(f"{self.name} circuit {self.state} -> {state}")
+            self.state = state
+        self._changed_at = time.monotonic()
+        self._trials = 0
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now."""
+        if self.state == CLOSED:
+            return True
+        elapsed = time.monotonic() - self._changed_at
+        if self.state == OPEN:
+            if elapsed < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self._set_state(HALF_OPEN)
+        elif elapsed >= self.reset_timeout:
+            # Trial calls that never reported back (cancelled) do not block
+            # the half-open state forever
+            self._set_state(HALF_OPEN)
+        if self._trials >= self.half_open_max_calls:
+            self.rejected += 1
+            return False
+        self._trials += 1
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self.opened += 1
+            self._set_state(OPEN)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "seconds_in_state": round(time.monotonic() - self._changed_at, 1),
+        }
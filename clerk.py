@@ -0,0 +1,176 @@
+import asyncio
+import os
+import random
+from typing import TYPE_CHECKING
+
+from dotenv import load_dotenv
+
+import metrics
+from circuit_breaker import CircuitBreaker
+
+if TYPE_CHECKING:
+    import httpx
+
+load_dotenv()
+
+CLERK_API_KEY = os.getenv("CLERK_API_KEY")
+CLERK_API_URL = os.getenv("CLERK_API_URL", "https://api.clerk.dev/v1")
+
+CLERK_POOL_SIZE = int(os.getenv("CLERK_POOL_SIZE", "20"))
+CLERK_TIMEOUT = float(os.getenv("CLERK_TIMEOUT", "5"))
+CLERK_MAX_RETRIES = int(os.getenv("CLERK_MAX_RETRIES", "2"))
+CLERK_RETRY_BACKOFF = float(os.getenv("CLERK_RETRY_BACKOFF", "0.2"))
+CLERK_MAX_CONCURRENCY = int(os.getenv("CLERK_MAX_CONCURRENCY", "50"))
+# Consecutive failed attempts before calls to Clerk fail fast, and for how long
+CLERK_BREAKER_FAILURES = int(os.getenv("CLERK_BREAKER_FAILURES", "5"))
+CLERK_BREAKER_RESET = float(os.getenv("CLERK_BREAKER_RESET", "30"))
+
+# Safe to repeat even if the first attempt reached Clerk.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class ClerkUnavailableError(Exception):
+    """Raised when Clerk could not be reached after all retries."""
+
+
+class ClerkCircuitOpenError(ClerkUnavailableError):
+    """Raised without calling Clerk while its circuit breaker is open."""
+
+
+class ClerkClient:
+    """
+    Asyncio client for Clerk's backend API.
+    - One pooled keep-alive httpx.AsyncClient shared by every caller.
+    - Per-call timeouts, retries with exponential backoff and jitter.
+    - A semaphore caps the number of concurrent upstream calls.
+    - A circuit breaker fails calls fast while Clerk keeps failing, letting
+      one trial call through every CLERK_BREAKER_RESET seconds.
+    """
+
+    def __init__(self, base_url=CLERK_API_URL, api_key=CLERK_API_KEY, timeout=CLERK_TIMEOUT,
+                 max_retries=CLERK_MAX_RETRIES, backoff=CLERK_RETRY_BACKOFF,
+                 max_concurrency=CLERK_MAX_CONCURRENCY, pool_size=CLERK_POOL_SIZE,
+                 breaker_failures=CLERK_BREAKER_FAILURES, breaker_reset=CLERK_BREAKER_RESET):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.breaker = CircuitBreaker("clerk", failure_threshold=breaker_failures, reset_timeout=breaker_reset)
+        self._semaphore = None
+        self._client = None
+        self._loop = None
+
+    def _bind(self):
+        # The pool and semaphore belong to the event loop that first uses them.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._client = None
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        self._bind()
+        if self._client is None or self._client.is_closed:
+            # httpx loads with the first Clerk call rather than at process start
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+        return self._client
+
+    def _retry_delay(self, attempt: int, response: "httpx.Response" = None) -> float:
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            return float(response.headers["Retry-After"])
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def request(self, method: str, path: str, *, timeout: float = None, retry_rate_limited: bool = True,
+                      **kwargs) -> "httpx.Response":
+        """
+        Send a request to Clerk and return the response, whatever its status.
+        Transport errors and 429/5xx answers are retried; non-idempotent calls
+        are only retried when the request provably did not reach Clerk.
+        Callers pacing themselves pass retry_rate_limited=False to get 429s
+        back at once.
+        Raises ClerkUnavailableError once retries are exhausted, and
+        ClerkCircuitOpenError without calling Clerk while the circuit is open.
+        """
+        method = method.upper()
+        if not self.breaker.allow():
+            raise ClerkCircuitOpenError(f"{method} {path}: Clerk circuit is open")
+        # Grouped by resource so ids do not end up in metric labels
+        operation = f"{method} /{path.strip('/').split('/')[0]}"
+        with metrics.upstream_call("clerk", operation) as outcome:
+            response = await self._request(method, path, timeout=timeout,
+                                           retry_rate_limited=retry_rate_limited, **kwargs)
+            outcome["error"] = response.status_code == 429 or response.status_code >= 500
+            return response
+
+    async def _request(self, method: str, path: str, *, timeout: float = None, retry_rate_limited: bool = True,
+                       **kwargs) -> "httpx.Response":
+        import httpx
+
+        idempotent = method in IDEMPOTENT_METHODS
+        timeout = timeout if timeout is not None else self.timeout
+        attempt = 0
+        while True:
+            try:
+                client = self.client
+                async with self._semaphore:
+                    response = await client.request(method, path, timeout=timeout, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                self.breaker.record_failure()
+                error = e
+                response = None
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                if not idempotent:
+                    raise ClerkUnavailableError(f"{method} {path} failed: {e}") from e
+                error = e
+                response = None
+            else:
+                # A 429 means Clerk is up but wants fewer calls: that is for
+                # the Retry-After backoff below, not for the breaker
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if response.status_code == 429:
+                    retryable = retry_rate_limited
+                else:
+                    retryable = idempotent and response.status_code in RETRYABLE_STATUS
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                error = None
+
+            if attempt >= self.max_retries:
+                raise ClerkUnavailableError(f"{method} {path} failed: {error}") from error
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+            if not self.breaker.allow():
+                raise ClerkCircuitOpenError(f"{method} {path}: Clerk circuit is open") from error
+
+    async def get(self, path: str, **kwargs) -> "httpx.Response":
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> "httpx.Response":
+        return await self.request("POST", path, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+clerk = ClerkClient()
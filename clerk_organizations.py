@@ -0,0 +1,141 @@
+"""
+Cached list of every Clerk organization, for the admin API.
+
+Clerk returns organizations one page at a time. The first page carries the
+total count; the remaining pages are then requested concurrently (up to
+CLERK_ORGS_CONCURRENCY at a time) and merged. The merged list is kept for
+CLERK_ORGS_TTL seconds and shared by concurrent callers, so searching and
+filtering run in memory. When Clerk cannot be queried, the last list is
+served however old it is.
+"""
+import asyncio
+import os
+import time
+
+from clerk import clerk, ClerkUnavailableError
+
+CLERK_ORGS_TTL = float(os.getenv("CLERK_ORGS_TTL", "60"))
+# Clerk caps the page size of GET /organizations at 500
+CLERK_ORGS_PAGE_SIZE = int(os.getenv("CLERK_ORGS_PAGE_SIZE", "500"))
+CLERK_ORGS_CONCURRENCY = int(os.getenv("CLERK_ORGS_CONCURRENCY", "8"))
+
+
+class OrganizationListError(Exception):
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def summarize(org: dict) -> dict:
+    return {"id": org.get("id"), "name": org.get("name"), "slug": org.get("slug")}
+
+
+def matches(org: dict, query: str) -> bool:
+    """Case-insensitive: a substring of the name, or a prefix of the id or slug."""
+    return (
+        query in (org.get("name") or "").lower()
+        or (org.get("id") or "").lower().startswith(query)
+        or (org.get("slug") or "").lower().startswith(query)
+    )
+
+
+class ClerkOrganizationDirectory:
+    def __init__(self, ttl: float = CLERK_ORGS_TTL, page_size: int = CLERK_ORGS_PAGE_SIZE,
+                 concurrency: int = CLERK_ORGS_CONCURRENCY):
+        self.ttl = ttl
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self._organizations = None
+        self._loaded_at = 0.0
+        self._expires_at = 0.0
+        self._loading = None
+        self.loads = 0
+        self.page_requests = 0
+        self.fallback_hits = 0
+
+    async def _fetch_page(self, offset: int) -> dict:
+        self.page_requests += 1
+        try:
+            response = await clerk.get("/organizations", params={"limit": self.page_size, "offset": offset})
+        except ClerkUnavailableError as e:
+            raise OrganizationListError(str(e), status_code=503)
+        if response.status_code != 200:
+            raise OrganizationListError("Error fetching organizations from Clerk", response.status_code)
+        return response.json()
+
+    async def _load(self):
+        first = await self._fetch_page(0)
+        pages = [first.get("data", [])]
+        total = first.get("total_count", len(pages[0]))
+        if len(pages[0]) >= self.page_size and total > len(pages[0]):
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def fetch(offset: int) -> list:
+                async with semaphore:
+                    return (await self._fetch_page(offset)).get("data", [])
+
+            pages += await asyncio.gather(*(fetch(offset) for offset in range(self.page_size, total, self.page_size)))
+
+        # Organizations created while paging shift the offsets, so the same
+        # one can show up on two pages
+        merged = {}
+        for page in pages:
+            for org in page:
+                merged[org.get("id")] = summarize(org)
+        self._organizations = sorted(merged.values(), key=lambda org: ((org["name"] or "").lower(), org["id"]))
+        self._loaded_at = time.monotonic()
+        self._expires_at = self._loaded_at + self.ttl
+        self.loads += 1
+
+    def _on_loaded(self, task: asyncio.Task):
+        if self._loading is task:
+            self._loading = None
+
+    async def all(self) -> list:
+        """Every organization ({"id", "name", "slug"}), sorted by name, reloading past the TTL."""
+        if self._organizations is None or time.monotonic() >= self._expires_at:
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(self._load())
+                self._loading.add_done_callback(self._on_loaded)
+            try:
+                # Shielded so one caller disconnecting does not cancel the shared load.
+                await asyncio.shield(self._loading)
+            except OrganizationListError as e:
+                if self._organizations is None:
+                    raise
+                print("Serving cached Clerk organizations:", e)
+                self.fallback_hits += 1
+        return self._organizations
+
+    async def search(self, query: str = None, limit: int = None) -> tuple:
+        """Return (matching organizations, number of matches), at most `limit` of them."""
+        organizations = await self.all()
+        if query:
+            query = query.strip().lower()
+            organizations = [org for org in organizations if matches(org, query)]
+        return (organizations[:limit] if limit else organizations), len(organizations)
+
+    def add(self, org: dict):
+        """Record an organization the admin API has just created."""
+        if self._organizations is None:
+            return
+        org = summarize(org)
+        self._organizations = sorted(
+            [o for o in self._organizations if o["id"] != org["id"]] + [org],
+            key=lambda o: ((o["name"] or "").lower(), o["id"]),
+        )
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "organizations": len(self._organizations or []),
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._organizations is not None else None,
+            "loads": self.loads,
+            "page_requests": self.page_requests,
+            "fallback_hits": self.fallback_hits,
+        }
+
+
+organization_directory = ClerkOrganizationDirectory()
@@ -0,0 +1,135 @@
+"""
+Response compression negotiated from Accept-Encoding: brotli when the
+`brotli` package is installed and the client accepts it, otherwise gzip.
+
+Left as is: bodies smaller than COMPRESS_MIN_SIZE bytes, responses that
+already carry a Content-Encoding, media types that do not compress (images,
+archives) and Server-Sent Events streams, which must reach clients event by
+event. Other streaming bodies are compressed chunk by chunk, flushed after
+each one. Strong ETags become weak, since the bytes depend on the encoding.
+"""
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# 4-5 is brotli's sweet spot for on-the-fly compression; 11 is for static files
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+def negotiate(accept_encoding: str):
+    """Pick the encoder class for an Accept-Encoding header, or None."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return BrotliEncoder
+    if "gzip" in accepted or "*" in accepted:
+        return GzipEncoder
+    return None
+
+
+def compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("text/event-stream"):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with gzip or brotli."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoder_class = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoder_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        # The start message is held until the first body chunk shows whether
+        # the response gets compressed
+        state = {"start": None, "encoder": None, "passthrough": False}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+            if start is not None:
+                state["start"] = None
+                headers = MutableHeaders(scope=start)
+                if not compressible(headers) or (not more_body and len(body) < self.minimum_size):
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+                state["encoder"] = encoder_class()
+                headers["Content-Encoding"] = encoder_class.name
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                body = state["encoder"].compress(body, final=not more_body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+            else:
+                body = state["encoder"].compress(body, final=not more_body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
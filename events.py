@@ -0,0 +1,119 @@
+"""
+In-process fan-out of live status changes to Server-Sent Events clients.
+
+The org.py write paths publish small diff events ("service X -> degraded",
+"incident Y new message") per organization; every connected client of that
+organization gets them through its own bounded buffer. A client that falls
+BUFFER_SIZE events behind is evicted and told to reconnect, so one slow
+consumer never holds memory or slows the others down.
+
+Events only reach clients connected to the worker that handled the write;
+the public snapshot TTL bounds how stale clients on other workers can be.
+"""
+import asyncio
+import itertools
+import os
+from collections import deque
+
+import serialization
+
+SSE_BUFFER_SIZE = int(os.getenv("SSE_BUFFER_SIZE", "64"))
+SSE_REPLAY_SIZE = int(os.getenv("SSE_REPLAY_SIZE", "100"))
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", "10000"))
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscriber:
+    def __init__(self, org_id: str, buffer_size: int):
+        self.org_id = org_id
+        # (event id, formatted message)
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.evicted = False
+
+
+def format_sse(event_id, event: str, data: str) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+class EventBroker:
+    def __init__(self, buffer_size: int = SSE_BUFFER_SIZE, replay_size: int = SSE_REPLAY_SIZE,
+                 max_clients: int = SSE_MAX_CLIENTS):
+        self.buffer_size = buffer_size
+        self.replay_size = replay_size
+        self.max_clients = max_clients
+        self._subscribers = {}
+        self._replay = {}
+        self._ids = itertools.count(1)
+        # Id of the newest event; snapshots record it to know which events they include
+        self.last_event_id = 0
+        self.clients = 0
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self, org_id: str, last_event_id: int = None) -> Subscriber:
+        if self.clients >= self.max_clients:
+            raise TooManySubscribers()
+        subscriber = Subscriber(org_id, self.buffer_size)
+        self._subscribers.setdefault(org_id, set()).add(subscriber)
+        self.clients += 1
+
+        # Replay what a reconnecting client missed, if still in the ring
+        if last_event_id is not None:
+            for event_id, message in self._replay.get(org_id, ()):
+                if event_id > last_event_id:
+                    self._offer(subscriber, (event_id, message))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.org_id)
+        if subscribers is not None and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            self.clients -= 1
+            if not subscribers:
+                del self._subscribers[subscriber.org_id]
+
+    def _offer(self, subscriber: Subscriber, item: tuple):
+        try:
+            subscriber.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Slow consumer: drop it rather than buffer without bound
+            subscriber.evicted = True
+            self.evictions += 1
+            self.unsubscribe(subscriber)
+
+    def publish(self, org_id: str, event: str, data: dict):
+        """Send one event to every client of the organization."""
+        event_id = self.last_event_id = next(self._ids)
+        message = format_sse(event_id, event, serialization.dumps(data).decode())
+        self.published += 1
+
+        replay = self._replay.get(org_id)
+        if replay is None:
+            replay = self._replay[org_id] = deque(maxlen=self.replay_size)
+        replay.append((event_id, message))
+
+        for subscriber in list(self._subscribers.get(org_id, ())):
+            self._offer(subscriber, (event_id, message))
+
+    def stats(self) -> dict:
+        return {
+            "clients": self.clients,
+            "organizations": len(self._subscribers),
+            "published": self.published,
+            "evictions": self.evictions,
+        }
+
+
+broker = EventBroker()
+
+
+def publish(org_id: str, event: str, data: dict):
+    broker.publish(org_id, event, data)
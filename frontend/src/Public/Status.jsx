@@ -1,9 +1,8 @@
 import React, { useEffect, useState } from "react";
-import { firestore as db } from '../firebase';
 import { Badge } from "@/components/ui/badge";
-import { collection, query, where, getDocs, doc, getDoc, onSnapshot } from "firebase/firestore";
 import { Globe, Database, ArrowLeftRight} from 'lucide-react'
 import { format } from 'date-fns';
+import UptimeGraph from "@/components/uptime-graph";
 
 const statusColors = {
   'operational': 'bg-emerald-500',
@@ -32,6 +31,9 @@ const incidentStatusColors = {
   'resolved': 'bg-green-500'
 };
 
+const STATUS_POLL_INTERVAL = 120000;
+const UPTIME_DAYS = 60;
+
 const ServiceIcon = {
   db: Database,
   website: Globe,
@@ -55,58 +57,85 @@ export default function Status({ orgId }) {
   const [services, setServices] = useState([]);
   const [incidents, setIncidents] = useState([]);
   const [organization, setOrganization] = useState(null);
+  const [uptime, setUptime] = useState([]);
+
+  const [streamGeneration, setStreamGeneration] = useState(0);
+
+  const applySnapshot = (snapshot) => {
+    setOrganization({ id: snapshot.organizationId, status: snapshot.status });
+    setServices(snapshot.services);
+    setIncidents([...snapshot.active_incidents, ...snapshot.recent_incidents]);
+  };
 
   useEffect(() => {
     if (!orgId) return;
 
-    const unsubscribe = onSnapshot(
-      doc(db, "organizations", orgId),
-      (docSnapshot) => {
-        if (docSnapshot.exists()) {
-          const orgData = { id: docSnapshot.id, ...docSnapshot.data() };
-          setOrganization(orgData);
-
-          if (orgData.services) {
-            // Convert services object to array with stable IDs
-            const servicesArray = Object.entries(orgData.services).map(([key, service]) => ({
-              ...service,
-              id: service.id || key // Use the object key as fallback ID
-            }));
-
-            // Sort services by createdAt
-            const sortedServices = servicesArray.sort((a, b) => {
-              // If no createdAt, use name for stable sorting
-              if (!a.createdAt && !b.createdAt) {
-                return a.name.localeCompare(b.name);
-              }
-              
-              // If only one has createdAt, put the one without at the end
-              if (!a.createdAt) return 1;
-              if (!b.createdAt) return -1;
-
-              // Convert timestamps to milliseconds
-              const timeA = a.createdAt?.seconds ? a.createdAt.seconds * 1000 : 0;
-              const timeB = b.createdAt?.seconds ? b.createdAt.seconds * 1000 : 0;
-
-              return timeB - timeA; // Newest first
-            });
-
-            console.log('Services before sorting:', servicesArray);
-            console.log('Services after sorting:', sortedServices);
-            setServices(sortedServices);
-          }
-
-          if (orgData.incidents) {
-            setIncidents(Object.values(orgData.incidents));
-          }
-        }
-      },
-      (error) => {
-        console.error("Error listening to organization data:", error);
-      }
+    // Cached snapshot from the API; the browser revalidates it with its ETag.
+    // Live updates come over the event stream, polling is only a fallback.
+    const fetchStatus = () => {
+      fetch(`${import.meta.env.VITE_API_URL}/public/${orgId}/status`)
+        .then((response) => {
+          if (!response.ok) throw new Error(`Status request failed: ${response.status}`);
+          return response.json();
+        })
+        .then(applySnapshot)
+        .catch((error) => console.error("Error fetching status:", error));
+    };
+
+    fetchStatus();
+    const interval = setInterval(fetchStatus, STATUS_POLL_INTERVAL);
+    return () => clearInterval(interval);
+  }, [orgId]);
+
+  useEffect(() => {
+    if (!orgId) return;
+
+    const source = new EventSource(`${import.meta.env.VITE_API_URL}/public/${orgId}/events`);
+    const on = (event, handler) =>
+      source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+
+    on("snapshot", applySnapshot);
+    on("service.created", ({ service }) =>
+      setServices((prev) => [...prev.filter((s) => s.id !== service.id), service])
+    );
+    on("service.status", ({ serviceId, status }) =>
+      setServices((prev) =>
+        prev.map((s) =>
+          s.id === serviceId ? { ...s, status, updated_at: new Date().toISOString() } : s
+        )
+      )
+    );
+    on("service.deleted", ({ serviceId }) =>
+      setServices((prev) => prev.filter((s) => s.id !== serviceId))
+    );
+    on("incident.created", ({ incident }) =>
+      setIncidents((prev) => [{ ...incident, messages: {} }, ...prev])
+    );
+    on("incident.message", ({ incidentId, status, message }) =>
+      setIncidents((prev) =>
+        prev.map((i) =>
+          i.id === incidentId
+            ? { ...i, status, messages: { ...i.messages, [message.id]: message } }
+            : i
+        )
+      )
     );
+    // Fell too far behind: start a fresh stream, which begins with a snapshot
+    on("evicted", () => {
+      source.close();
+      setStreamGeneration((n) => n + 1);
+    });
 
-    return () => unsubscribe();
+    return () => source.close();
+  }, [orgId, streamGeneration]);
+
+  useEffect(() => {
+    if (!orgId) return;
+
+    fetch(`${import.meta.env.VITE_API_URL}/org/${orgId}/uptime?days=${UPTIME_DAYS}`)
+      .then((response) => (response.ok ? response.json() : { data: [] }))
+      .then(({ data }) => setUptime(data))
+      .catch((error) => console.error("Error fetching uptime:", error));
   }, [orgId]);
 
   return (
@@ -122,8 +151,8 @@ export default function Status({ orgId }) {
                   <h3 className="text-lg font-medium text-white">{service.name}</h3>
                 </div>
                 <span className="text-xs text-zinc-500 mt-1">
-                {service.updated_at?.seconds ? (
-                  format(new Date(service.updated_at.seconds * 1000), 'MMM d, h:mm a')
+                {service.updated_at ? (
+                  format(new Date(service.updated_at), 'MMM d, h:mm a')
                 ) : (
                   'Not available'
                 )}
@@ -142,6 +171,21 @@ export default function Status({ orgId }) {
           </div>
         ))}
       </div>
+      {uptime.length > 0 && (
+        <>
+          <h2 className="text-2xl font-semibold text-white mb-6">Uptime</h2>
+          <div className="grid gap-6 max-w-4xl mx-auto overflow-x-auto">
+            {uptime.map((service) => (
+              <UptimeGraph
+                key={service.id}
+                name={service.name}
+                data={service.data}
+                uptime={service.uptime ?? 100}
+              />
+            ))}
+          </div>
+        </>
+      )}
       <h2 className="text-2xl font-semibold text-white mb-6">Incidents</h2>
       <div className="space-y-6 max-w-4xl mx-auto">
         {incidents
@@ -195,7 +239,7 @@ export default function Status({ orgId }) {
                 <div className="mt-6 space-y-4">
                   <div className="border-l-2 border-zinc-800 space-y-4">
                     {Object.values(incident.messages)
-                      .sort((a, b) => (b.timestamp?.seconds || 0) - (a.timestamp?.seconds || 0))
+                      .sort((a, b) => new Date(b.timestamp || 0) - new Date(a.timestamp || 0))
                       .map((message, index) => (
                         <div key={message.id} className="pl-4 relative">
                           <div className="absolute -left-[9px] top-2 w-4 h-4 rounded-full bg-background border-2 border-zinc-800" />
@@ -222,8 +266,8 @@ export default function Status({ orgId }) {
               )}
               
               <div className="flex items-center gap-2 text-sm text-zinc-500 pt-4">
-                {incident.resolvedAt && (
-                  <span>Resolved {formatDate(incident.resolvedAt)}</span>
+                {incident.resolved_at && (
+                  <span>Resolved {formatDate(incident.resolved_at)}</span>
                 )}
               </div>
             </div>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { Plus} from 'lucide-react';
 import { Button } from '../components/ui/button';
 import {
@@ -50,6 +50,9 @@ export default function Incident() {
     affectedServices: []
   });
   const [incidents, setIncidents] = useState([]);
+  // Filters are applied by the API, which queries its incident indexes
+  const [serviceFilter, setServiceFilter] = useState('all');
+  const [statusFilter, setStatusFilter] = useState('all');
 
   useEffect(() => {
     if (!isDialogOpen) {
@@ -89,31 +92,37 @@ export default function Incident() {
     return () => unsubscribe();
   }, [organization?.id]);
 
-  useEffect(() => {
+  const fetchIncidents = useCallback(async () => {
     if (!organization?.id) return;
 
-    const unsubscribe = onSnapshot(
-      doc(db, 'organizations', organization.id),
-      (doc) => {
-        if (doc.exists()) {
-          const incidentsData = doc.data()?.incidents || {};
-          const incidentsArray = Object.entries(incidentsData).map(([id, incident]) => ({
-            id,
-            ...incident
-          })).sort((a, b) => new Date(b.datetime) - new Date(a.datetime));
-          setIncidents(incidentsArray);
-        } else {
-          setIncidents([]);
-        }
-      },
-      (error) => {
-        console.error('Error fetching incidents:', error);
-        toast.error('Failed to load incidents');
+    try {
+      const token = await getToken();
+      const params = new URLSearchParams({
+        organizationId: organization.id,
+        include_messages: 'true',
+        limit: '50',
+      });
+      if (serviceFilter !== 'all') params.set('serviceId', serviceFilter);
+      if (statusFilter !== 'all') params.set('status', statusFilter);
+      const response = await fetch(`${import.meta.env.VITE_API_URL}/org/incidents?${params}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+      if (!response.ok) {
+        throw new Error('Failed to load incidents');
       }
-    );
+      const { data } = await response.json();
+      setIncidents(data);
+    } catch (error) {
+      console.error('Error fetching incidents:', error);
+      toast.error('Failed to load incidents');
+    }
+  }, [organization?.id, getToken, serviceFilter, statusFilter]);
 
-    return () => unsubscribe();
-  }, [organization?.id]);
+  useEffect(() => {
+    fetchIncidents();
+  }, [fetchIncidents]);
 
   const handleAddIncidentSubmit = async (e) => {
     e.preventDefault();
@@ -148,6 +157,7 @@ export default function Incident() {
 
       toast.success('Incident added successfully');
       setIsDialogOpen(false);
+      fetchIncidents();
 
     } catch (error) {
       console.error('Error adding incident:', error);
@@ -165,10 +175,40 @@ export default function Incident() {
   return (
     <div className="container py-4 md:p-4">
       <h1 className="text-2xl font-bold mb-4">Incidents</h1>
+      <div className="flex flex-wrap gap-2 mb-4 max-w-4xl">
+        <Select value={serviceFilter} onValueChange={setServiceFilter}>
+          <SelectTrigger className="w-[220px]">
+            <SelectValue placeholder="Service" />
+          </SelectTrigger>
+          <SelectContent>
+            <SelectItem value="all">All services</SelectItem>
+            {services.map((service) => (
+              <SelectItem key={service.id} value={service.id}>
+                {service.name}
+              </SelectItem>
+            ))}
+          </SelectContent>
+        </Select>
+        <Select value={statusFilter} onValueChange={setStatusFilter}>
+          <SelectTrigger className="w-[180px]">
+            <SelectValue placeholder="Status" />
+          </SelectTrigger>
+          <SelectContent>
+            <SelectItem value="all">All statuses</SelectItem>
+            <SelectItem value="active">Open</SelectItem>
+            {incidentStatuses.map((status) => (
+              <SelectItem key={status.value} value={status.value}>
+                {status.label}
+              </SelectItem>
+            ))}
+          </SelectContent>
+        </Select>
+      </div>
       <IncidentList 
         organizationId={organization?.id}
         incidents={incidents}
         services={services}
+        onIncidentUpdated={fetchIncidents}
       />
 
       <Button
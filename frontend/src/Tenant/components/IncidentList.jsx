@@ -41,6 +41,12 @@ const statusColors = {
   'resolved': 'bg-green-500'
 };
 
+// Timestamps arrive either as Firestore Timestamps or as ISO strings from the API
+const toDate = (timestamp) => {
+  if (!timestamp) return null;
+  return timestamp.seconds ? new Date(timestamp.seconds * 1000) : new Date(timestamp);
+};
+
 export function IncidentList({ incidents, services, onIncidentUpdated }) {
   const { getToken } = useAuth();
   const organization = useUserStore((state) => state.organization);
@@ -127,8 +133,8 @@ export function IncidentList({ incidents, services, onIncidentUpdated }) {
                 </Badge>
               </div>
               <p className="text-sm text-muted-foreground mb-2">
-                {incident.datetime?.seconds ? (
-                  format(new Date(incident.datetime.seconds * 1000), 'MMM d, h:mm a')
+                {toDate(incident.datetime) ? (
+                  format(toDate(incident.datetime), 'MMM d, h:mm a')
                 ) : (
                   'Not available'
                 )}
@@ -168,14 +174,14 @@ export function IncidentList({ incidents, services, onIncidentUpdated }) {
                     <AccordionContent>
                       <div className="border-l-2 border-zinc-800 space-y-4 mt-2">
                         {Object.values(incident.messages)
-                          .sort((a, b) => (b.timestamp?.seconds || 0) - (a.timestamp?.seconds || 0))
+                          .sort((a, b) => (toDate(b.timestamp) || 0) - (toDate(a.timestamp) || 0))
                           .map((message) => (
                             <div key={message.id} className="pl-4 relative">
                               <div className="absolute -left-[9px] top-2 w-4 h-4 rounded-full bg-background border-2 border-zinc-800" />
                               <div className="flex items-center gap-2 mb-1">
                                 <span className="text-sm text-zinc-500">
-                                  {message.timestamp?.seconds ? (
-                                    format(new Date(message.timestamp.seconds * 1000), 'MMM d, h:mm a')
+                                  {toDate(message.timestamp) ? (
+                                    format(toDate(message.timestamp), 'MMM d, h:mm a')
                                   ) : 'Not available'}
                                 </span>
                                 <Badge 
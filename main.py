@@ -1,20 +1,63 @@
+import asyncio
 import os
-from typing import Union
+from contextlib import asynccontextmanager
+from typing import Optional, Union
 
-import requests
-import jwt  # install with: pip install pyjwt
-from fastapi import FastAPI, Depends, HTTPException, Header, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from google.cloud import firestore
 from admin import router as admin_router
 from org import router as org_router
+from public import router as public_router
+from webhooks import router as webhooks_router
+from auth import get_org_memberships, membership_resolver, verify_session_token, MembershipLookupError
+from circuit_breaker import STATES
+from compression import CompressionMiddleware
+from clerk import clerk, ClerkUnavailableError
+from org_details import org_details_cache, OrgDetailsLookupError
+from org_index import organization_index
+from status_writer import status_writer
+from alert_queue import alert_queue
+from events import broker
+import metrics
+from metrics import MetricsMiddleware
+from serialization import FastJSONResponse
+from prober import probe_engine, PROBER_ENABLED, PROBER_RELOAD_INTERVAL
+from archiver import archive_every, INCIDENT_ARCHIVE_INTERVAL
+from resources import registry, PREWARM_RESOURCES
 
 
 load_dotenv()
-db = firestore.Client()
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PROBER_ENABLED:
+        await probe_engine.start(reload_interval=PROBER_RELOAD_INTERVAL)
+    archiver = asyncio.create_task(archive_every(INCIDENT_ARCHIVE_INTERVAL)) if INCIDENT_ARCHIVE_INTERVAL else None
+    # Clients are created on first use; prewarming builds the listed ones
+    # in a thread while the first requests are already being served.
+    prewarm = asyncio.create_task(registry.prewarm(PREWARM_RESOURCES)) if PREWARM_RESOURCES else None
+    yield
+    if prewarm is not None:
+        await prewarm
+    if archiver is not None:
+        archiver.cancel()
+    if probe_engine.running:
+        await probe_engine.stop()
+    # Apply alerts already acknowledged to their senders.
+    await alert_queue.aclose()
+    # Commit status changes still waiting to be coalesced.
+    await status_writer.aclose()
+    # Close the pooled Clerk connections on shutdown.
+    await clerk.aclose()
+    # And the storage backend, if this process ever used it.
+    await registry.aclose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 firebase_secret = os.getenv("FIREBASE_SECRET")
 
@@ -27,11 +70,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-CLERK_API_KEY = os.getenv("CLERK_API_KEY", os.getenv("CLERK_API_KEY"))
-CLERK_API_URL = os.getenv("CLERK_API_URL", "https://api.clerk.dev/v1")
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so it times everything including CORS handling and compression.
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(admin_router)
 app.include_router(org_router)
+app.include_router(public_router)
+app.include_router(webhooks_router)
+
+# Internal queues and caches, read when /metrics is scraped.
+metrics.Gauge("status_writer_queue_depth", "Service status changes waiting to be written.",
+              function=lambda: status_writer.stats()["queue_depth"])
+metrics.Gauge("webhook_queue_depth", "Alerts received by webhooks and not applied yet.",
+              function=alert_queue.depth)
+metrics.Gauge("sse_clients", "Connected Server-Sent Events clients.",
+              function=lambda: broker.clients)
+metrics.Gauge("prober_checks", "Health checks scheduled in this process.",
+              function=lambda: probe_engine.stats()["checks"])
+metrics.Gauge("membership_cache_hit_ratio", "Hit ratio of the Clerk membership cache.",
+              function=lambda: membership_resolver.stats()["hit_ratio"])
+metrics.Gauge("clerk_circuit_state", "Clerk circuit breaker: 0 closed, 1 half-open, 2 open.",
+              function=lambda: STATES.index(clerk.breaker.state))
+
+
+@app.exception_handler(ClerkUnavailableError)
+async def clerk_unavailable_handler(request, exc: ClerkUnavailableError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication provider is unavailable, please retry."},
+    )
 
 
 @app.get("/")
@@ -39,12 +108,18 @@ def read_root():
     return {"message": "Welcome to the Status24 API"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Request, upstream and queue metrics in Prometheus' text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-def get_current_user_org(authorization: str = Header(None)):
+
+
+async def get_current_user_org(authorization: str = Header(None)):
     """
     Dependency that:
     1. Extracts the Clerk token from the Authorization header.
-    2. Decodes the token (in production, verify signature with Clerk's public keys).
+    2. Verifies the token signature locally against Clerk's JWKS.
     3. Retrieves the user's details securely from Clerk's API using the user id (sub claim).
     4. Returns the user's organization memberships.
     """
@@ -66,9 +141,8 @@ def get_current_user_org(authorization: str = Header(None)):
     token = parts[1]
 
     try:
-        # WARNING: For demonstration only.
-        # In production, verify the token using Clerk's public keys.
-        decoded_token = jwt.decode(token, options={"verify_signature": False})
+        # Verify the token signature locally using Clerk's public keys.
+        decoded_token = await verify_session_token(token)
         user_id = decoded_token.get("sub")
         if not user_id:
             raise HTTPException(
@@ -76,17 +150,14 @@ def get_current_user_org(authorization: str = Header(None)):
                 detail="Token does not contain a user id.",
             )
 
-        # Query Clerk's API for secure user data.
-        clerk_response = requests.get(
-            f"{CLERK_API_URL}/users/{user_id}/organization_memberships",
-            headers={"Authorization": f"Bearer {CLERK_API_KEY}"}
-        )
-        if clerk_response.status_code != 200:
+        # Query Clerk's API for secure user data (cached, shared resolver).
+        try:
+            user_data = await get_org_memberships(user_id)
+        except MembershipLookupError:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Could not verify user details from Clerk."
             )
-        user_data = clerk_response.json().get("data", [])
         return user_data
 
     except Exception as e:
@@ -109,20 +180,23 @@ def get_user_org(org: Union[dict, None] = Depends(get_current_user_org)):
 
 
 @app.get("/organizations-list")
-async def get_all_organizations():
+async def get_all_organizations(
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    start_after: Optional[str] = None,
+):
     """
-    Endpoint to retrieve all organization IDs from Firestore.
-    Returns a list of organization IDs.
+    Endpoint to retrieve organization IDs.
+    Without `limit` all IDs are returned; with it, one page in ID order plus
+    the `next_cursor` to pass back as `start_after`.
+    Served from an in-process index built with keys-only queries.
     """
     try:
-        # Get reference to organizations collection
-        orgs_ref = db.collection("organizations")
-        # Get all documents
-        docs = orgs_ref.stream()
-        # Extract organization IDs
-        org_ids = [doc.id for doc in docs]
-        
-        return {"organizations": org_ids}
+        if limit is None:
+            org_ids, next_cursor = await organization_index.ids(), None
+        else:
+            org_ids, next_cursor = await organization_index.page(limit, start_after)
+
+        return {"organizations": org_ids, "next_cursor": next_cursor}
     
     except Exception as e:
         raise HTTPException(
@@ -130,37 +204,47 @@ async def get_all_organizations():
             detail=f"Error retrieving organizations: {str(e)}"
         )
     
+# Browsers and CDNs may reuse organization details for a while too.
+ORG_DETAILS_CACHE_CONTROL = f"public, max-age={int(os.getenv('ORG_DETAILS_MAX_AGE', '300'))}"
+ORG_DETAILS_MAX_IDS = 100
+
+
 @app.get("/org-details")
-async def get_org_details(org_id: str):
+async def get_org_details(response: Response, org_id: Optional[str] = None, ids: Optional[str] = None):
     """
-    Endpoint to get organization details from Clerk API.
-    Returns organization name and image URL.
+    Endpoint to get organization details (name and image URL).
+    `org_id` returns one organization's details; `ids=a,b,c` returns
+    {"organizations": {id: details or null}} for several at once.
+    Served from a long-lived cache that is refreshed from Clerk in the background.
     """
-    try:
-       
-        clerk_base_url = "https://api.clerk.dev/v1"
-        
-        response = requests.get(
-            f"{clerk_base_url}/organizations/{org_id}",
-            headers={
-                "Authorization": f"Bearer {CLERK_API_KEY}",
-                "Content-Type": "application/json"
-            }
+    if ids is None and org_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass org_id or ids"
         )
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Organization not found"
-            )
-            
-        org_data = response.json()
-        return {
-            "name": org_data.get("name"),
-            "image_url": org_data.get("image_url"),
-        }
-    except Exception as e:
+
+    org_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip())) if ids is not None else [org_id]
+    if not org_ids or len(org_ids) > ORG_DETAILS_MAX_IDS:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Pass between 1 and {ORG_DETAILS_MAX_IDS} organization ids"
+        )
+
+    try:
+        details = await org_details_cache.get_many(org_ids)
+    except OrgDetailsLookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Error retrieving organization details: {str(e)}"
         )
+
+    response.headers["Cache-Control"] = ORG_DETAILS_CACHE_CONTROL
+    if ids is not None:
+        return {"organizations": details}
+
+    if details[org_id] is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found"
+        )
+    return details[org_id]
@@ -0,0 +1,239 @@
+"""
+Request and upstream latency metrics, exposed at /metrics in Prometheus'
+text format.
+
+- MetricsMiddleware records per-route latency histograms, status codes and
+  the number of requests in flight.
+- `upstream(...)` times calls to Clerk and Firestore: call counts, latency
+  histograms and errors per upstream and operation.
+- With SLOW_REQUEST_SECONDS set, requests slower than that are logged with
+  the time spent in each upstream and in our own code.
+
+Metrics are per process; with several workers, scrape each one.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REGISTRY = []
+
+# {upstream: [seconds, calls]} for the request being handled
+_request_upstreams = ContextVar("request_upstreams", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def samples(self) -> list:
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {value}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, value: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels=(), function=None):
+        super().__init__(name, help, labels)
+        # Read at scrape time instead of being set, for unlabelled gauges
+        self.function = function
+
+    def inc(self, value: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, value: float = 1, **labels):
+        self.inc(-value, **labels)
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def samples(self) -> list:
+        if self.function is not None:
+            return [(self.name, "", self.function())]
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            # Per-bucket counts (not cumulative), then sum and count
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][i] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> list:
+        samples = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, f'le="{bound}"'), cumulative))
+            samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, 'le="+Inf"'), count))
+            samples.append((f"{self.name}_sum", _format_labels(self.labels, key), round(total, 6)))
+            samples.append((f"{self.name}_count", _format_labels(self.labels, key), count))
+        return samples
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests being handled.", ("method",))
+upstream_requests = Counter(
+    "upstream_requests_total", "Calls to upstream services by outcome.", ("upstream", "operation", "outcome"))
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency.", ("upstream", "operation"))
+
+
+@contextmanager
+def upstream_call(upstream: str, operation: str):
+    """
+    Time one upstream call. Yields a dict; set its "error" key to mark a call
+    that returned (rather than raised) an error.
+    """
+    outcome = {"error": False}
+    start = time.perf_counter()
+    try:
+        yield outcome
+    except BaseException:
+        outcome["error"] = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        upstream_requests.inc(upstream=upstream, operation=operation,
+                              outcome="error" if outcome["error"] else "ok")
+        upstream_request_duration.observe(elapsed, upstream=upstream, operation=operation)
+        breakdown = _request_upstreams.get()
+        if breakdown is not None:
+            totals = breakdown.setdefault(upstream, [0.0, 0])
+            totals[0] += elapsed
+            totals[1] += 1
+
+
+def spawn(coro) -> asyncio.Task:
+    """
+    Start background work (flushes, queue workers) outside the current
+    request's upstream breakdown; a task would otherwise inherit it and
+    charge its calls to whichever request happened to start it.
+    """
+    context = contextvars.copy_context()
+    context.run(_request_upstreams.set, None)
+    return asyncio.get_running_loop().create_task(coro, context=context)
+
+
+def upstream(name: str):
+    """Decorator timing an async function as an upstream call named after it."""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with upstream_call(name, function.__name__):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status and in-flight requests."""
+
+    def __init__(self, app, slow_request_seconds: float = SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        http_requests_in_flight.inc(method=method)
+        breakdown = {}
+        token = _request_upstreams.set(breakdown)
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_upstreams.reset(token)
+            http_requests_in_flight.dec(method=method)
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_requests.inc(method=method, route=route, status=status["code"])
+            http_request_duration.observe(elapsed, method=method, route=route)
+            if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+                log_slow_request(method, scope.get("path", ""), status["code"], elapsed, breakdown)
+
+
+def log_slow_request(method: str, path: str, status: int, elapsed: float, breakdown: dict):
+    upstream_seconds = sum(seconds for seconds, _ in breakdown.values())
+    parts = [
+        f"{name} {seconds:.3f}s/{calls} calls"
+        for name, (seconds, calls) in sorted(breakdown.items())
+    ]
+    # Concurrent upstream calls can add up to more than the wall time
+    parts.append(f"app {max(0.0, elapsed - upstream_seconds):.3f}s")
+    print(f"Slow request {method} {path} {status} {elapsed:.3f}s:", ", ".join(parts))
@@ -0,0 +1,88 @@
+"""
+One-shot migration of map-shaped incidents into subcollections.
+
+Older organization documents keep every incident (and its messages) in an
+`incidents` map field. This moves each one into
+organizations/{orgId}/incidents/{incidentId} with a messages subcollection,
+then removes the map from the organization document. Re-running it is safe:
+documents are written under their original ids.
+
+    python migrate_incidents.py              # every organization
+    python migrate_incidents.py --org org_123 --dry-run
+"""
+import argparse
+import asyncio
+
+from dotenv import load_dotenv
+from google.cloud import firestore
+
+load_dotenv()
+
+from store_firestore import FirestoreStore  # noqa: E402
+
+# The migration only applies to Firestore, whatever STORAGE_BACKEND says.
+store = FirestoreStore()
+
+# Firestore rejects batches with more than 500 writes.
+MAX_BATCH_WRITES = 500
+
+
+async def migrate_organization(org_id: str, dry_run: bool = False) -> int:
+    """Migrate one organization and return the number of incidents moved."""
+    org_data = await store.get_organization(org_id)
+    incidents = (org_data or {}).get("incidents")
+    if not incidents:
+        return 0
+
+    writes = []
+    for incident_id, incident in incidents.items():
+        messages = incident.get("messages") or {}
+        incident_doc = {k: v for k, v in incident.items() if k != "messages"}
+        incident_doc["id"] = incident_id
+        incident_doc["message_count"] = len(messages)
+        writes.append((store.incidents_ref(org_id).document(incident_id), incident_doc))
+        for message_id, message in messages.items():
+            writes.append((store.messages_ref(org_id, incident_id).document(message_id),
+                           {**message, "id": message_id}))
+
+    if dry_run:
+        print(f"{org_id}: would move {len(incidents)} incidents ({len(writes)} documents)")
+        return len(incidents)
+
+    for i in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = store.db.batch()
+        for ref, data in writes[i:i + MAX_BATCH_WRITES]:
+            batch.set(ref, data)
+        await batch.commit()
+
+    # Only drop the map once every incident has been copied
+    await store.org_ref(org_id).update({"incidents": firestore.DELETE_FIELD})
+    print(f"{org_id}: moved {len(incidents)} incidents ({len(writes)} documents)")
+    return len(incidents)
+
+
+async def iter_organization_ids(page_size: int = 1000):
+    cursor = None
+    while True:
+        ids, cursor = await store.list_organization_ids(page_size, cursor)
+        for org_id in ids:
+            yield org_id
+        if cursor is None:
+            return
+
+
+async def main(org_ids: list, dry_run: bool):
+    if not org_ids:
+        org_ids = [org_id async for org_id in iter_organization_ids()]
+    total = 0
+    for org_id in org_ids:
+        total += await migrate_organization(org_id, dry_run=dry_run)
+    print(f"Done: {total} incidents across {len(org_ids)} organizations")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--org", action="append", default=[], help="organization id (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would move without writing")
+    args = parser.parse_args()
+    asyncio.run(main(args.org, args.dry_run))
@@ -1,26 +1,34 @@
 import os
-import requests
-import jwt
-from fastapi import APIRouter, Depends, HTTPException, Header, status
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
+from pydantic import BaseModel, ConfigDict
 from dotenv import load_dotenv
-from google.cloud import firestore
-from datetime import datetime
+import events
+import prober
+import status_page
+from serialization import FastJSONResponse
+from status_writer import status_writer
+from org_index import organization_index
+import store
+import uptime
+from datetime import datetime, timedelta, timezone
 from typing import Optional
-
-db = firestore.Client()
+from auth import (
+    get_org_memberships,
+    membership_from_claims,
+    verify_session_token,
+    MembershipLookupError,
+    TokenVerificationError,
+)
 
 router = APIRouter(prefix="/org", tags=["Organization API"])
 
-CLERK_API_KEY = os.getenv("CLERK_API_KEY", os.getenv("CLERK_API_KEY"))
-CLERK_API_URL = os.getenv("CLERK_API_URL", "https://api.clerk.dev/v1")
-
-def verify_org_member(authorization: str = Header(...)):
+async def verify_org_member(authorization: str = Header(...)):
     """
     Dependency that:
     1. Extracts the Clerk token from the Authorization header
-    2. Verifies the token and gets user's organization membership
-    3. Returns the first organization membership
+    2. Verifies the token signature locally against Clerk's JWKS
+    3. Returns the active organization from the token claims, or the first
+       organization membership from Clerk when the token has no org claims
     """
     if not authorization:
         raise HTTPException(
@@ -37,11 +45,11 @@ def verify_org_member(authorization: str = Header(...)):
     
     token = parts[1]
     try:
-        decoded_token = jwt.decode(token, options={"verify_signature": False})
-    except Exception as e:
+        decoded_token = await verify_session_token(token)
+    except TokenVerificationError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Token decode failed: {str(e)}"
+            detail=f"Token verification failed: {str(e)}"
         )
     
     user_id = decoded_token.get("sub")
@@ -51,19 +59,19 @@ def verify_org_member(authorization: str = Header(...)):
             detail="User ID not found in token"
         )
 
-    # Fetch the user's organization memberships from Clerk
-    clerk_resp = requests.get(
-        f"{CLERK_API_URL}/users/{user_id}/organization_memberships",
-        headers={"Authorization": f"Bearer {CLERK_API_KEY}"}
-    )
-    
-    if clerk_resp.status_code != 200:
+    # The active organization is carried in the token, no lookup needed
+    claimed_membership = membership_from_claims(decoded_token)
+    if claimed_membership:
+        return claimed_membership
+
+    # Fetch the user's organization memberships (cached, shared resolver)
+    try:
+        org_memberships = await get_org_memberships(user_id)
+    except MembershipLookupError:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Failed to fetch user organization memberships from Clerk"
         )
-    
-    org_memberships = clerk_resp.json().get("data", [])
     if not org_memberships:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -73,11 +81,35 @@ def verify_org_member(authorization: str = Header(...)):
     # Return only the first organization membership
     return org_memberships[0]
 
+class ServiceCheck(BaseModel):
+    kind: str = "http"
+    url: Optional[str] = None
+    host: Optional[str] = None
+    port: Optional[int] = None
+    interval: int = 60
+    timeout: float = 10
+    expected_status: Optional[int] = None
+    degraded_latency_ms: Optional[int] = None
+
+async def validate_service_check(check: Optional[ServiceCheck]) -> Optional[dict]:
+    if check is None:
+        return None
+    try:
+        config = prober.validate_check(check.model_dump())
+        await prober.validate_destination(config)
+        return config
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid check: {str(e)}"
+        )
+
 class ServiceCreate(BaseModel):
     organizationId: str
     name: str
     type: str
     status: str
+    check: Optional[ServiceCheck] = None
 
 @router.post("/add-service")
 async def add_service(
@@ -95,37 +127,32 @@ async def add_service(
             detail="User is not authorized to add services to this organization"
         )
 
+    check = await validate_service_check(service.check)
+
     try:
-        # Reference to the organization document
-        org_ref = db.collection("organizations").document(service.organizationId)
-        
-        # Check if organization document exists, if not create it
-        org_doc = org_ref.get()
-        if not org_doc.exists:
-            org_ref.set({
-                "services": {}
-            })
-        elif "services" not in org_doc.to_dict():
-            # If document exists but no services field, initialize it
-            org_ref.update({
-                "services": {}
-            })
-        
         # Generate a unique ID for the service
-        service_id = db.collection("_").document().id
+        service_id = store.new_id()
 
         service_data = {
             "id": service_id,
             "name": service.name,
             "type": service.type,
             "status": service.status,
-            "created_at": firestore.SERVER_TIMESTAMP,
-            "updated_at": firestore.SERVER_TIMESTAMP
+            "status_since": datetime.now(timezone.utc),
+            "created_at": store.SERVER_TIMESTAMP,
+            "updated_at": store.SERVER_TIMESTAMP
         }
+        if check is not None:
+            service_data["check"] = check
         
-        # Update the organization document to add the new service
-        org_ref.update({
-            f"services.{service_id}": service_data
+        # Add the new service to the organization document
+        await store.create_service(service.organizationId, service_data)
+        if check is not None and prober.probe_engine.running:
+            prober.probe_engine.upsert(service.organizationId, service_data)
+        organization_index.add(service.organizationId)
+        status_page.invalidate(service.organizationId)
+        events.publish(service.organizationId, "service.created", {
+            "service": {k: service_data[k] for k in ("id", "name", "type", "status")}
         })
         
         # Return without SERVER_TIMESTAMP
@@ -168,17 +195,15 @@ async def update_service(
         )
 
     try:
-        org_ref = db.collection("organizations").document(service.organizationId)
-        org_doc = org_ref.get()
+        org_data = await store.get_organization(service.organizationId)
 
-        if not org_doc.exists:
+        if org_data is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Organization not found"
             )
 
         # Get the existing service data
-        org_data = org_doc.to_dict()
         service_data = org_data.get("services", {}).get(service.serviceId)
         
         if not service_data:
@@ -187,22 +212,204 @@ async def update_service(
                 detail="Service not found"
             )
 
-        # Only update status and updated_at timestamp
-        org_ref.update({
-            f"services.{service.serviceId}.status": service.status,
-            f"services.{service.serviceId}.updated_at": firestore.SERVER_TIMESTAMP
-        })
+        # Only update status and updated_at timestamp; a status change is
+        # also recorded to the uptime history. Changes to the same
+        # organization arriving together are committed as one write.
+        await status_writer.write(
+            service.organizationId,
+            service.serviceId,
+            service.status,
+            previous=service_data,
+        )
+        status_page.invalidate(service.organizationId)
+        if service_data.get("check") and prober.probe_engine.running:
+            # The checker starts from the status set by hand
+            prober.probe_engine.upsert(service.organizationId, {
+                **service_data,
+                "id": service.serviceId,
+                "status": service.status,
+                "status_since": datetime.now(timezone.utc)
+            })
+        if service_data.get("status") != service.status:
+            events.publish(service.organizationId, "service.status", {
+                "serviceId": service.serviceId,
+                "status": service.status
+            })
 
         return {
             "status": "success",
             "message": "Service status updated successfully"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update service: {str(e)}"
         )
 
+# One commit holds at most 500 writes: the org document, one history entry
+# per changed service and one rollup per touched day.
+MAX_BATCH_SERVICES = int(os.getenv("MAX_BATCH_SERVICES", "200"))
+
+async def commit_service_statuses(org_id: str, changes: list):
+    """
+    Write [(service_id, status, service as read)] in one commit, then
+    refresh the status page, the prober and live subscribers.
+    """
+    await store.update_service_statuses(org_id, changes)
+    status_page.invalidate(org_id)
+    for service_id, new_status, service_data in changes:
+        if service_data.get("check") and prober.probe_engine.running:
+            prober.probe_engine.upsert(org_id, {
+                **service_data,
+                "id": service_id,
+                "status": new_status,
+                "status_since": datetime.now(timezone.utc)
+            })
+        if service_data.get("status") != new_status:
+            events.publish(org_id, "service.status", {
+                "serviceId": service_id,
+                "status": new_status
+            })
+
+class ServiceStatusChange(BaseModel):
+    serviceId: str
+    status: str
+
+class ServiceBatchUpdate(BaseModel):
+    organizationId: str
+    updates: list[ServiceStatusChange]
+
+@router.put("/services:batch")
+async def update_services_batch(
+    batch: ServiceBatchUpdate,
+    org_membership: dict = Depends(verify_org_member)
+):
+    """
+    Update the status of several services in an organization at once.
+    The organization is read once, every item is validated against it, and all
+    valid changes are written in a single commit with a shared updated_at.
+    Returns a result per item; invalid items are reported and skipped.
+    """
+    org = org_membership.get("organization", {})
+    if org.get("id") != batch.organizationId:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not authorized to update services in this organization"
+        )
+    if not batch.updates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No updates given"
+        )
+    if len(batch.updates) > MAX_BATCH_SERVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_SERVICES} updates per batch"
+        )
+
+    try:
+        org_data = await store.get_organization(batch.organizationId)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update services: {str(e)}"
+        )
+    if org_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found"
+        )
+
+    services = org_data.get("services", {})
+    results = []
+    changes = []
+    seen = set()
+    for update in batch.updates:
+        service_data = services.get(update.serviceId)
+        if not service_data:
+            results.append({"serviceId": update.serviceId, "result": "error", "detail": "Service not found"})
+        elif update.serviceId in seen:
+            results.append({"serviceId": update.serviceId, "result": "error", "detail": "Duplicate serviceId in batch"})
+        else:
+            seen.add(update.serviceId)
+            changed = service_data.get("status") != update.status
+            changes.append((update.serviceId, update.status, service_data))
+            results.append({"serviceId": update.serviceId, "result": "updated", "changed": changed})
+
+    if changes:
+        try:
+            await commit_service_statuses(batch.organizationId, changes)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to update services: {str(e)}"
+            )
+
+    if len(changes) == len(batch.updates):
+        outcome = "success"
+    else:
+        outcome = "partial" if changes else "failed"
+    return {
+        "status": outcome,
+        "updated": len(changes),
+        "results": results
+    }
+
+class ServiceCheckUpdate(BaseModel):
+    organizationId: str
+    serviceId: str
+    check: Optional[ServiceCheck] = None
+
+@router.put("/service-check")
+async def update_service_check(
+    update: ServiceCheckUpdate,
+    org_membership: dict = Depends(verify_org_member)
+):
+    """
+    Set or remove (check: null) the automatic health check of a service.
+    While a check is configured, the prober sets the service's status from
+    its results.
+    """
+    org = org_membership.get("organization", {})
+    if org.get("id") != update.organizationId:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not authorized to update services in this organization"
+        )
+    check = await validate_service_check(update.check)
+
+    try:
+        org_data = await store.get_organization(update.organizationId)
+        service_data = (org_data or {}).get("services", {}).get(update.serviceId)
+        if not service_data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Service not found"
+            )
+
+        await store.set_service_check(update.organizationId, update.serviceId, check)
+        if prober.probe_engine.running:
+            prober.probe_engine.upsert(update.organizationId, {
+                **service_data,
+                "id": update.serviceId,
+                "check": check
+            })
+
+        return {
+            "status": "success",
+            "message": "Service check updated successfully",
+            "data": check
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update service check: {str(e)}"
+        )
+
 class ServiceDelete(BaseModel):
     serviceId: str
     organizationId: str
@@ -223,17 +430,23 @@ async def delete_service(
         )
 
     try:
-        org_ref = db.collection("organizations").document(service.organizationId)
-        
         # Delete the service using FieldValue.delete()
-        org_ref.update({
-            f"services.{service.serviceId}": firestore.DELETE_FIELD
+        await store.delete_service(service.organizationId, service.serviceId)
+        prober.probe_engine.remove(service.organizationId, service.serviceId)
+        status_page.invalidate(service.organizationId)
+        events.publish(service.organizationId, "service.deleted", {
+            "serviceId": service.serviceId
         })
 
         return {
             "status": "success",
             "message": "Service deleted successfully"
         }
+    except store.NotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -248,6 +461,36 @@ class IncidentCreate(BaseModel):
     datetime: datetime
     affectedServices: list[str]
 
+async def open_incident(org_id: str, title: str, description: str, incident_status: str, when: datetime,
+                        affected_services: list, incident_id: str = None, extra: Optional[dict] = None) -> dict:
+    """
+    Create an incident (with a new id unless one is given, and any `extra`
+    fields stored with it) and announce it.
+    """
+    incident_data = {
+        **(extra or {}),
+        "id": incident_id or store.new_id(),
+        "title": title,
+        "description": description,
+        "status": incident_status,
+        "datetime": when,
+        "affectedServices": affected_services,
+        "created_at": store.SERVER_TIMESTAMP,
+        "updated_at": store.SERVER_TIMESTAMP
+    }
+
+    # Add the new incident to the organization's incidents subcollection
+    await store.create_incident(org_id, incident_data)
+    organization_index.add(org_id)
+    status_page.invalidate(org_id)
+    events.publish(org_id, "incident.created", {
+        "incident": {
+            k: incident_data[k]
+            for k in ("id", "title", "description", "status", "datetime", "affectedServices")
+        }
+    })
+    return incident_data
+
 @router.post("/add-incident")
 async def add_incident(
     incident: IncidentCreate,
@@ -265,40 +508,15 @@ async def add_incident(
         )
 
     try:
-        # Reference to the organization document
-        org_ref = db.collection("organizations").document(incident.organizationId)
-        
-        # Check if organization document exists
-        org_doc = org_ref.get()
-        if not org_doc.exists:
-            org_ref.set({
-                "incidents": {}
-            })
-        elif "incidents" not in org_doc.to_dict():
-            # If document exists but no incidents field, initialize it
-            org_ref.update({
-                "incidents": {}
-            })
-        
-        # Generate a unique ID for the incident
-        incident_id = db.collection("_").document().id
-
-        incident_data = {
-            "id": incident_id,
-            "title": incident.title,
-            "description": incident.description,
-            "status": incident.status,
-            "datetime": incident.datetime,
-            "affectedServices": incident.affectedServices,
-            "created_at": firestore.SERVER_TIMESTAMP,
-            "updated_at": firestore.SERVER_TIMESTAMP
-        }
-        
-        # Update the organization document to add the new incident
-        org_ref.update({
-            f"incidents.{incident_id}": incident_data
-        })
-        
+        incident_data = await open_incident(
+            incident.organizationId,
+            incident.title,
+            incident.description,
+            incident.status,
+            incident.datetime,
+            incident.affectedServices,
+        )
+
         # Return without SERVER_TIMESTAMP
         response_data = {
             **incident_data,
@@ -317,12 +535,74 @@ async def add_incident(
             detail=f"Failed to add incident: {str(e)}"
         )
 
+class IncidentMessage(BaseModel):
+    id: str
+    message: str
+    status: str
+    timestamp: Optional[datetime] = None
+
+class Incident(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    title: str
+    description: str
+    status: str
+    affectedServices: list[str] = []
+    message_count: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+    messages: Optional[dict[str, IncidentMessage]] = None
+    datetime: Optional[datetime] = None
+
+class IncidentPage(BaseModel):
+    status: str
+    data: list[Incident]
+    next_cursor: Optional[str] = None
+
+class IncidentMessages(BaseModel):
+    status: str
+    data: dict[str, IncidentMessage]
+
 class IncidentUpdate(BaseModel):
     incidentId: str
     organizationId: str
     status: str
     message: str
 
+async def post_incident_update(org_id: str, incident_id: str, incident_status: str, message: str) -> str:
+    """
+    Add a message to an incident and set its status; returns the message id.
+    Raises store.NotFound if the incident does not exist.
+    """
+    # Generate a unique ID for the message
+    message_id = store.new_id()
+
+    # Create the message data
+    message_data = {
+        "id": message_id,
+        "message": message,
+        "status": incident_status,
+        "timestamp": store.SERVER_TIMESTAMP,
+    }
+
+    # Update incident status and add new message in one commit; a missing
+    # incident fails the commit instead of needing a read first
+    await store.add_incident_message(org_id, incident_id, message_data, incident_status)
+    status_page.invalidate(org_id)
+    events.publish(org_id, "incident.message", {
+        "incidentId": incident_id,
+        "status": incident_status,
+        "message": {
+            "id": message_id,
+            "message": message,
+            "status": incident_status,
+            "timestamp": datetime.now(timezone.utc)
+        }
+    })
+    return message_id
+
 @router.put("/update-incident")
 async def update_incident(
     incident: IncidentUpdate,
@@ -340,54 +620,12 @@ async def update_incident(
         )
 
     try:
-        org_ref = db.collection("organizations").document(incident.organizationId)
-        org_doc = org_ref.get()
-
-        if not org_doc.exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Organization not found"
-            )
-
-        # Get the existing incident data
-        org_data = org_doc.to_dict()
-        incident_data = org_data.get("incidents", {}).get(incident.incidentId)
-        
-        if not incident_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Incident not found"
-            )
-
-        # Generate a unique ID for the message
-        message_id = db.collection("_").document().id
-
-        # Create the message data
-        message_data = {
-            "id": message_id,
-            "message": incident.message,
-            "status": incident.status,
-            "timestamp": firestore.SERVER_TIMESTAMP,
-        }
-
-        # Initialize messages field if it doesn't exist
-        if "messages" not in incident_data:
-            org_ref.update({
-                f"incidents.{incident.incidentId}.messages": {}
-            })
-
-        # Update incident status and add new message
-        updates = {
-            f"incidents.{incident.incidentId}.status": incident.status,
-            f"incidents.{incident.incidentId}.updated_at": firestore.SERVER_TIMESTAMP,
-            f"incidents.{incident.incidentId}.messages.{message_id}": message_data
-        }
-
-        # If status is "resolved", add resolved_at timestamp
-        if incident.status == "resolved":
-            updates[f"incidents.{incident.incidentId}.resolved_at"] = firestore.SERVER_TIMESTAMP
-
-        org_ref.update(updates)
+        message_id = await post_incident_update(
+            incident.organizationId,
+            incident.incidentId,
+            incident.status,
+            incident.message,
+        )
 
         return {
             "status": "success",
@@ -397,10 +635,138 @@ async def update_incident(
                 "status": incident.status
             }
         }
+    except store.NotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incident not found"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update incident: {str(e)}"
         )
 
-# Add this router to your main.py
\ No newline at end of file
+@router.get("/incidents", response_model=IncidentPage)
+async def list_incidents(
+    organizationId: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    serviceId: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_messages: bool = False,
+    org_membership: dict = Depends(verify_org_member)
+):
+    """
+    List an organization's incidents, newest first, one page at a time.
+    Optional filters: status (comma separated for several, or "active"),
+    serviceId (an affected service), and a datetime range [start, end).
+    Pass the returned next_cursor back as cursor to get the next page.
+    """
+    org_id = org_membership.get("organization", {}).get("id")
+    if organizationId and organizationId != org_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not authorized to view incidents in this organization"
+        )
+
+    try:
+        incidents, next_cursor = await store.list_incidents(
+            org_id,
+            status=status_page.parse_status_filter(status_filter),
+            service_id=serviceId,
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=cursor,
+            include_messages=include_messages,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list incidents: {str(e)}"
+        )
+
+    # Serialized as is: the store already returns the IncidentPage shape
+    return FastJSONResponse({
+        "status": "success",
+        "data": incidents,
+        "next_cursor": next_cursor
+    })
+
+@router.get("/incidents/{incident_id}/messages", response_model=IncidentMessages)
+async def list_incident_messages(
+    incident_id: str,
+    org_membership: dict = Depends(verify_org_member)
+):
+    """
+    Return all messages of one incident, keyed by message id.
+    """
+    org_id = org_membership.get("organization", {}).get("id")
+    try:
+        messages = await store.list_incident_messages(org_id, incident_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list incident messages: {str(e)}"
+        )
+
+    return FastJSONResponse({
+        "status": "success",
+        "data": messages
+    })
+
+class UptimeDay(BaseModel):
+    timestamp: str
+    status: str
+    uptime: Optional[float] = None
+
+class ServiceUptime(BaseModel):
+    id: str
+    name: Optional[str] = None
+    status: Optional[str] = None
+    uptime: Optional[float] = None
+    data: list[UptimeDay]
+
+class UptimeResponse(BaseModel):
+    status: str
+    days: int
+    data: list[ServiceUptime]
+
+@router.get("/{org_id}/uptime", response_model=UptimeResponse)
+async def get_uptime(org_id: str, days: int = Query(90, ge=1, le=365)):
+    """
+    Per-service uptime for the last `days` days, for the uptime graph.
+    Public, like the status page itself. Reads one precomputed rollup per day
+    instead of replaying the status history.
+    """
+    try:
+        org_data = await store.get_organization(org_id)
+        if org_data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Organization not found"
+            )
+
+        now = datetime.now(timezone.utc)
+        rollups = await store.get_uptime_rollups(org_id, now.date() - timedelta(days=days - 1))
+        services = uptime.summarize(org_data.get("services", {}), rollups, days, now)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get uptime: {str(e)}"
+        )
+
+    return FastJSONResponse({
+        "status": "success",
+        "days": days,
+        "data": services
+    })
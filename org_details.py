@@ -0,0 +1,135 @@
+"""
+Cached organization details (name and logo) for public status pages.
+
+Names and logos almost never change, so they are kept for a long TTL. Past
+ORG_DETAILS_TTL an entry is still served, and refreshed from Clerk in the
+background, until it is ORG_DETAILS_STALE_TTL old. Concurrent lookups of the
+same organization share one upstream call, and unknown organizations are
+remembered for a short while so they cannot be used to hammer Clerk.
+When Clerk is unavailable, cached details are served however old they are.
+"""
+import asyncio
+import os
+import time
+
+from clerk import clerk, ClerkUnavailableError
+
+ORG_DETAILS_TTL = float(os.getenv("ORG_DETAILS_TTL", "3600"))
+ORG_DETAILS_STALE_TTL = float(os.getenv("ORG_DETAILS_STALE_TTL", "86400"))
+ORG_DETAILS_NEGATIVE_TTL = float(os.getenv("ORG_DETAILS_NEGATIVE_TTL", "60"))
+ORG_DETAILS_CACHE_SIZE = int(os.getenv("ORG_DETAILS_CACHE_SIZE", "10000"))
+
+
+class OrgDetailsLookupError(Exception):
+    pass
+
+
+class OrgDetailsCache:
+    """
+    Organization details keyed by organization id. An entry is
+    (details or None when Clerk does not know the organization, fetched_at).
+    """
+
+    def __init__(self, ttl=ORG_DETAILS_TTL, stale_ttl=ORG_DETAILS_STALE_TTL,
+                 negative_ttl=ORG_DETAILS_NEGATIVE_TTL, maxsize=ORG_DETAILS_CACHE_SIZE):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.fallback_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+
+    async def _fetch(self, org_id: str):
+        self.upstream_calls += 1
+        try:
+            response = await clerk.get(f"/organizations/{org_id}")
+        except ClerkUnavailableError as e:
+            raise OrgDetailsLookupError(str(e))
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise OrgDetailsLookupError(
+                f"Clerk returned {response.status_code} for organization {org_id}"
+            )
+        org_data = response.json()
+        return {
+            "name": org_data.get("name"),
+            "image_url": org_data.get("image_url"),
+        }
+
+    def _on_done(self, org_id: str, task: asyncio.Task):
+        self._inflight.pop(org_id, None)
+        if task.cancelled() or task.exception() is not None:
+            # A failed refresh keeps serving whatever is cached
+            return
+        if org_id not in self._entries and len(self._entries) >= self.maxsize:
+            # Evict the oldest insertion; entries are small and rarely churn
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[org_id] = (task.result(), time.monotonic())
+
+    def _refresh(self, org_id: str) -> asyncio.Task:
+        task = self._inflight.get(org_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(org_id))
+            task.add_done_callback(lambda t: self._on_done(org_id, t))
+            self._inflight[org_id] = task
+        return task
+
+    async def get(self, org_id: str):
+        """
+        Return {"name", "image_url"} for the organization, or None if Clerk does
+        not know it. Raises OrgDetailsLookupError if Clerk cannot be queried and
+        nothing usable is cached.
+        """
+        entry = self._entries.get(org_id)
+        if entry is not None:
+            details, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            ttl = self.ttl if details is not None else self.negative_ttl
+            if age < ttl:
+                self.hits += 1
+                return details
+            if details is not None and age < self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(org_id)
+                return details
+        self.misses += 1
+        try:
+            # Shielded so one caller disconnecting does not cancel the shared lookup.
+            return await asyncio.shield(self._refresh(org_id))
+        except OrgDetailsLookupError:
+            if entry is None:
+                raise
+            # Clerk is down: the last known details beat an error page
+            self.fallback_hits += 1
+            return entry[0]
+
+    async def get_many(self, org_ids: list) -> dict:
+        """Look up several organizations concurrently; returns {org_id: details or None}."""
+        results = await asyncio.gather(*(self.get(org_id) for org_id in org_ids))
+        return dict(zip(org_ids, results))
+
+    def invalidate(self, org_id: str = None):
+        """Drop one organization's cached details, or the whole cache if no id is given."""
+        if org_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(org_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "fallback_hits": self.fallback_hits,
+            "misses": self.misses,
+            "upstream_calls": self.upstream_calls,
+        }
+
+
+org_details_cache = OrgDetailsCache()
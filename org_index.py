@@ -0,0 +1,71 @@
+"""
+In-process index of organization ids.
+
+Built from keys-only pages of the organizations collection and kept sorted,
+so listing and paginating organizations is served from memory. The write
+paths in org.py add organizations as they create them; ORG_INDEX_TTL bounds
+how long organizations created through other workers can be missing.
+"""
+import asyncio
+import bisect
+import os
+import time
+
+import store
+
+ORG_INDEX_TTL = float(os.getenv("ORG_INDEX_TTL", "300"))
+ORG_INDEX_PAGE_SIZE = int(os.getenv("ORG_INDEX_PAGE_SIZE", "1000"))
+
+
+class OrganizationIndex:
+    def __init__(self, ttl: float = ORG_INDEX_TTL, page_size: int = ORG_INDEX_PAGE_SIZE):
+        self.ttl = ttl
+        self.page_size = page_size
+        self._ids = None
+        self._loaded_at = 0.0
+        self._loading = None
+        # Ids added while a rebuild is running, so the rebuild does not lose them
+        self._pending = set()
+
+    async def _load(self):
+        ids = [org_id async for org_id in store.iter_organization_ids(self.page_size)]
+        self._ids = sorted(set(ids) | self._pending)
+        self._pending.clear()
+        self._loaded_at = time.monotonic()
+
+    def _on_loaded(self, task: asyncio.Task):
+        if self._loading is task:
+            self._loading = None
+
+    async def ids(self) -> list:
+        """Return all organization ids, sorted, rebuilding the index when it expired."""
+        if self._ids is None or time.monotonic() - self._loaded_at >= self.ttl:
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(self._load())
+                self._loading.add_done_callback(self._on_loaded)
+            await asyncio.shield(self._loading)
+        return self._ids
+
+    async def page(self, limit: int, start_after: str = None):
+        """Return up to `limit` ids after `start_after`, and the cursor for the next page."""
+        ids = await self.ids()
+        start = bisect.bisect_right(ids, start_after) if start_after else 0
+        page = ids[start:start + limit]
+        next_cursor = page[-1] if start + limit < len(ids) else None
+        return page, next_cursor
+
+    def add(self, org_id: str):
+        """Record an organization a write path has just created (or touched)."""
+        if self._loading is not None:
+            self._pending.add(org_id)
+        if self._ids is None:
+            return
+        position = bisect.bisect_left(self._ids, org_id)
+        if position == len(self._ids) or self._ids[position] != org_id:
+            self._ids.insert(position, org_id)
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+
+organization_index = OrganizationIndex()
@@ -0,0 +1,516 @@
+"""
+In-process health checks that drive service status automatically.
+
+A service can carry a `check` config (an HTTP URL or a TCP host/port, an
+interval, a timeout, the expected HTTP status and a latency threshold).
+ProbeEngine runs those checks on a hashed timer wheel: one timer task for
+any number of checks, each rescheduled with jitter so checks do not fire in
+lockstep. Probes run under a global and a per-host concurrency limit.
+
+Each probe is classified as operational, degraded (slow) or down. A service
+only changes status after PROBER_FALL consecutive worse results, or
+PROBER_RISE consecutive better ones, so a single blip does not flap the
+status page. Confirmed changes go through the same write path as a manual
+update-service: history, uptime rollups, snapshot invalidation and events.
+
+The engine runs inside the API worker when PROBER_ENABLED is set (run one
+such worker), or standalone with `python prober.py`.
+
+Checks are configured by any organization member, so they may only reach
+public addresses: hosts are resolved and loopback, private, link-local
+(cloud metadata) and other non-global addresses are refused, both when a
+check is saved and on every connection a probe opens (redirects included).
+Probes connect to the address that was vetted, so a DNS answer that changes
+in between cannot point them inside the network. PROBER_ALLOW_PRIVATE lifts
+this for self-hosted setups monitoring their own network.
+"""
+import asyncio
+import ipaddress
+import os
+import random
+import socket
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import httpx
+
+load_dotenv()
+
+PROBER_ENABLED = os.getenv("PROBER_ENABLED", "").lower() in ("1", "true", "yes")
+PROBER_MAX_CONCURRENCY = int(os.getenv("PROBER_MAX_CONCURRENCY", "200"))
+PROBER_PER_HOST_CONCURRENCY = int(os.getenv("PROBER_PER_HOST_CONCURRENCY", "4"))
+PROBER_JITTER = float(os.getenv("PROBER_JITTER", "0.1"))
+PROBER_TICK = float(os.getenv("PROBER_TICK", "1"))
+PROBER_FALL = int(os.getenv("PROBER_FALL", "2"))
+PROBER_RISE = int(os.getenv("PROBER_RISE", "2"))
+# How often checks are reloaded from Firestore, to pick up edits made
+# through other workers.
+PROBER_RELOAD_INTERVAL = float(os.getenv("PROBER_RELOAD_INTERVAL", "300"))
+PROBER_ALLOW_PRIVATE = os.getenv("PROBER_ALLOW_PRIVATE", "").lower() in ("1", "true", "yes")
+RESOLVE_TIMEOUT = 5
+
+CHECK_KINDS = ("http", "tcp")
+MIN_INTERVAL = 5
+
+# Probe results, best first, and the service status each one sets.
+PROBE_RESULTS = ("operational", "degraded", "down")
+SERVICE_STATUS_FOR_RESULT = {
+    "operational": "operational",
+    "degraded": "degraded",
+    "down": "major_outage",
+}
+
+
+def result_for_status(status: str) -> str:
+    """Map a service status onto the probe result scale."""
+    if status in ("operational", "degraded"):
+        return status
+    return "down"
+
+
+class UnsafeDestination(ValueError):
+    pass
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_host(host: str):
+    """Refuse hosts that are non-public without resolving them (IP literals, localhost)."""
+    if PROBER_ALLOW_PRIVATE:
+        return
+    if host.lower().rstrip(".") == "localhost" or host.lower().rstrip(".").endswith(".localhost"):
+        raise UnsafeDestination(f"{host} is not a public address")
+    try:
+        public = is_public_address(host)
+    except ValueError:
+        return
+    if not public:
+        raise UnsafeDestination(f"{host} is not a public address")
+
+
+async def resolve_public(host: str, port: int, timeout: float = RESOLVE_TIMEOUT) -> list:
+    """
+    Resolve `host`; raises UnsafeDestination unless every address is public
+    (a name answering with one private address is refused as a whole).
+    """
+    check_host(host)
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+    except (OSError, asyncio.TimeoutError):
+        raise UnsafeDestination(f"Cannot resolve {host}")
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not PROBER_ALLOW_PRIVATE and not all(is_public_address(address) for address in addresses):
+        raise UnsafeDestination(f"{host} resolves to a non-public address")
+    return addresses
+
+
+async def validate_destination(check: dict):
+    """Resolve a validated check's host; raises UnsafeDestination when it must not be probed."""
+    if check["kind"] == "http":
+        url = urlsplit(check["url"])
+        await resolve_public(url.hostname, url.port or (443 if url.scheme == "https" else 80))
+    else:
+        await resolve_public(check["host"], check["port"])
+
+
+def public_transport(limits: "httpx.Limits") -> "httpx.AsyncHTTPTransport":
+    """An httpx transport whose every new connection goes through resolve_public."""
+    import httpcore
+    import httpx
+
+    class PublicNetworkBackend(httpcore.AsyncNetworkBackend):
+        def __init__(self):
+            self._backend = httpcore.AnyIOBackend()
+
+        async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            try:
+                addresses = await resolve_public(host, port)
+            except UnsafeDestination as e:
+                raise httpcore.ConnectError(str(e))
+            # The vetted address, not the name, so DNS cannot change in between
+            return await self._backend.connect_tcp(addresses[0], port, timeout=timeout,
+                                                   local_address=local_address, socket_options=socket_options)
+
+        async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+            raise httpcore.ConnectError("Unix sockets cannot be probed")
+
+        async def sleep(self, seconds):
+            await self._backend.sleep(seconds)
+
+    class PublicTransport(httpx.AsyncHTTPTransport):
+        def __init__(self):
+            # The pool AsyncHTTPTransport builds, with the guarded network backend;
+            # TLS still verifies and sends SNI for the URL's host name
+            self._pool = httpcore.AsyncConnectionPool(
+                ssl_context=httpx.create_ssl_context(),
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=limits.keepalive_expiry,
+                network_backend=PublicNetworkBackend(),
+            )
+
+    return PublicTransport()
+
+
+def validate_check(config: dict) -> dict:
+    """Normalize a check config; raises ValueError when it cannot be probed."""
+    kind = config.get("kind", "http")
+    if kind not in CHECK_KINDS:
+        raise ValueError(f"Unknown check kind {kind!r}")
+    check = {
+        "kind": kind,
+        "interval": int(config.get("interval") or 60),
+        "timeout": float(config.get("timeout") or 10),
+        "degraded_latency_ms": config.get("degraded_latency_ms"),
+    }
+    if check["interval"] < MIN_INTERVAL:
+        raise ValueError(f"Check interval must be at least {MIN_INTERVAL} seconds")
+    if kind == "http":
+        url = config.get("url") or ""
+        if urlsplit(url).scheme not in ("http", "https") or not urlsplit(url).hostname:
+            raise ValueError("HTTP checks need an http(s) url")
+        check_host(urlsplit(url).hostname)
+        check["url"] = url
+        check["expected_status"] = config.get("expected_status")
+    else:
+        if not config.get("host") or not config.get("port"):
+            raise ValueError("TCP checks need a host and port")
+        check_host(config["host"])
+        check["host"] = config["host"]
+        check["port"] = int(config["port"])
+    return check
+
+
+class Check:
+    """One service's check, plus the damping state of its probe results."""
+
+    def __init__(self, org_id: str, service: dict, fall: int = PROBER_FALL, rise: int = PROBER_RISE):
+        self.org_id = org_id
+        self.service_id = service["id"]
+        self.service = service
+        self.config = validate_check(service["check"])
+        self.host = urlsplit(self.config["url"]).hostname if self.config["kind"] == "http" else self.config["host"]
+        self.fall = fall
+        self.rise = rise
+        self.result = result_for_status(service.get("status"))
+        self.candidate = None
+        self.streak = 0
+        self.generation = 0
+        self.running = False
+
+    @property
+    def key(self):
+        return (self.org_id, self.service_id)
+
+    def record(self, observed: str):
+        """
+        Record a probe result; returns the new result once a change is
+        confirmed. The result only becomes current through commit(), once
+        the change has been written.
+        """
+        if observed == self.result:
+            self.candidate, self.streak = None, 0
+            return None
+        if observed != self.candidate:
+            self.candidate, self.streak = observed, 0
+        self.streak += 1
+        worse = PROBE_RESULTS.index(observed) > PROBE_RESULTS.index(self.result)
+        if self.streak < (self.fall if worse else self.rise):
+            return None
+        return observed
+
+    def commit(self, result: str):
+        self.result, self.candidate, self.streak = result, None, 0
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: entries land in slot (due tick % slots) and are
+    collected when the wheel reaches their tick, so scheduling and expiry are
+    O(1) however many checks there are.
+    """
+
+    def __init__(self, tick: float = PROBER_TICK, slots: int = 4096):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.current = 0
+
+    def schedule(self, item, delay: float):
+        due = self.current + max(1, round(delay / self.tick))
+        self.slots[due % len(self.slots)].append((due, item))
+
+    def advance(self) -> list:
+        self.current += 1
+        slot = self.slots[self.current % len(self.slots)]
+        due = [item for at, item in slot if at <= self.current]
+        if due:
+            # Delays longer than one turn share the slot with later entries
+            slot[:] = [(at, item) for at, item in slot if at > self.current]
+        return due
+
+
+async def probe_http(client: "httpx.AsyncClient", config: dict):
+    """Return (ok, latency in seconds) for an HTTP check."""
+    start = time.perf_counter()
+    async with client.stream("GET", config["url"], timeout=config["timeout"]) as response:
+        latency = time.perf_counter() - start
+    expected = config.get("expected_status")
+    ok = response.status_code == expected if expected else response.status_code < 400
+    return ok, latency
+
+
+async def probe_tcp(config: dict):
+    """Return (ok, latency in seconds) for a TCP connect check."""
+    start = time.perf_counter()
+    try:
+        addresses = await resolve_public(config["host"], config["port"], timeout=config["timeout"])
+    except UnsafeDestination as e:
+        raise OSError(str(e))
+    # Connect to the vetted address, not the name, so DNS cannot change in between
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(addresses[0], config["port"]), config["timeout"]
+    )
+    latency = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True, latency
+
+
+async def apply_status_change(check: Check, result: str):
+    """Write a confirmed status change like a manual update-service would."""
+    # Imported here so the engine itself can run (e.g. in benchmarks) without
+    # the Firestore client.
+    import events
+    import status_page
+    from status_writer import status_writer
+
+    new_status = SERVICE_STATUS_FOR_RESULT[result]
+    await status_writer.write(check.org_id, check.service_id, new_status, previous=check.service)
+    check.service = {**check.service, "status": new_status, "status_since": datetime.now(timezone.utc)}
+    status_page.invalidate(check.org_id)
+    events.publish(check.org_id, "service.status", {
+        "serviceId": check.service_id,
+        "status": new_status
+    })
+
+
+class ProbeEngine:
+    def __init__(self, on_change=apply_status_change, max_concurrency: int = PROBER_MAX_CONCURRENCY,
+                 per_host: int = PROBER_PER_HOST_CONCURRENCY, jitter: float = PROBER_JITTER,
+                 tick: float = PROBER_TICK, fall: int = PROBER_FALL, rise: int = PROBER_RISE):
+        self.on_change = on_change
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.jitter = jitter
+        self.fall = fall
+        self.rise = rise
+        self.wheel = TimerWheel(tick)
+        self._checks = {}
+        self._host_limits = {}
+        self._tasks = set()
+        self._runner = None
+        self._reloader = None
+        self.client = None
+        self.probes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.changes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None
+
+    async def start(self, reload_interval: float = None):
+        """Start the timer; with `reload_interval`, also reload checks from Firestore periodically."""
+        # Only processes running the prober need httpx at startup
+        import httpx
+
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency,
+                              max_keepalive_connections=self.max_concurrency)
+        self.client = httpx.AsyncClient(
+            # Redirects are safe to follow: each new host is vetted when connected to
+            transport=public_transport(limits),
+            follow_redirects=True,
+            # An environment proxy would fetch on the prober's behalf, unvetted
+            trust_env=False,
+            headers={"User-Agent": "Status24-Prober"},
+        )
+        self._runner = asyncio.create_task(self._run())
+        if reload_interval:
+            self._reloader = asyncio.create_task(self._reload_every(reload_interval))
+
+    async def stop(self):
+        for task in (self._runner, self._reloader, *self._tasks):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self._runner, self._reloader, *self._tasks) if t),
+                             return_exceptions=True)
+        self._runner = self._reloader = None
+        if self.client is not None:
+            await self.client.aclose()
+
+    def upsert(self, org_id: str, service: dict):
+        """
+        Add, update or (when the service has no check) remove a service's check.
+        Keeps the damping state and schedule when only the service changed.
+        """
+        key = (org_id, service["id"])
+        if not service.get("check"):
+            self.remove(org_id, service["id"])
+            return
+        existing = self._checks.get(key)
+        if existing is not None and existing.config == validate_check(service["check"]):
+            existing.service = service
+            existing.result = result_for_status(service.get("status"))
+            return
+        check = Check(org_id, service, self.fall, self.rise)
+        if existing is not None:
+            check.generation = existing.generation + 1
+        self._checks[key] = check
+        # Spread first runs over one interval
+        self.wheel.schedule((check, check.generation), random.uniform(0, check.config["interval"]))
+
+    def remove(self, org_id: str, service_id: str):
+        # Scheduled entries of a removed check are skipped when they fire
+        self._checks.pop((org_id, service_id), None)
+
+    def sync_organization(self, org_id: str, services: dict):
+        """Make the organization's checks match its services."""
+        for key in [k for k in self._checks if k[0] == org_id and k[1] not in services]:
+            self.remove(*key)
+        for service_id, service in services.items():
+            try:
+                self.upsert(org_id, {**service, "id": service.get("id", service_id)})
+            except ValueError as e:
+                print(f"Skipping check of {org_id}/{service_id}:", e)
+                self.remove(org_id, service_id)
+
+    async def load(self, concurrency: int = 50):
+        """Load every service check from Firestore."""
+        import store
+
+        limit = asyncio.Semaphore(concurrency)
+
+        async def load_org(org_id):
+            async with limit:
+                org_data = await store.get_organization(org_id)
+            self.sync_organization(org_id, (org_data or {}).get("services", {}))
+
+        await asyncio.gather(*[load_org(org_id) async for org_id in store.iter_organization_ids()])
+
+    async def _reload_every(self, interval: float):
+        while True:
+            try:
+                await self.load()
+            except Exception as e:
+                print("Error reloading checks:", e)
+            await asyncio.sleep(interval)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.wheel.tick
+            # Sleeping to an absolute deadline keeps the wheel from drifting
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            for check, generation in self.wheel.advance():
+                self._fire(check, generation)
+
+    def _fire(self, check: Check, generation: int):
+        if self._checks.get(check.key) is not check or check.generation != generation:
+            return
+        interval = check.config["interval"]
+        self.wheel.schedule((check, generation), interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+        if check.running:
+            # The previous probe has not finished yet
+            self.skipped += 1
+            return
+        check.running = True
+        task = asyncio.create_task(self._probe(check))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return limit
+
+    async def probe(self, check: Check) -> str:
+        """Run one probe and classify it as operational, degraded or down."""
+        import httpx
+
+        config = check.config
+        try:
+            if config["kind"] == "http":
+                ok, latency = await probe_http(self.client, config)
+            else:
+                ok, latency = await probe_tcp(config)
+        except (httpx.HTTPError, OSError, asyncio.TimeoutError):
+            return "down"
+        if not ok:
+            return "down"
+        threshold = config.get("degraded_latency_ms")
+        if threshold and latency * 1000 > threshold:
+            return "degraded"
+        return "operational"
+
+    async def _probe(self, check: Check):
+        try:
+            async with self._global_limit, self._host_limit(check.host):
+                observed = await self.probe(check)
+            self.probes += 1
+            if observed == "down":
+                self.failures += 1
+            changed = check.record(observed)
+            if changed is not None and self._checks.get(check.key) is check:
+                self.changes += 1
+                # A failed write leaves the old result, so the next probe retries it
+                await self.on_change(check, changed)
+                check.commit(changed)
+        except Exception as e:
+            print(f"Error probing {check.org_id}/{check.service_id}:", e)
+        finally:
+            check.running = False
+
+    def stats(self) -> dict:
+        return {
+            "checks": len(self._checks),
+            "inflight": len(self._tasks),
+            "probes": self.probes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "changes": self.changes,
+        }
+
+
+probe_engine = ProbeEngine()
+
+
+async def main():
+    await probe_engine.start(reload_interval=PROBER_RELOAD_INTERVAL)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await probe_engine.stop()
+        from status_writer import status_writer
+        await status_writer.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,215 @@
+"""
+Bulk onboarding of an organization's members through Clerk.
+
+Every member takes two Clerk calls (create the user, add the membership).
+Members are processed by PROVISION_CONCURRENCY workers sharing one pacer,
+which keeps calls under PROVISION_RATE per second and, when Clerk still
+answers 429, holds every worker back until its Retry-After has passed.
+Results are reported per member as they complete.
+"""
+import asyncio
+import csv
+import io
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+from clerk import clerk, ClerkUnavailableError
+
+if TYPE_CHECKING:
+    import httpx
+
+PROVISION_CONCURRENCY = int(os.getenv("PROVISION_CONCURRENCY", "10"))
+# Clerk calls per second across all workers; keep it below Clerk's backend
+# API rate limit, with headroom for the rest of the API
+PROVISION_RATE = float(os.getenv("PROVISION_RATE", "50"))
+PROVISION_MAX_MEMBERS = int(os.getenv("PROVISION_MAX_MEMBERS", "1000"))
+PROVISION_RATE_LIMIT_RETRIES = int(os.getenv("PROVISION_RATE_LIMIT_RETRIES", "5"))
+
+CSV_COLUMNS = ("email", "name")
+
+
+def user_payload(email: str, name: str) -> dict:
+    """Clerk payload creating a user in the status24 organization."""
+    names = name.split()
+    return {
+        "email_address": email,
+        # Split the name into first and last if possible.
+        "first_name": names[0] if names else "",
+        "last_name": names[1] if len(names) > 1 else "",
+        "public_metadata": {"organization": "status24"}
+    }
+
+
+def membership_payload(org_id: str, email: str, name: str, role: Optional[str] = None) -> dict:
+    """Clerk payload adding a user to an organization."""
+    payload = {
+        "email_address": email,
+        "organization_id": org_id,
+        "public_metadata": {"full_name": name}
+    }
+    if role:
+        payload["role"] = role
+    return payload
+
+
+def parse_members_csv(text: str) -> list:
+    """Members from CSV with an email,name[,role] header row."""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    columns = [column.strip().lower() for column in reader.fieldnames or []]
+    missing = [column for column in CSV_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    reader.fieldnames = columns
+    return [
+        {key: (value or "").strip() for key, value in row.items() if key in ("email", "name", "role")}
+        for row in reader
+        if any((value or "").strip() for value in row.values() if isinstance(value, str))
+    ]
+
+
+def validate_members(members: list):
+    if not members:
+        raise ValueError("No members to provision")
+    if len(members) > PROVISION_MAX_MEMBERS:
+        raise ValueError(f"At most {PROVISION_MAX_MEMBERS} members per request")
+    for number, member in enumerate(members, start=1):
+        if "@" not in (member.get("email") or "") or not (member.get("name") or "").strip():
+            raise ValueError(f"Member {number}: an email and a name are required")
+
+
+def retry_after(response: "httpx.Response") -> float:
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else 1.0
+
+
+def clerk_error(response: "httpx.Response") -> str:
+    try:
+        errors = response.json().get("errors") or []
+        return "; ".join(error.get("long_message") or error.get("message", "") for error in errors) or response.text
+    except ValueError:
+        return response.text
+
+
+def user_exists(response: "httpx.Response") -> bool:
+    if response.status_code != 422:
+        return False
+    try:
+        return any(error.get("code") == "form_identifier_exists" for error in response.json().get("errors") or [])
+    except ValueError:
+        return False
+
+
+class Pacer:
+    """
+    Spaces calls at most 1/rate seconds apart across every worker, and
+    pauses them all after a 429.
+    """
+
+    def __init__(self, rate: float = PROVISION_RATE):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self.rate_limited = 0
+
+    async def acquire(self):
+        now = time.monotonic()
+        # The slot is reserved before sleeping, so waiting workers keep their order
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def pause(self, seconds: float):
+        self.rate_limited += 1
+        self._next = max(self._next, time.monotonic() + seconds)
+
+    async def post(self, path: str, payload: dict) -> "httpx.Response":
+        # The client's own 429 retries would only hold back the worker that
+        # got one; here every worker waits out the Retry-After instead
+        for attempt in range(PROVISION_RATE_LIMIT_RETRIES + 1):
+            await self.acquire()
+            response = await clerk.post(path, json=payload, retry_rate_limited=False)
+            if response.status_code != 429 or attempt == PROVISION_RATE_LIMIT_RETRIES:
+                return response
+            self.pause(retry_after(response))
+
+
+async def create_organization(name: str) -> dict:
+    """Create the organization; raises ValueError with Clerk's error when it refuses."""
+    response = await clerk.post("/organizations", json={"name": name})
+    if response.status_code < 200 or response.status_code >= 300:
+        raise ValueError(f"Error creating organization: {clerk_error(response)}")
+    return response.json()
+
+
+async def provision_member(pacer: Pacer, org_id: str, member: dict) -> dict:
+    result = {"email": member["email"], "status": "failed"}
+    try:
+        response = await pacer.post("/users", user_payload(member["email"], member["name"]))
+        if user_exists(response):
+            result["user"] = "existing"
+        elif 200 <= response.status_code < 300:
+            result["user"] = "created"
+            result["user_id"] = response.json().get("id")
+        else:
+            result["error"] = f"Error creating user: {clerk_error(response)}"
+            return result
+
+        response = await pacer.post(
+            "/organization_memberships",
+            membership_payload(org_id, member["email"], member["name"], member.get("role")),
+        )
+        if response.status_code < 200 or response.status_code >= 300:
+            result["error"] = f"Error adding user to organization: {clerk_error(response)}"
+            return result
+        result["membership_id"] = response.json().get("id")
+        result["status"] = "ok"
+    except ClerkUnavailableError as e:
+        result["error"] = str(e)
+    except Exception as e:
+        # One bad row must not stop the others
+        result["error"] = f"Unexpected error: {str(e)}"
+    return result
+
+
+async def provision_members(org_id: str, members: list, concurrency: int = PROVISION_CONCURRENCY,
+                            rate: float = PROVISION_RATE):
+    """
+    Provision `members` into `org_id` with a bounded pool of workers.
+    Yields one result per member ({"row", "email", "status", ...}) as each
+    completes, then a summary. Closing the generator stops the workers.
+    """
+    started = time.monotonic()
+    pacer = Pacer(rate)
+    rows = asyncio.Queue()
+    for row in enumerate(members, start=1):
+        rows.put_nowait(row)
+    results = asyncio.Queue()
+
+    async def worker():
+        while not rows.empty():
+            number, member = rows.get_nowait()
+            result = await provision_member(pacer, org_id, member)
+            await results.put({"type": "member", "row": number, **result})
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(members)))]
+    succeeded = 0
+    try:
+        for _ in members:
+            result = await results.get()
+            succeeded += result["status"] == "ok"
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    yield {
+        "type": "summary",
+        "organization_id": org_id,
+        "members": len(members),
+        "succeeded": succeeded,
+        "failed": len(members) - succeeded,
+        "rate_limited": pacer.rate_limited,
+        "seconds": round(time.monotonic() - started, 3),
+    }
@@ -0,0 +1,225 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Header, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+import store
+from archiver import parse_month
+from events import broker, format_sse, TooManySubscribers
+from org import Incident
+from serialization import FastJSONResponse
+from status_page import status_cache, parse_status_filter, OrganizationNotFound
+
+router = APIRouter(prefix="/public", tags=["Public API"])
+
+# Lets browsers and CDNs reuse a snapshot briefly, and serve it stale while
+# revalidating with If-None-Match.
+PUBLIC_STATUS_MAX_AGE = int(os.getenv("PUBLIC_STATUS_MAX_AGE", "15"))
+PUBLIC_STATUS_CACHE_CONTROL = (
+    f"public, max-age={PUBLIC_STATUS_MAX_AGE}, stale-while-revalidate={PUBLIC_STATUS_MAX_AGE * 4}"
+)
+# A comment line keeps idle streams alive through proxies.
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "5000"))
+# Archived months only change when the archiver adds to them.
+ARCHIVE_CACHE_CONTROL = f"public, max-age={int(os.getenv('ARCHIVE_MAX_AGE', '3600'))}"
+
+
+@router.get("/{org_id}/status")
+async def get_status(org_id: str, if_none_match: str = Header(None)):
+    """
+    Compact status snapshot for an organization's public status page:
+    services, active and recent incidents, and the overall status.
+    Served from an in-process cache; answers 304 when the client's ETag matches.
+    """
+    try:
+        snapshot = await status_cache.get(org_id)
+    except OrganizationNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to build status snapshot: {str(e)}"
+        )
+
+    headers = {"ETag": snapshot.etag, "Cache-Control": PUBLIC_STATUS_CACHE_CONTROL}
+    if if_none_match and snapshot.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+class PublicIncidentPage(BaseModel):
+    data: list[Incident]
+    next_cursor: Optional[str] = None
+
+
+@router.get("/{org_id}/incidents", response_model=PublicIncidentPage)
+async def list_incidents(
+    org_id: str,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    serviceId: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_messages: bool = False,
+):
+    """
+    Query an organization's incidents for its public status page, newest
+    first: status (comma separated, or "active"), serviceId (an affected
+    service) and a datetime range [start, end). Pass the returned
+    next_cursor back as cursor to get the next page.
+    """
+    try:
+        incidents, next_cursor = await store.list_incidents(
+            org_id,
+            status=parse_status_filter(status_filter),
+            service_id=serviceId,
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=cursor,
+            include_messages=include_messages,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list incidents: {str(e)}"
+        )
+
+    return FastJSONResponse(
+        {"data": incidents, "next_cursor": next_cursor},
+        headers={"Cache-Control": PUBLIC_STATUS_CACHE_CONTROL},
+    )
+
+
+class ArchiveMonth(BaseModel):
+    month: str
+    count: int
+
+
+class IncidentArchiveIndex(BaseModel):
+    data: list[ArchiveMonth]
+
+
+class IncidentArchive(BaseModel):
+    month: str
+    data: list[Incident]
+
+
+@router.get("/{org_id}/incidents/archive", response_model=IncidentArchiveIndex)
+async def list_archived_months(org_id: str):
+    """Months with archived incidents, newest first, from the organization's archive summary."""
+    try:
+        org_data = await store.get_organization(org_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list archived incidents: {str(e)}"
+        )
+    if org_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found"
+        )
+
+    summary = org_data.get("incident_archive") or {}
+    months = [{"month": month, "count": summary[month]["count"]} for month in sorted(summary, reverse=True)]
+    return FastJSONResponse({"data": months}, headers={"Cache-Control": PUBLIC_STATUS_CACHE_CONTROL})
+
+
+@router.get("/{org_id}/incidents/archive/{month}", response_model=IncidentArchive)
+async def get_archived_incidents(org_id: str, month: str):
+    """Archived incidents (with their messages) that started in `month` (YYYY-MM), newest first."""
+    try:
+        incidents = await store.get_incident_archive(org_id, parse_month(month))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get archived incidents: {str(e)}"
+        )
+
+    return FastJSONResponse({"month": month, "data": incidents}, headers={"Cache-Control": ARCHIVE_CACHE_CONTROL})
+
+
+@router.get("/{org_id}/events")
+async def stream_events(org_id: str, last_event_id: str = Header(None)):
+    """
+    Server-Sent Events stream of live changes for an organization's status page.
+    Starts with a "snapshot" event (the same body as /status), then sends small
+    diff events: service.created, service.status, service.deleted,
+    incident.created and incident.message. A client that falls too far behind
+    gets an "evicted" event and should reconnect.
+    """
+    try:
+        # Answers 404 before the stream starts; usually a cache hit
+        await status_cache.get(org_id)
+    except OrganizationNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found"
+        )
+    if broker.clients >= broker.max_clients:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live connections, please retry later"
+        )
+
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+
+    async def event_stream():
+        # Subscribed inside the generator, so it is always released, and
+        # before the snapshot is read, so no event falls between the two
+        subscriber = None
+        try:
+            subscriber = broker.subscribe(org_id, last_event_id=resume_from)
+        except TooManySubscribers:
+            # Filled up since the check above; the client retries after SSE_RETRY_MS
+            yield f"retry: {SSE_RETRY_MS}\n\n" + format_sse(None, "evicted", "{}")
+            return
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            covered = 0
+            if resume_from is None:
+                snapshot = await status_cache.get(org_id)
+                covered = snapshot.event_id
+                yield format_sse(None, "snapshot", snapshot.body.decode())
+            while True:
+                if subscriber.evicted:
+                    yield format_sse(None, "evicted", "{}")
+                    return
+                try:
+                    event_id, message = await asyncio.wait_for(subscriber.queue.get(), SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event_id > covered:
+                    yield message
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
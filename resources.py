@@ -0,0 +1,90 @@
+"""
+Process-wide clients created on first use.
+
+Building some clients is slow: the Firestore backend imports the Google
+client stack and looks up credentials. They are registered here with a
+factory instead of being built at import, so a cold process starts
+serving (and answers health checks on /) before any of them exists.
+main.py's lifespan closes whatever was created, newest first.
+
+Names listed in PREWARM_RESOURCES (e.g. "store") are created in a thread
+right after startup, so the first real request does not pay for them and
+the event loop keeps serving meanwhile.
+"""
+import asyncio
+import inspect
+import os
+import threading
+import time
+
+PREWARM_RESOURCES = [name.strip() for name in os.getenv("PREWARM_RESOURCES", "").split(",") if name.strip()]
+
+
+class Registry:
+    def __init__(self):
+        self._factories = {}
+        self._closers = {}
+        self._instances = {}
+        self._init_seconds = {}
+        # Creation may happen in a prewarm thread and on the event loop at once
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory, close=None):
+        """Declare how to create `name` (factory()) and how to release it (close(instance))."""
+        self._factories[name] = factory
+        self._closers[name] = close
+
+    def get(self, name: str):
+        """Return `name`, creating it on first use."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                self._init_seconds[name] = time.perf_counter() - started
+                self._instances[name] = instance
+        return instance
+
+    def created(self, name: str) -> bool:
+        return name in self._instances
+
+    def replace(self, name: str, instance):
+        """Use `instance` for `name` from now on, e.g. a fresh in-memory store in tests."""
+        with self._lock:
+            self._instances.pop(name, None)
+            if instance is not None:
+                self._instances[name] = instance
+
+    async def prewarm(self, names: list = PREWARM_RESOURCES):
+        for name in names:
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception as e:
+                print(f"Error prewarming {name}:", e)
+
+    async def aclose(self):
+        """Close every created instance, newest first; they are created again if used later."""
+        for name in reversed(list(self._instances)):
+            instance = self._instances.pop(name)
+            close = self._closers.get(name)
+            if close is None:
+                continue
+            try:
+                result = close(instance)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Error closing {name}:", e)
+
+    def stats(self) -> dict:
+        return {
+            "registered": sorted(self._factories),
+            "created": list(self._instances),
+            "init_seconds": {name: round(seconds, 3) for name, seconds in self._init_seconds.items()},
+        }
+
+
+registry = Registry()
@@ -0,0 +1,164 @@
+"""
+Precomputed public status snapshots.
+
+A snapshot is the compact JSON the public status page renders: current
+services, active and recent incidents and the overall status. Snapshots are
+built once and served from an in-process cache until a write path in org.py
+invalidates them (or PUBLIC_STATUS_CACHE_TTL expires, which bounds staleness
+for writes made by other workers).
+"""
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+
+import serialization
+import store
+from events import broker
+
+PUBLIC_STATUS_CACHE_TTL = float(os.getenv("PUBLIC_STATUS_CACHE_TTL", "30"))
+RECENT_INCIDENTS = int(os.getenv("PUBLIC_RECENT_INCIDENTS", "10"))
+
+ACTIVE_INCIDENT_STATUSES = ["investigating", "identified", "monitoring"]
+# Well under the 30 values Firestore accepts in an "in" filter
+MAX_STATUS_FILTER = 10
+
+# Worst first: the overall status is the worst service status.
+SERVICE_STATUS_SEVERITY = ["major_outage", "partial_outage", "degraded", "operational"]
+
+
+class OrganizationNotFound(Exception):
+    pass
+
+
+def parse_status_filter(value: str):
+    """
+    Turn an incident status query parameter into a store.list_incidents
+    filter: "a,b" -> ["a", "b"], "active" -> the unresolved statuses.
+    Raises ValueError when too many statuses are combined.
+    """
+    if not value:
+        return None
+    statuses = []
+    for status in value.split(","):
+        status = status.strip()
+        if status == "active":
+            statuses.extend(ACTIVE_INCIDENT_STATUSES)
+        elif status:
+            statuses.append(status)
+    if len(statuses) > MAX_STATUS_FILTER:
+        raise ValueError(f"At most {MAX_STATUS_FILTER} statuses can be combined")
+    return statuses if len(statuses) > 1 else (statuses[0] if statuses else None)
+
+
+def overall_status(services: list) -> str:
+    statuses = {service.get("status") for service in services}
+    for candidate in SERVICE_STATUS_SEVERITY:
+        if candidate in statuses:
+            return candidate
+    return "operational"
+
+
+def _public_service(service_id: str, service: dict) -> dict:
+    return {
+        "id": service.get("id", service_id),
+        "name": service.get("name"),
+        "type": service.get("type"),
+        "status": service.get("status"),
+        "updated_at": service.get("updated_at"),
+    }
+
+
+async def build_status_snapshot(org_id: str) -> dict:
+    org_data = await store.get_organization(org_id)
+    if org_data is None:
+        raise OrganizationNotFound(org_id)
+
+    services = sorted(
+        (_public_service(sid, s) for sid, s in org_data.get("services", {}).items()),
+        key=lambda s: (s["name"] or "").lower(),
+    )
+    (active, _), (recent, _) = await asyncio.gather(
+        store.list_incidents(org_id, status=ACTIVE_INCIDENT_STATUSES, limit=100, include_messages=True),
+        store.list_incidents(org_id, limit=RECENT_INCIDENTS, include_messages=True),
+    )
+    active_ids = {incident["id"] for incident in active}
+
+    return {
+        "organizationId": org_id,
+        "status": overall_status(services),
+        "services": services,
+        "active_incidents": active,
+        "recent_incidents": [i for i in recent if i["id"] not in active_ids],
+        "generated_at": datetime.now(timezone.utc),
+    }
+
+
+class CachedSnapshot:
+    def __init__(self, body: bytes, built_at: float, event_id: int = 0):
+        self.body = body
+        self.built_at = built_at
+        # Newest live event when the build started: the write behind every
+        # event up to it had already invalidated the cache, so the snapshot
+        # includes them
+        self.event_id = event_id
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+class StatusSnapshotCache:
+    """
+    Serialized snapshots per organization. Concurrent misses for the same
+    organization share one build; invalidation drops the entry so the next
+    request rebuilds it.
+    """
+
+    def __init__(self, ttl: float = PUBLIC_STATUS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._building = {}
+        # Bumped on every invalidation so a build that started before a write
+        # does not get cached after it.
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _build(self, org_id: str, version: int) -> CachedSnapshot:
+        event_id = broker.last_event_id
+        snapshot = await build_status_snapshot(org_id)
+        body = serialization.dumps(snapshot)
+        entry = CachedSnapshot(body, time.monotonic(), event_id)
+        if self._versions.get(org_id, 0) == version:
+            self._entries[org_id] = entry
+        return entry
+
+    def _on_built(self, org_id: str, task: asyncio.Task):
+        if self._building.get(org_id) is task:
+            del self._building[org_id]
+
+    async def get(self, org_id: str) -> CachedSnapshot:
+        entry = self._entries.get(org_id)
+        if entry is not None and time.monotonic() - entry.built_at < self.ttl:
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        task = self._building.get(org_id)
+        if task is None:
+            task = asyncio.ensure_future(self._build(org_id, self._versions.get(org_id, 0)))
+            task.add_done_callback(lambda t: self._on_built(org_id, t))
+            self._building[org_id] = task
+        return await asyncio.shield(task)
+
+    def invalidate(self, org_id: str):
+        self._versions[org_id] = self._versions.get(org_id, 0) + 1
+        self._entries.pop(org_id, None)
+        self._building.pop(org_id, None)
+
+
+status_cache = StatusSnapshotCache()
+
+
+def invalidate(org_id: str):
+    """Called by the write paths after an organization's status data changed."""
+    status_cache.invalidate(org_id)
@@ -0,0 +1,165 @@
+"""
+Coalescing writer for service status changes.
+
+Firestore sustains roughly one write per second to a single document, and
+every service status lives in its organization's document. Automated
+sources (the prober, scripts calling update-service) can change statuses
+much faster than that. The first change of an organization that has not
+been written to for STATUS_WRITE_WINDOW seconds is flushed at once; later
+changes are buffered until the window since that flush has passed and
+flushed as one commit, keeping only the last status per service. Flushes
+of one organization never overlap.
+
+Callers wait for the flush that carries their change, so a returned write
+is a committed one. A service that changes A -> B -> C inside one window is
+recorded as a single A -> C transition in the status history. A change
+that arrives while a flush of the same service is still committing was
+made against a stale read; its transition starts from the status that
+flush is writing, so no transition is recorded twice.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import metrics
+import store
+
+STATUS_WRITE_WINDOW = float(os.getenv("STATUS_WRITE_WINDOW", "1"))
+
+
+class PendingWrite:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        # service_id -> [status, service as read before the first change]
+        self.changes = {}
+        self.future = loop.create_future()
+        # Retrieve the exception even if every waiter went away
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.timer = None
+
+
+class StatusWriter:
+    def __init__(self, window: float = STATUS_WRITE_WINDOW):
+        self.window = window
+        self._pending = {}
+        self._flushing = {}
+        # org_id -> monotonic time of its last flush
+        self._last_flush = {}
+        # org_id -> {service_id: the service as the flushes in flight leave it}
+        self._in_flight = {}
+        self._tasks = set()
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.failures = 0
+        self._latencies = deque(maxlen=1000)
+
+    async def write(self, org_id: str, service_id: str, status: str, previous: dict = None):
+        """
+        Queue a status change and wait until it is committed. `previous` is the
+        service as last read; see store.update_service_status.
+        """
+        pending = self._pending.get(org_id)
+        flush_now = False
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = self._pending[org_id] = PendingWrite(loop)
+            # Leading edge: an idle organization is written right away, and
+            # only writes within the window after a flush wait for the next one
+            delay = self._last_flush.get(org_id, float("-inf")) + self.window - time.monotonic()
+            if delay > 0:
+                pending.timer = loop.call_later(delay, self._start_flush, org_id)
+            else:
+                flush_now = True
+
+        self.submitted += 1
+        if service_id in pending.changes:
+            # Keep the original previous state, so the history records the
+            # transition from what is actually stored
+            self.coalesced += 1
+            pending.changes[service_id][0] = status
+        else:
+            in_flight = self._in_flight.get(org_id, {}).get(service_id)
+            pending.changes[service_id] = [status, in_flight if in_flight is not None else previous]
+        if flush_now:
+            self._start_flush(org_id)
+        # Shielded so one caller disconnecting does not cancel the shared flush.
+        await asyncio.shield(pending.future)
+
+    def _start_flush(self, org_id: str):
+        pending = self._pending.pop(org_id, None)
+        if pending is None:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        self._last_flush[org_id] = time.monotonic()
+        # What the commit will store, as store.update_service_statuses computes it
+        now = datetime.now(timezone.utc)
+        in_flight = self._in_flight.setdefault(org_id, {})
+        for service_id, (status, previous) in pending.changes.items():
+            if previous is not None:
+                in_flight[service_id] = {**previous, "status": status}
+                if previous.get("status") != status:
+                    in_flight[service_id]["status_since"] = now
+        task = metrics.spawn(self._flush(org_id, pending, self._flushing.get(org_id)))
+        self._flushing[org_id] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._on_flushed(org_id, t))
+
+    def _on_flushed(self, org_id: str, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._flushing.get(org_id) is task:
+            # Nothing in flight any more: later reads see what was committed
+            del self._flushing[org_id]
+            self._in_flight.pop(org_id, None)
+
+    async def _flush(self, org_id: str, pending: PendingWrite, previous_flush: asyncio.Task = None):
+        if previous_flush is not None:
+            # One commit at a time per organization document
+            await asyncio.wait([previous_flush])
+        start = time.perf_counter()
+        try:
+            await store.update_service_statuses(org_id, [
+                (service_id, status, previous)
+                for service_id, (status, previous) in pending.changes.items()
+            ])
+        except Exception as e:
+            self.failures += 1
+            # Not committed, so later changes must not start from these statuses
+            in_flight = self._in_flight.get(org_id, {})
+            for service_id, (status, _) in pending.changes.items():
+                if in_flight.get(service_id, {}).get("status") == status:
+                    del in_flight[service_id]
+            pending.future.set_exception(e)
+        else:
+            pending.future.set_result(None)
+        finally:
+            self.flushes += 1
+            self._latencies.append(time.perf_counter() - start)
+
+    async def aclose(self):
+        """Flush everything still buffered; called on shutdown."""
+        for org_id in list(self._pending):
+            self._start_flush(org_id)
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": sum(len(p.changes) for p in self._pending.values()),
+            "pending_organizations": len(self._pending),
+            "flushing": len(self._flushing),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "flush_latency_ms": {
+                "p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+                "max": round(latencies[-1] * 1000, 1) if latencies else None,
+            },
+        }
+
+
+status_writer = StatusWriter()
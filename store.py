@@ -0,0 +1,389 @@
+"""
+Data access for organizations, their services and incidents.
+
+Request handlers call the functions in this module; they delegate to the
+storage backend chosen with STORAGE_BACKEND:
+
+- "firestore" (default): Cloud Firestore, see store_firestore.py.
+- "sqlite": a local SQLite file (SQLITE_PATH), see store_sqlite.py.
+- "memory": SQLite in memory, for tests and benchmarks; nothing persists.
+
+The backend is created on first use, so importing the app needs no
+credentials or network.
+"""
+import os
+import secrets
+import string
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+import metrics
+import serialization
+import uptime
+from resources import registry
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "status24.db")
+# Archive documents are split into parts of about this size, well under
+# Firestore's 1 MiB document limit
+ARCHIVE_PART_MAX_BYTES = int(os.getenv("ARCHIVE_PART_MAX_BYTES", str(512 * 1024)))
+
+
+class NotFound(LookupError):
+    """The document a write expected to exist does not."""
+
+
+class ServerTimestamp:
+    """Placeholder for "the time the write is committed"; see SERVER_TIMESTAMP."""
+
+    def __repr__(self):
+        return "SERVER_TIMESTAMP"
+
+
+# Use as a field value in writes; each backend stores its own commit time.
+SERVER_TIMESTAMP = ServerTimestamp()
+
+
+class Store:
+    """
+    Interface the storage backends implement. Organizations hold a map of
+    services; incidents (with their messages), the status history and the
+    daily uptime rollups are stored per organization.
+    """
+
+    async def get_organization(self, org_id: str) -> Optional[dict]:
+        """Return the organization as a dict with a "services" map, or None."""
+        raise NotImplementedError
+
+    async def list_organization_ids(self, limit: int, start_after: Optional[str]):
+        """Return (ids, next_cursor) for one page of organization ids in id order."""
+        raise NotImplementedError
+
+    async def create_service(self, org_id: str, service_data: dict):
+        """Add a service, creating the organization if needed, in one write."""
+        raise NotImplementedError
+
+    async def apply_status_changes(self, org_id: str, services: dict, history: list, rollups: dict):
+        """
+        Commit at once: `services` maps service ids to the fields to set,
+        `history` entries are appended to the status history and `rollups`
+        ({day: {service_id: {bucket: seconds}}}) are added to the uptime rollups.
+        Raises NotFound if the organization does not exist.
+        """
+        raise NotImplementedError
+
+    async def get_uptime_rollups(self, org_id: str, first_day: date) -> dict:
+        """Return {"YYYY-MM-DD": {service_id: {bucket: seconds}}} from `first_day` on."""
+        raise NotImplementedError
+
+    async def set_service_check(self, org_id: str, service_id: str, check: Optional[dict]):
+        raise NotImplementedError
+
+    async def delete_service(self, org_id: str, service_id: str):
+        """Raises NotFound if the organization does not exist."""
+        raise NotImplementedError
+
+    async def create_incident(self, org_id: str, incident_data: dict):
+        raise NotImplementedError
+
+    async def get_incident(self, org_id: str, incident_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def add_incident_message(self, org_id: str, incident_id: str, message_data: dict, status: str):
+        """Raises NotFound, and writes nothing, if the incident does not exist."""
+        raise NotImplementedError
+
+    async def list_incident_messages(self, org_id: str, incident_id: str) -> dict:
+        raise NotImplementedError
+
+    async def list_incidents(self, org_id: str, status, service_id: Optional[str], start: Optional[datetime],
+                             end: Optional[datetime], limit: int, cursor: Optional[str], include_messages: bool):
+        """See list_incidents below."""
+        raise NotImplementedError
+
+    async def list_resolved_incidents(self, org_id: str, resolved_before: datetime, limit: int) -> list:
+        """Up to `limit` incidents resolved before `resolved_before`, each with its "messages"."""
+        raise NotImplementedError
+
+    async def archive_incidents(self, org_id: str, month: str, part: int, incidents: list, summary: dict):
+        """
+        Add `incidents` (with their messages) to archive document `part` of
+        `month`, delete them and their messages from the live incidents,
+        and set the organization's incident_archive[month] to `summary`.
+        """
+        raise NotImplementedError
+
+    async def get_incident_archive(self, org_id: str, month: str) -> list:
+        """Archived incidents of one month, newest first."""
+        raise NotImplementedError
+
+    async def get_webhook(self, org_id: str) -> Optional[dict]:
+        """The organization's alert webhook config, or None."""
+        raise NotImplementedError
+
+    async def set_webhook(self, org_id: str, webhook: Optional[dict]):
+        """
+        Set the organization's alert webhook config; None removes it. It holds
+        a secret, so it is kept out of the organization document clients read.
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """Release connections; awaited once at shutdown."""
+
+
+def create_backend() -> Store:
+    """Build the configured storage backend; its module is only imported here."""
+    if STORAGE_BACKEND == "firestore":
+        from store_firestore import FirestoreStore
+        return FirestoreStore()
+    if STORAGE_BACKEND in ("sqlite", "memory"):
+        from store_sqlite import SqliteStore
+        return SqliteStore(":memory:" if STORAGE_BACKEND == "memory" else SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}")
+
+
+registry.register("store", create_backend, close=lambda store: store.close())
+
+
+def backend() -> Store:
+    """Return the configured storage backend, creating it on first use."""
+    return registry.get("store")
+
+
+def use_backend(store: Store):
+    """Replace the storage backend, e.g. with a fresh in-memory one in tests."""
+    registry.replace("store", store)
+
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def new_id() -> str:
+    """Generate a Firestore-style unique id without a round trip."""
+    return "".join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def get_organization(org_id: str) -> Optional[dict]:
+    """Return the organization document as a dict, or None if it does not exist."""
+    return await backend().get_organization(org_id)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def list_organization_ids(limit: int = 1000, start_after: Optional[str] = None):
+    """
+    Return one page of organization ids in id order, and the id to pass as
+    `start_after` for the next page (None on the last page). Only ids are
+    read, no services or other fields.
+    """
+    return await backend().list_organization_ids(limit, start_after)
+
+
+async def iter_organization_ids(page_size: int = 1000):
+    """Yield every organization id, fetched one keys-only page at a time."""
+    cursor = None
+    while True:
+        ids, cursor = await list_organization_ids(page_size, cursor)
+        for org_id in ids:
+            yield org_id
+        if cursor is None:
+            return
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def create_service(org_id: str, service_data: dict):
+    await backend().create_service(org_id, service_data)
+
+
+async def update_service_status(org_id: str, service_id: str, status: str, previous: dict = None):
+    """
+    Set a service's status. When `previous` (the service as last read) had a
+    different status, the transition is appended to the status history and the
+    time spent in the old status is credited to the daily uptime rollups, all
+    in the same commit as the status change.
+    """
+    await update_service_statuses(org_id, [(service_id, status, previous)])
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def update_service_statuses(org_id: str, changes: list):
+    """
+    Apply several (service_id, status, previous) status changes in a single
+    commit. All services share the same updated_at; see update_service_status.
+    """
+    now = datetime.now(timezone.utc)
+    services = {}
+    history = []
+    rollups = {}
+    for service_id, status, previous in changes:
+        fields = services[service_id] = {"status": status, "updated_at": SERVER_TIMESTAMP}
+        if previous is None or previous.get("status") == status:
+            continue
+
+        fields["status_since"] = now
+        history.append({
+            "serviceId": service_id,
+            "from": previous.get("status"),
+            "to": status,
+            "at": now,
+        })
+        since = uptime.status_since(previous)
+        if since is not None:
+            bucket = uptime.status_bucket(previous.get("status"))
+            for day, seconds in uptime.split_by_day(since, now):
+                # One rollup write per day, however many services changed
+                day_services = rollups.setdefault(uptime.day_key(day), {})
+                day_services.setdefault(service_id, {})[bucket] = seconds
+
+    await backend().apply_status_changes(org_id, services, history, rollups)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def get_uptime_rollups(org_id: str, first_day: date) -> dict:
+    """Return the daily rollups from `first_day` on, keyed by "YYYY-MM-DD"."""
+    return await backend().get_uptime_rollups(org_id, first_day)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def set_service_check(org_id: str, service_id: str, check: Optional[dict]):
+    """Set a service's health check config, or remove it when `check` is None."""
+    await backend().set_service_check(org_id, service_id, check)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def get_webhook(org_id: str) -> Optional[dict]:
+    """The alert webhook config ({"secret", "created_at"}), or None."""
+    return await backend().get_webhook(org_id)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def set_webhook(org_id: str, webhook: Optional[dict]):
+    """Set the alert webhook config ({"secret", "created_at"}), or remove it when `webhook` is None."""
+    await backend().set_webhook(org_id, webhook)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def delete_service(org_id: str, service_id: str):
+    await backend().delete_service(org_id, service_id)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def create_incident(org_id: str, incident_data: dict):
+    await backend().create_incident(org_id, incident_data)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def get_incident(org_id: str, incident_id: str) -> Optional[dict]:
+    return await backend().get_incident(org_id, incident_id)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def add_incident_message(org_id: str, incident_id: str, message_data: dict, status: str):
+    """
+    Append a message to an incident and move the incident to `status`, in one
+    commit. Raises NotFound, and writes nothing, if the incident does not exist.
+    """
+    await backend().add_incident_message(org_id, incident_id, message_data, status)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def list_incident_messages(org_id: str, incident_id: str) -> dict:
+    """Return an incident's messages keyed by message id, oldest first."""
+    return await backend().list_incident_messages(org_id, incident_id)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def list_incidents(
+    org_id: str,
+    status=None,
+    service_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    include_messages: bool = False,
+):
+    """
+    Return one page of an organization's incidents, newest first, and the
+    cursor for the next page (None on the last page). `status` is one
+    status or a list of accepted statuses; `service_id` keeps incidents
+    listing that service in affectedServices. Every combination of filters
+    is served by an index.
+    The cursor is the id of the last incident of the previous page; an
+    unknown cursor raises ValueError.
+    """
+    return await backend().list_incidents(org_id, status, service_id, start, end, limit, cursor, include_messages)
+
+
+def archive_month(incident: dict) -> Optional[str]:
+    """
+    The "YYYY-MM" archive partition of an incident, from when it started
+    (or, lacking that, was resolved or created); None if it has no usable date.
+    """
+    for field in ("datetime", "resolved_at", "created_at"):
+        value = incident.get(field)
+        if isinstance(value, datetime):
+            month = uptime.month_key(value)
+            # Only keys /public/{org_id}/incidents/archive/{month} can read back
+            if uptime.MONTH_PATTERN.match(month):
+                return month
+    return None
+
+
+async def archive_resolved_incidents(org_id: str, resolved_before: datetime, batch_size: int = 100) -> int:
+    """
+    Move incidents resolved before `resolved_before`, with their messages,
+    out of the live incidents into monthly archive documents, and keep a
+    {month: {"count", "parts", "bytes"}} summary in the organization's
+    incident_archive field. Returns the number of incidents archived.
+    """
+    # Timed per backend call rather than as a whole, so nothing is counted twice
+    with metrics.upstream_call(STORAGE_BACKEND, "get_organization"):
+        org_data = await backend().get_organization(org_id)
+    if org_data is None:
+        return 0
+    summary = dict(org_data.get("incident_archive") or {})
+    archived = 0
+    while True:
+        with metrics.upstream_call(STORAGE_BACKEND, "list_resolved_incidents"):
+            incidents = await backend().list_resolved_incidents(org_id, resolved_before, batch_size)
+
+        by_month = {}
+        for incident in incidents:
+            month = archive_month(incident)
+            if month is None:
+                print(f"Not archiving incident {org_id}/{incident.get('id')}: it has no usable date")
+                continue
+            by_month.setdefault(month, []).append(incident)
+        if not by_month:
+            # Nothing left, or only incidents that stay live and would be listed again
+            return archived
+        for month, group in by_month.items():
+            entry = summary.get(month) or {"count": 0, "parts": 1, "bytes": 0}
+            part, size, chunk = entry["parts"], entry["bytes"], []
+            for incident in group:
+                incident_size = len(serialization.dumps(incident))
+                if size and size + incident_size > ARCHIVE_PART_MAX_BYTES:
+                    if chunk:
+                        entry = {"count": entry["count"] + len(chunk), "parts": part, "bytes": size}
+                        with metrics.upstream_call(STORAGE_BACKEND, "archive_incidents"):
+                            await backend().archive_incidents(org_id, month, part, chunk, entry)
+                    part, size, chunk = part + 1, 0, []
+                chunk.append(incident)
+                size += incident_size
+            entry = {"count": entry["count"] + len(chunk), "parts": part, "bytes": size}
+            with metrics.upstream_call(STORAGE_BACKEND, "archive_incidents"):
+                await backend().archive_incidents(org_id, month, part, chunk, entry)
+            summary[month] = entry
+            archived += len(group)
+
+
+@metrics.upstream(STORAGE_BACKEND)
+async def get_incident_archive(org_id: str, month: str) -> list:
+    """Return the archived incidents (with messages) that started in `month`, newest first."""
+    return await backend().get_incident_archive(org_id, month)
@@ -0,0 +1,290 @@
+"""
+Cloud Firestore storage backend.
+
+Layout:
+- organizations/{orgId}: {"services": {serviceId: service}}
+- organizations/{orgId}/incidents/{incidentId}, each with a messages
+  subcollection, so the organization document stays small
+- organizations/{orgId}/status_history/{autoId}
+- organizations/{orgId}/uptime_daily/{YYYY-MM-DD}: {"date", "services": {serviceId: {bucket: seconds}}}
+- organizations/{orgId}/incident_archive/{YYYY-MM}[.{part}]: {"month", "part",
+  "incidents": {incidentId: incident with its messages}}, summarized in the
+  organization's incident_archive field
+- webhook_secrets/{orgId}: the alert webhook config, outside organizations/
+  because clients may read any organization document and it holds a secret
+
+Everything goes through one shared firestore.AsyncClient so request handlers
+never block the event loop on a Firestore round trip.
+"""
+import asyncio
+import inspect
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from google.api_core import exceptions as api_exceptions
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+import uptime
+from store import NotFound, ServerTimestamp, Store
+
+ORGANIZATIONS = "organizations"
+INCIDENTS = "incidents"
+MESSAGES = "messages"
+STATUS_HISTORY = "status_history"
+UPTIME_DAILY = "uptime_daily"
+INCIDENT_ARCHIVE = "incident_archive"
+WEBHOOK_SECRETS = "webhook_secrets"
+# Firestore rejects batches of more than 500 writes
+MAX_BATCH_WRITES = 500
+
+
+def to_firestore(value):
+    """Swap store.SERVER_TIMESTAMP placeholders for Firestore's sentinel."""
+    if isinstance(value, ServerTimestamp):
+        return firestore.SERVER_TIMESTAMP
+    if isinstance(value, dict):
+        return {k: to_firestore(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_firestore(v) for v in value]
+    return value
+
+
+class FirestoreStore(Store):
+    def __init__(self, client: firestore.AsyncClient = None):
+        self.db = client or firestore.AsyncClient()
+
+    async def close(self):
+        # Client.close() only closes an HTTP session; the gRPC channel belongs
+        # to the GAPIC client, which only exists once a call has been made
+        api = self.db._firestore_api_internal
+        if api is not None:
+            result = api.transport.close()
+            # A synchronous client's transport closes without a coroutine
+            if inspect.isawaitable(result):
+                await result
+
+    def org_ref(self, org_id: str) -> firestore.AsyncDocumentReference:
+        return self.db.collection(ORGANIZATIONS).document(org_id)
+
+    def incidents_ref(self, org_id: str) -> firestore.AsyncCollectionReference:
+        return self.org_ref(org_id).collection(INCIDENTS)
+
+    def messages_ref(self, org_id: str, incident_id: str) -> firestore.AsyncCollectionReference:
+        return self.incidents_ref(org_id).document(incident_id).collection(MESSAGES)
+
+    async def get_organization(self, org_id: str) -> Optional[dict]:
+        org_doc = await self.org_ref(org_id).get()
+        if not org_doc.exists:
+            return None
+        return org_doc.to_dict()
+
+    async def list_organization_ids(self, limit: int, start_after: Optional[str]):
+        # An empty projection would return every field; __name__ returns none
+        query = self.db.collection(ORGANIZATIONS).select(["__name__"]).order_by("__name__")
+        if start_after:
+            query = query.start_after({"__name__": start_after})
+        ids = [doc.id async for doc in query.limit(limit).stream()]
+        return ids, (ids[-1] if len(ids) == limit else None)
+
+    async def create_service(self, org_id: str, service_data: dict):
+        # A merge creates the organization document and its services map as
+        # needed, in the same write as the service itself
+        await self.org_ref(org_id).set({
+            "services": {service_data["id"]: to_firestore(service_data)}
+        }, merge=True)
+
+    async def apply_status_changes(self, org_id: str, services: dict, history: list, rollups: dict):
+        updates = {
+            f"services.{service_id}.{field}": to_firestore(value)
+            for service_id, fields in services.items()
+            for field, value in fields.items()
+        }
+        try:
+            if not history and not rollups:
+                await self.org_ref(org_id).update(updates)
+                return
+
+            batch = self.db.batch()
+            batch.update(self.org_ref(org_id), updates)
+            for entry in history:
+                batch.set(self.org_ref(org_id).collection(STATUS_HISTORY).document(), entry)
+            for key, day_services in rollups.items():
+                batch.set(self.org_ref(org_id).collection(UPTIME_DAILY).document(key), {
+                    "date": key,
+                    "services": {
+                        service_id: {bucket: firestore.Increment(seconds) for bucket, seconds in buckets.items()}
+                        for service_id, buckets in day_services.items()
+                    },
+                }, merge=True)
+            await batch.commit()
+        except api_exceptions.NotFound:
+            raise NotFound(org_id)
+
+    async def get_uptime_rollups(self, org_id: str, first_day: date) -> dict:
+        query = self.org_ref(org_id).collection(UPTIME_DAILY).where(
+            filter=FieldFilter("date", ">=", uptime.day_key(first_day))
+        )
+        return {doc.id: doc.to_dict().get("services", {}) async for doc in query.stream()}
+
+    async def set_service_check(self, org_id: str, service_id: str, check: Optional[dict]):
+        try:
+            await self.org_ref(org_id).update({
+                f"services.{service_id}.check": check if check is not None else firestore.DELETE_FIELD,
+                f"services.{service_id}.updated_at": firestore.SERVER_TIMESTAMP,
+            })
+        except api_exceptions.NotFound:
+            raise NotFound(org_id)
+
+    async def get_webhook(self, org_id: str) -> Optional[dict]:
+        webhook_doc = await self.db.collection(WEBHOOK_SECRETS).document(org_id).get()
+        return webhook_doc.to_dict() if webhook_doc.exists else None
+
+    async def set_webhook(self, org_id: str, webhook: Optional[dict]):
+        webhook_ref = self.db.collection(WEBHOOK_SECRETS).document(org_id)
+        batch = self.db.batch()
+        if webhook is None:
+            batch.delete(webhook_ref)
+        else:
+            batch.set(webhook_ref, to_firestore(webhook))
+        # Configs used to be kept in the organization document, readable by anyone
+        batch.set(self.org_ref(org_id), {"webhook": firestore.DELETE_FIELD}, merge=True)
+        await batch.commit()
+
+    async def delete_service(self, org_id: str, service_id: str):
+        try:
+            await self.org_ref(org_id).update({
+                f"services.{service_id}": firestore.DELETE_FIELD
+            })
+        except api_exceptions.NotFound:
+            raise NotFound(org_id)
+
+    async def create_incident(self, org_id: str, incident_data: dict):
+        batch = self.db.batch()
+        # Make sure the parent organization document exists so the org is listed
+        batch.set(self.org_ref(org_id), {}, merge=True)
+        batch.set(self.incidents_ref(org_id).document(incident_data["id"]), {
+            **to_firestore(incident_data),
+            "message_count": 0,
+        })
+        await batch.commit()
+
+    async def get_incident(self, org_id: str, incident_id: str) -> Optional[dict]:
+        incident_doc = await self.incidents_ref(org_id).document(incident_id).get()
+        if not incident_doc.exists:
+            return None
+        return incident_doc.to_dict()
+
+    async def add_incident_message(self, org_id: str, incident_id: str, message_data: dict, status: str):
+        updates = {
+            "status": status,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+            "message_count": firestore.Increment(1),
+        }
+
+        # If status is "resolved", add resolved_at timestamp
+        if status == "resolved":
+            updates["resolved_at"] = firestore.SERVER_TIMESTAMP
+
+        batch = self.db.batch()
+        batch.set(self.messages_ref(org_id, incident_id).document(message_data["id"]), to_firestore(message_data))
+        batch.update(self.incidents_ref(org_id).document(incident_id), updates)
+        try:
+            await batch.commit()
+        except api_exceptions.NotFound:
+            raise NotFound(incident_id)
+
+    async def list_incident_messages(self, org_id: str, incident_id: str) -> dict:
+        query = self.messages_ref(org_id, incident_id).order_by("timestamp")
+        return {doc.id: doc.to_dict() async for doc in query.stream()}
+
+    async def list_incidents(self, org_id: str, status, service_id: Optional[str], start: Optional[datetime],
+                             end: Optional[datetime], limit: int, cursor: Optional[str], include_messages: bool):
+        # Composite indexes for these filters are in firestore.indexes.json
+        query = self.incidents_ref(org_id)
+        if service_id:
+            query = query.where(filter=FieldFilter("affectedServices", "array_contains", service_id))
+        if isinstance(status, (list, tuple)):
+            query = query.where(filter=FieldFilter("status", "in", list(status)))
+        elif status:
+            query = query.where(filter=FieldFilter("status", "==", status))
+        if start:
+            query = query.where(filter=FieldFilter("datetime", ">=", start))
+        if end:
+            query = query.where(filter=FieldFilter("datetime", "<", end))
+        query = query.order_by("datetime", direction=firestore.Query.DESCENDING)
+
+        if cursor:
+            cursor_doc = await self.incidents_ref(org_id).document(cursor).get()
+            if not cursor_doc.exists:
+                raise ValueError("Invalid cursor")
+            query = query.start_after(cursor_doc)
+
+        # Fetch one extra document to know whether another page exists
+        docs = [doc async for doc in query.limit(limit + 1).stream()]
+        page = docs[:limit]
+        incidents = [{**doc.to_dict(), "id": doc.id} for doc in page]
+
+        if include_messages:
+            messages = await asyncio.gather(
+                *(self.list_incident_messages(org_id, incident["id"]) for incident in incidents)
+            )
+            for incident, incident_messages in zip(incidents, messages):
+                incident["messages"] = incident_messages
+
+        next_cursor = page[-1].id if len(docs) > limit else None
+        return incidents, next_cursor
+
+    async def list_resolved_incidents(self, org_id: str, resolved_before: datetime, limit: int) -> list:
+        query = self.incidents_ref(org_id).where(
+            filter=FieldFilter("status", "==", "resolved")
+        ).where(
+            filter=FieldFilter("resolved_at", "<", resolved_before)
+        ).order_by("resolved_at").limit(limit)
+        incidents = [{**doc.to_dict(), "id": doc.id} async for doc in query.stream()]
+        messages = await asyncio.gather(
+            *(self.list_incident_messages(org_id, incident["id"]) for incident in incidents)
+        )
+        for incident, incident_messages in zip(incidents, messages):
+            incident["messages"] = incident_messages
+        return incidents
+
+    async def archive_incidents(self, org_id: str, month: str, part: int, incidents: list, summary: dict):
+        archive_id = month if part == 1 else f"{month}.{part}"
+        writes = [
+            lambda batch: batch.set(self.org_ref(org_id).collection(INCIDENT_ARCHIVE).document(archive_id), {
+                "month": month,
+                "part": part,
+                "incidents": {incident["id"]: incident for incident in incidents},
+            }, merge=True),
+        ]
+        for incident in incidents:
+            incident_ref = self.incidents_ref(org_id).document(incident["id"])
+            writes += [
+                lambda batch, ref=incident_ref.collection(MESSAGES).document(message_id): batch.delete(ref)
+                for message_id in incident.get("messages") or {}
+            ]
+            writes.append(lambda batch, ref=incident_ref: batch.delete(ref))
+        writes.append(lambda batch: batch.set(self.org_ref(org_id), {
+            "incident_archive": {month: summary}
+        }, merge=True))
+
+        # The archive document is written first and the summary last, so a
+        # run interrupted between batches only leaves incidents that the
+        # next run archives again, under the same ids
+        for offset in range(0, len(writes), MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for write in writes[offset:offset + MAX_BATCH_WRITES]:
+                write(batch)
+            await batch.commit()
+
+    async def get_incident_archive(self, org_id: str, month: str) -> list:
+        query = self.org_ref(org_id).collection(INCIDENT_ARCHIVE).where(filter=FieldFilter("month", "==", month))
+        incidents = [
+            incident
+            async for doc in query.stream()
+            for incident in (doc.to_dict().get("incidents") or {}).values()
+        ]
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        incidents.sort(key=lambda incident: incident.get("datetime") or oldest, reverse=True)
+        return incidents
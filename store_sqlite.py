@@ -0,0 +1,458 @@
+"""
+SQLite storage backend, for local development, tests and small single-node
+deployments. Use SQLITE_PATH=":memory:" (or STORAGE_BACKEND=memory) for a
+throwaway in-memory database.
+
+Documents are kept as JSON with the fields that are queried on (incident
+status and time, message and history timestamps, rollup days) copied into
+indexed columns. Datetimes round-trip as timezone-aware UTC datetimes, like
+Firestore timestamps.
+
+Every method runs its statements without awaiting in between, so each one
+is atomic with respect to the other coroutines on the event loop, and
+writes are wrapped in a transaction. Queries are local and indexed, so they
+run on the loop rather than in a thread.
+"""
+import json
+import sqlite3
+from datetime import date, datetime, timezone
+from typing import Optional
+
+import uptime
+from store import NotFound, ServerTimestamp, Store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS organizations (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS services (
+    org_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (org_id, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS incidents (
+    org_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    status TEXT,
+    datetime TEXT,
+    -- Set while the incident is resolved, for the archiver
+    resolved_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (org_id, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS incidents_by_time ON incidents (org_id, datetime DESC, id DESC);
+CREATE INDEX IF NOT EXISTS incidents_by_status_time ON incidents (org_id, status, datetime DESC, id DESC);
+-- One row per (incident, affected service), for the service filter
+CREATE TABLE IF NOT EXISTS incident_services (
+    org_id TEXT NOT NULL,
+    service_id TEXT NOT NULL,
+    incident_id TEXT NOT NULL,
+    status TEXT,
+    datetime TEXT,
+    PRIMARY KEY (org_id, service_id, incident_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS incident_services_by_time
+    ON incident_services (org_id, service_id, datetime DESC, incident_id DESC);
+CREATE INDEX IF NOT EXISTS incident_services_by_status_time
+    ON incident_services (org_id, service_id, status, datetime DESC, incident_id DESC);
+CREATE TABLE IF NOT EXISTS messages (
+    org_id TEXT NOT NULL,
+    incident_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    timestamp TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (org_id, incident_id, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS messages_by_time ON messages (org_id, incident_id, timestamp);
+-- Incidents moved out of the tables above, partitioned by the month they started
+CREATE TABLE IF NOT EXISTS incident_archive (
+    org_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    id TEXT NOT NULL,
+    part INTEGER NOT NULL,
+    datetime TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (org_id, month, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS status_history (
+    id INTEGER PRIMARY KEY,
+    org_id TEXT NOT NULL,
+    service_id TEXT NOT NULL,
+    at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS status_history_by_time ON status_history (org_id, service_id, at);
+-- Alert webhook configs, kept out of organizations.data, which is served to clients
+CREATE TABLE IF NOT EXISTS webhooks (
+    org_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uptime_daily (
+    org_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    service_id TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (org_id, date, service_id, bucket)
+) WITHOUT ROWID;
+"""
+
+
+def sort_key(value) -> Optional[str]:
+    """A datetime as a UTC string that sorts chronologically."""
+    if not isinstance(value, datetime):
+        return None
+    return uptime.as_utc(value).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def resolve(value, now: datetime):
+    """Replace store.SERVER_TIMESTAMP placeholders with the commit time."""
+    if isinstance(value, ServerTimestamp):
+        return now
+    if isinstance(value, dict):
+        return {k: resolve(v, now) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve(v, now) for v in value]
+    return value
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {"$datetime": uptime.as_utc(value).isoformat()}
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _object_hook(value: dict):
+    if len(value) == 1 and "$datetime" in value:
+        return datetime.fromisoformat(value["$datetime"])
+    return value
+
+
+def dumps(value) -> str:
+    return json.dumps(value, default=_default, separators=(",", ":"))
+
+
+def loads(text: str):
+    return json.loads(text, object_hook=_object_hook)
+
+
+class SqliteStore(Store):
+    def __init__(self, path: str = ":memory:"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._index_incident_services()
+        self._index_resolved_at()
+        self._move_webhooks()
+
+    def _index_incident_services(self):
+        """Fill incident_services for incidents written before it existed."""
+        if self.conn.execute("SELECT 1 FROM incident_services LIMIT 1").fetchone() is not None:
+            return
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO incident_services (org_id, service_id, incident_id, status, datetime)"
+                " SELECT incidents.org_id, service.value, incidents.id, incidents.status, incidents.datetime"
+                " FROM incidents, json_each(incidents.data, '$.affectedServices') AS service"
+            )
+
+    def _index_resolved_at(self):
+        """Add and fill incidents.resolved_at in databases created before it existed."""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(incidents)")]
+        with self.conn:
+            if "resolved_at" not in columns:
+                self.conn.execute("ALTER TABLE incidents ADD COLUMN resolved_at TEXT")
+                rows = self.conn.execute("SELECT org_id, id, data FROM incidents WHERE status = 'resolved'")
+                self.conn.executemany(
+                    "UPDATE incidents SET resolved_at = ? WHERE org_id = ? AND id = ?",
+                    [(sort_key(loads(data).get("resolved_at")), org_id, incident_id)
+                     for org_id, incident_id, data in rows.fetchall()],
+                )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS incidents_by_resolved_at ON incidents (org_id, resolved_at)"
+                " WHERE resolved_at IS NOT NULL"
+            )
+
+    def _move_webhooks(self):
+        """Move webhook configs out of organization documents written before the webhooks table."""
+        rows = self.conn.execute(
+            "SELECT id, data FROM organizations WHERE json_extract(data, '$.webhook') IS NOT NULL"
+        ).fetchall()
+        with self.conn:
+            for org_id, data in rows:
+                data = loads(data)
+                self.conn.execute("INSERT OR IGNORE INTO webhooks (org_id, data) VALUES (?, ?)",
+                                  (org_id, dumps(data.pop("webhook"))))
+                self.conn.execute("UPDATE organizations SET data = ? WHERE id = ?", (dumps(data), org_id))
+
+    async def close(self):
+        self.conn.close()
+
+    def _org_exists(self, org_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM organizations WHERE id = ?", (org_id,)).fetchone() is not None
+
+    def _ensure_org(self, org_id: str):
+        self.conn.execute("INSERT OR IGNORE INTO organizations (id) VALUES (?)", (org_id,))
+
+    def _update_service(self, org_id: str, service_id: str, fields: dict, remove=()):
+        row = self.conn.execute(
+            "SELECT data FROM services WHERE org_id = ? AND id = ?", (org_id, service_id)
+        ).fetchone()
+        data = loads(row[0]) if row else {}
+        data.update(fields)
+        for field in remove:
+            data.pop(field, None)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO services (org_id, id, data) VALUES (?, ?, ?)",
+            (org_id, service_id, dumps(data)),
+        )
+
+    async def get_organization(self, org_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT data FROM organizations WHERE id = ?", (org_id,)).fetchone()
+        if row is None:
+            return None
+        services = self.conn.execute("SELECT id, data FROM services WHERE org_id = ?", (org_id,))
+        return {**loads(row[0]), "services": {service_id: loads(data) for service_id, data in services}}
+
+    async def list_organization_ids(self, limit: int, start_after: Optional[str]):
+        rows = self.conn.execute(
+            "SELECT id FROM organizations WHERE id > ? ORDER BY id LIMIT ?", (start_after or "", limit)
+        ).fetchall()
+        ids = [org_id for org_id, in rows]
+        return ids, (ids[-1] if len(ids) == limit else None)
+
+    async def create_service(self, org_id: str, service_data: dict):
+        now = datetime.now(timezone.utc)
+        with self.conn:
+            self._ensure_org(org_id)
+            self._update_service(org_id, service_data["id"], resolve(service_data, now))
+
+    async def apply_status_changes(self, org_id: str, services: dict, history: list, rollups: dict):
+        now = datetime.now(timezone.utc)
+        with self.conn:
+            if not self._org_exists(org_id):
+                raise NotFound(org_id)
+            for service_id, fields in services.items():
+                self._update_service(org_id, service_id, resolve(fields, now))
+            self.conn.executemany(
+                "INSERT INTO status_history (org_id, service_id, at, data) VALUES (?, ?, ?, ?)",
+                [(org_id, entry["serviceId"], sort_key(entry["at"]), dumps(entry)) for entry in history],
+            )
+            self.conn.executemany(
+                "INSERT INTO uptime_daily (org_id, date, service_id, bucket, seconds) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (org_id, date, service_id, bucket) DO UPDATE SET seconds = seconds + excluded.seconds",
+                [
+                    (org_id, key, service_id, bucket, seconds)
+                    for key, day_services in rollups.items()
+                    for service_id, buckets in day_services.items()
+                    for bucket, seconds in buckets.items()
+                ],
+            )
+
+    async def get_uptime_rollups(self, org_id: str, first_day: date) -> dict:
+        rows = self.conn.execute(
+            "SELECT date, service_id, bucket, seconds FROM uptime_daily WHERE org_id = ? AND date >= ?",
+            (org_id, uptime.day_key(first_day)),
+        )
+        rollups = {}
+        for key, service_id, bucket, seconds in rows:
+            rollups.setdefault(key, {}).setdefault(service_id, {})[bucket] = seconds
+        return rollups
+
+    async def set_service_check(self, org_id: str, service_id: str, check: Optional[dict]):
+        now = datetime.now(timezone.utc)
+        with self.conn:
+            if not self._org_exists(org_id):
+                raise NotFound(org_id)
+            if check is None:
+                self._update_service(org_id, service_id, {"updated_at": now}, remove=("check",))
+            else:
+                self._update_service(org_id, service_id, {"check": check, "updated_at": now})
+
+    async def get_webhook(self, org_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT data FROM webhooks WHERE org_id = ?", (org_id,)).fetchone()
+        return loads(row[0]) if row else None
+
+    async def set_webhook(self, org_id: str, webhook: Optional[dict]):
+        with self.conn:
+            if webhook is None:
+                self.conn.execute("DELETE FROM webhooks WHERE org_id = ?", (org_id,))
+            else:
+                self.conn.execute("INSERT OR REPLACE INTO webhooks (org_id, data) VALUES (?, ?)",
+                                  (org_id, dumps(webhook)))
+
+    async def delete_service(self, org_id: str, service_id: str):
+        with self.conn:
+            if not self._org_exists(org_id):
+                raise NotFound(org_id)
+            self.conn.execute("DELETE FROM services WHERE org_id = ? AND id = ?", (org_id, service_id))
+
+    async def create_incident(self, org_id: str, incident_data: dict):
+        incident = {**resolve(incident_data, datetime.now(timezone.utc)), "message_count": 0}
+        datetime_key = sort_key(incident.get("datetime"))
+        with self.conn:
+            self._ensure_org(org_id)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO incidents (org_id, id, status, datetime, resolved_at, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (org_id, incident["id"], incident.get("status"), datetime_key,
+                 sort_key(incident.get("resolved_at")) if incident.get("status") == "resolved" else None,
+                 dumps(incident)),
+            )
+            self.conn.execute(
+                "DELETE FROM incident_services WHERE org_id = ? AND incident_id = ?", (org_id, incident["id"])
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO incident_services (org_id, service_id, incident_id, status, datetime)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (org_id, service_id, incident["id"], incident.get("status"), datetime_key)
+                    for service_id in incident.get("affectedServices") or []
+                ],
+            )
+
+    async def get_incident(self, org_id: str, incident_id: str) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT data FROM incidents WHERE org_id = ? AND id = ?", (org_id, incident_id)
+        ).fetchone()
+        return loads(row[0]) if row else None
+
+    async def add_incident_message(self, org_id: str, incident_id: str, message_data: dict, status: str):
+        now = datetime.now(timezone.utc)
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT data FROM incidents WHERE org_id = ? AND id = ?", (org_id, incident_id)
+            ).fetchone()
+            if row is None:
+                raise NotFound(incident_id)
+            incident = loads(row[0])
+            incident.update({
+                "status": status,
+                "updated_at": now,
+                "message_count": incident.get("message_count", 0) + 1,
+            })
+            # If status is "resolved", add resolved_at timestamp
+            if status == "resolved":
+                incident["resolved_at"] = now
+
+            message = resolve(message_data, now)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO messages (org_id, incident_id, id, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                (org_id, incident_id, message["id"], sort_key(message.get("timestamp")), dumps(message)),
+            )
+            self.conn.execute(
+                "UPDATE incidents SET status = ?, resolved_at = ?, data = ? WHERE org_id = ? AND id = ?",
+                (status, sort_key(now) if status == "resolved" else None, dumps(incident), org_id, incident_id),
+            )
+            self.conn.execute(
+                "UPDATE incident_services SET status = ? WHERE org_id = ? AND incident_id = ?",
+                (status, org_id, incident_id),
+            )
+
+    async def list_incident_messages(self, org_id: str, incident_id: str) -> dict:
+        rows = self.conn.execute(
+            "SELECT id, data FROM messages WHERE org_id = ? AND incident_id = ? ORDER BY timestamp, id",
+            (org_id, incident_id),
+        )
+        return {message_id: loads(data) for message_id, data in rows}
+
+    async def list_incidents(self, org_id: str, status, service_id: Optional[str], start: Optional[datetime],
+                             end: Optional[datetime], limit: int, cursor: Optional[str], include_messages: bool):
+        # With a service filter the query runs on incident_services, whose
+        # indexes lead with (org_id, service_id); otherwise on incidents
+        if service_id:
+            table, id_column = "incident_services", "incident_id"
+            where = ["org_id = ?", "service_id = ?"]
+            params = [org_id, service_id]
+        else:
+            table, id_column = "incidents", "id"
+            where = ["org_id = ?"]
+            params = [org_id]
+        if isinstance(status, (list, tuple)):
+            where.append(f"status IN ({', '.join('?' * len(status))})")
+            params.extend(status)
+        elif status:
+            where.append("status = ?")
+            params.append(status)
+        if start:
+            where.append("datetime >= ?")
+            params.append(sort_key(start))
+        if end:
+            where.append("datetime < ?")
+            params.append(sort_key(end))
+
+        if cursor:
+            row = self.conn.execute(
+                "SELECT datetime FROM incidents WHERE org_id = ? AND id = ?", (org_id, cursor)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Invalid cursor")
+            where.append(f"(datetime < ? OR (datetime = ? AND {id_column} < ?))")
+            params.extend([row[0], row[0], cursor])
+
+        # Fetch one extra row to know whether another page exists
+        rows = self.conn.execute(
+            f"SELECT {id_column} FROM {table} WHERE {' AND '.join(where)}"
+            f" ORDER BY datetime DESC, {id_column} DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        page = [incident_id for incident_id, in rows[:limit]]
+        documents = dict(self.conn.execute(
+            f"SELECT id, data FROM incidents WHERE org_id = ? AND id IN ({', '.join('?' * len(page))})",
+            (org_id, *page),
+        )) if page else {}
+        incidents = [{**loads(documents[incident_id]), "id": incident_id} for incident_id in page]
+
+        if include_messages:
+            for incident in incidents:
+                incident["messages"] = await self.list_incident_messages(org_id, incident["id"])
+
+        next_cursor = page[-1] if len(rows) > limit else None
+        return incidents, next_cursor
+
+    async def list_resolved_incidents(self, org_id: str, resolved_before: datetime, limit: int) -> list:
+        rows = self.conn.execute(
+            "SELECT id, data FROM incidents WHERE org_id = ? AND resolved_at < ? ORDER BY resolved_at LIMIT ?",
+            (org_id, sort_key(resolved_before), limit),
+        ).fetchall()
+        incidents = [{**loads(data), "id": incident_id} for incident_id, data in rows]
+        for incident in incidents:
+            incident["messages"] = await self.list_incident_messages(org_id, incident["id"])
+        return incidents
+
+    async def archive_incidents(self, org_id: str, month: str, part: int, incidents: list, summary: dict):
+        ids = [incident["id"] for incident in incidents]
+        placeholders = ", ".join("?" * len(ids))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO incident_archive (org_id, month, id, part, datetime, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (org_id, month, incident["id"], part, sort_key(incident.get("datetime")), dumps(incident))
+                    for incident in incidents
+                ],
+            )
+            for table, id_column in (("incidents", "id"), ("incident_services", "incident_id"),
+                                     ("messages", "incident_id")):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE org_id = ? AND {id_column} IN ({placeholders})", (org_id, *ids)
+                )
+            row = self.conn.execute("SELECT data FROM organizations WHERE id = ?", (org_id,)).fetchone()
+            data = loads(row[0]) if row else {}
+            data.setdefault("incident_archive", {})[month] = summary
+            self.conn.execute(
+                "INSERT OR REPLACE INTO organizations (id, data) VALUES (?, ?)", (org_id, dumps(data))
+            )
+
+    async def get_incident_archive(self, org_id: str, month: str) -> list:
+        rows = self.conn.execute(
+            "SELECT data FROM incident_archive WHERE org_id = ? AND month = ? ORDER BY datetime DESC, id DESC",
+            (org_id, month),
+        )
+        return [loads(data) for data, in rows]
@@ -0,0 +1,113 @@
+"""
+Uptime accounting for services.
+
+Every status transition credits the time spent in the previous status to
+per-day buckets (seconds operational / degraded / down). Reading uptime for a
+window then only touches one rollup per day, plus the still-open interval of
+each service's current status, which is added in memory.
+"""
+import re
+from datetime import date, datetime, time, timedelta, timezone
+
+BUCKETS = ("operational", "degraded", "down")
+# Incident archive partitions ("YYYY-MM"), as written by the archiver and read back by the API
+MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+def status_bucket(status: str) -> str:
+    """Map a service status onto one of the uptime buckets."""
+    if status in ("operational", "degraded"):
+        return status
+    # partial_outage, major_outage and anything unknown count as down
+    return "down"
+
+
+def as_utc(value) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def split_by_day(start: datetime, end: datetime) -> list:
+    """Split [start, end) into (day, seconds) pieces along UTC midnights."""
+    start, end = as_utc(start), as_utc(end)
+    pieces = []
+    while start < end:
+        next_midnight = datetime.combine(start.date() + timedelta(days=1), time.min, tzinfo=timezone.utc)
+        piece_end = min(end, next_midnight)
+        pieces.append((start.date(), (piece_end - start).total_seconds()))
+        start = piece_end
+    return pieces
+
+
+def day_key(day: date) -> str:
+    return day.isoformat()
+
+
+def month_key(value: datetime) -> str:
+    return as_utc(value).strftime("%Y-%m")
+
+
+def status_since(service: dict):
+    """When the service entered its current status, if known."""
+    for field in ("status_since", "updated_at", "created_at"):
+        if isinstance(service.get(field), datetime):
+            return service[field]
+    return None
+
+
+def summarize(services: dict, rollups: dict, days: int, now: datetime = None) -> list:
+    """
+    Build per-service uptime for the last `days` days (today included).
+    `rollups` maps "YYYY-MM-DD" to {serviceId: {bucket: seconds}}.
+    Days without any observation are reported with status "unknown".
+    """
+    now = as_utc(now or datetime.now(timezone.utc))
+    window = [now.date() - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    window_start = datetime.combine(window[0], time.min, tzinfo=timezone.utc)
+
+    result = []
+    for service_id, service in services.items():
+        # Seconds per day and bucket from the rollups
+        totals = {
+            day: dict(rollups.get(day_key(day), {}).get(service_id, {}))
+            for day in window
+        }
+
+        # Credit the current, still open, status interval
+        since = status_since(service)
+        if since is not None:
+            bucket = status_bucket(service.get("status"))
+            for day, seconds in split_by_day(max(as_utc(since), window_start), now):
+                if day in totals:
+                    totals[day][bucket] = totals[day].get(bucket, 0) + seconds
+
+        data = []
+        observed_total = down_total = 0
+        for day in window:
+            seconds = totals[day]
+            observed = sum(seconds.get(b, 0) for b in BUCKETS)
+            observed_total += observed
+            down_total += seconds.get("down", 0)
+            if not observed:
+                day_status = "unknown"
+            elif seconds.get("down"):
+                day_status = "down"
+            elif seconds.get("degraded"):
+                day_status = "degraded"
+            else:
+                day_status = "operational"
+            data.append({
+                "timestamp": day_key(day),
+                "status": day_status,
+                "uptime": round(100 * (observed - seconds.get("down", 0)) / observed, 3) if observed else None,
+            })
+
+        result.append({
+            "id": service_id,
+            "name": service.get("name"),
+            "status": service.get("status"),
+            "uptime": round(100 * (observed_total - down_total) / observed_total, 3) if observed_total else None,
+            "data": data,
+        })
+    return result
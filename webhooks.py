@@ -0,0 +1,288 @@
+"""
+Alert webhooks: monitoring systems post alerts for an organization, which
+turn into service status changes and incidents.
+
+Each organization gets its own secret from POST /webhooks/secret. Senders
+either sign the raw body,
+
+    X-Status24-Signature: t=<unix time>,v1=<hex HMAC-SHA256(secret, "<t>.<body>")>
+
+or, for tools that can only set a static header (Prometheus Alertmanager),
+send the secret itself as "Authorization: Bearer <secret>".
+
+The endpoint takes Alertmanager's payload ({"alerts": [...]}) or generic
+events (one object or a list) with fingerprint/id, status
+("firing"/"resolved"), title, description, service, service_status or
+severity and starts_at. Accepted alerts are only queued (see
+alert_queue.py) and the answer is 202; 503 with Retry-After means the
+queue is full and the sender should retry.
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timezone
+
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
+from pydantic import BaseModel
+
+import store
+from alert_queue import alert_queue, QueueFull
+from org import verify_org_member
+from status_page import SERVICE_STATUS_SEVERITY
+
+router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
+
+# Signed requests older (or newer) than this are refused, so a captured
+# request cannot be replayed later
+WEBHOOK_SIGNATURE_TOLERANCE = int(os.getenv("WEBHOOK_SIGNATURE_TOLERANCE", "300"))
+WEBHOOK_MAX_BYTES = int(os.getenv("WEBHOOK_MAX_BYTES", str(1024 * 1024)))
+WEBHOOK_MAX_ALERTS = int(os.getenv("WEBHOOK_MAX_ALERTS", "1000"))
+# How long a looked-up secret is trusted; rotating it here updates this process at once
+WEBHOOK_SECRET_TTL = float(os.getenv("WEBHOOK_SECRET_TTL", "60"))
+WEBHOOK_RETRY_AFTER = int(os.getenv("WEBHOOK_RETRY_AFTER", "5"))
+
+# Status a firing alert sets on its service, by severity label
+SEVERITY_STATUS = {
+    "critical": "major_outage",
+    "page": "major_outage",
+    "error": "partial_outage",
+    "major": "partial_outage",
+    "warning": "degraded",
+    "minor": "degraded",
+    "info": None,
+    "none": None,
+}
+DEFAULT_SERVICE_STATUS = "partial_outage"
+_EXTRA_FRACTION = re.compile(r"(\.\d{6})\d+")
+
+_secrets = TTLCache(maxsize=10000, ttl=WEBHOOK_SECRET_TTL)
+
+
+async def webhook_secret(org_id: str):
+    """The organization's webhook secret, or None if it has none."""
+    if org_id in _secrets:
+        return _secrets[org_id]
+    secret = ((await store.get_webhook(org_id)) or {}).get("secret")
+    _secrets[org_id] = secret
+    return secret
+
+
+def verify_signature(secret: str, body: bytes, header: str, now: float = None) -> bool:
+    fields = [part.strip().split("=", 1) for part in header.split(",") if "=" in part]
+    timestamps = [value for key, value in fields if key == "t"]
+    if len(timestamps) != 1 or not timestamps[0].isdigit():
+        return False
+    if abs((now or time.time()) - int(timestamps[0])) > WEBHOOK_SIGNATURE_TOLERANCE:
+        return False
+    expected = hmac.new(secret.encode(), timestamps[0].encode() + b"." + body, hashlib.sha256).hexdigest()
+    # Several v1 entries let senders sign with the old and new secret while rotating
+    return any(hmac.compare_digest(expected, value) for key, value in fields if key == "v1")
+
+
+def payload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Payloads are limited to {WEBHOOK_MAX_BYTES} bytes"
+    )
+
+
+async def read_body(request: Request) -> bytes:
+    """The request body, refused with 413 before more than WEBHOOK_MAX_BYTES are read."""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > WEBHOOK_MAX_BYTES:
+        raise payload_too_large()
+    # Content-Length may be missing (chunked) or wrong, so count as it arrives
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > WEBHOOK_MAX_BYTES:
+            raise payload_too_large()
+    return bytes(body)
+
+
+def parse_time(value) -> datetime:
+    try:
+        when = datetime.fromisoformat(_EXTRA_FRACTION.sub(r"\1", value))
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc)
+    # Alertmanager sends year 1 for "unknown"
+    if when.year < 1970:
+        return datetime.now(timezone.utc)
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+
+def normalize_alert(alert: dict, common: dict) -> dict:
+    """One alert as queued: {"fingerprint", "status", "starts_at", "started", "title", ...}."""
+    if not isinstance(alert, dict):
+        raise ValueError("Every alert must be an object")
+    labels = {**(common.get("commonLabels") or {}), **(alert.get("labels") or {})}
+    annotations = {**(common.get("commonAnnotations") or {}), **(alert.get("annotations") or {})}
+
+    def field(*names):
+        for source in (alert, annotations, labels):
+            for name in names:
+                value = source.get(name)
+                if value not in (None, ""):
+                    return str(value)
+        return None
+
+    alert_status = (field("status") or common.get("status") or "firing").lower()
+    if alert_status not in ("firing", "resolved"):
+        raise ValueError(f"Unknown alert status: {alert_status}")
+    # Alertmanager fingerprints each label set; otherwise the labels themselves identify the alert
+    fingerprint = field("fingerprint", "id", "idempotency_key") or hashlib.sha256(
+        json.dumps(labels, sort_keys=True).encode()).hexdigest()[:16]
+    if not labels and not field("fingerprint", "id", "idempotency_key", "title", "summary", "alertname"):
+        raise ValueError("An alert needs an id, a fingerprint, labels or a title")
+
+    service_status = field("service_status", "serviceStatus")
+    if service_status is None:
+        severity = (field("severity") or "").lower()
+        service_status = SEVERITY_STATUS.get(severity, DEFAULT_SERVICE_STATUS)
+    elif service_status not in SERVICE_STATUS_SEVERITY:
+        raise ValueError(f"Unknown service status: {service_status}")
+
+    starts_at = field("startsAt", "starts_at") or ""
+    return {
+        "fingerprint": fingerprint,
+        "status": alert_status,
+        "starts_at": starts_at,
+        "started": parse_time(starts_at),
+        "title": field("title", "summary", "alertname") or "Alert",
+        "description": field("description", "message") or "",
+        "service_id": field("service_id", "serviceId", "service"),
+        "service_status": service_status,
+    }
+
+
+def parse_alerts(payload) -> list:
+    """Alerts from an Alertmanager payload, a generic event, or a list of events."""
+    if isinstance(payload, dict) and isinstance(payload.get("alerts"), list):
+        alerts, common = payload["alerts"], payload
+    elif isinstance(payload, list):
+        alerts, common = payload, {}
+    elif isinstance(payload, dict):
+        alerts, common = [payload], {}
+    else:
+        raise ValueError("Expected an object or a list of alerts")
+    if len(alerts) > WEBHOOK_MAX_ALERTS:
+        raise OverflowError(f"At most {WEBHOOK_MAX_ALERTS} alerts per request")
+    return [normalize_alert(alert, common) for alert in alerts]
+
+
+@router.post("/{org_id}/alerts", status_code=status.HTTP_202_ACCEPTED)
+async def receive_alerts(
+    org_id: str,
+    request: Request,
+    authorization: str = Header(None),
+    x_status24_signature: str = Header(None),
+    idempotency_key: str = Header(None),
+):
+    """
+    Queue alerts for the organization and answer at once; they are applied
+    within moments. Repeated alerts and repeated Idempotency-Keys are
+    acknowledged but not applied again.
+    """
+    body = await read_body(request)
+
+    secret = await webhook_secret(org_id)
+    if x_status24_signature:
+        authorized = secret is not None and verify_signature(secret, body, x_status24_signature)
+    else:
+        parts = (authorization or "").split(" ")
+        authorized = (
+            secret is not None and len(parts) == 2 and parts[0].lower() == "bearer"
+            and hmac.compare_digest(parts[1].encode(), secret.encode())
+        )
+    if not authorized:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing webhook signature"
+        )
+
+    try:
+        alerts = parse_alerts(json.loads(body))
+    except OverflowError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid alert payload: {str(e)}"
+        )
+
+    try:
+        accepted, duplicates = alert_queue.offer(org_id, alerts, idempotency_key)
+    except QueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Alert queue is full, please retry.",
+            headers={"Retry-After": str(WEBHOOK_RETRY_AFTER)}
+        )
+    return {"status": "accepted", "accepted": accepted, "duplicates": duplicates}
+
+
+class WebhookSecretRequest(BaseModel):
+    organizationId: str
+
+
+def check_member(org_membership: dict, org_id: str):
+    if org_membership.get("organization", {}).get("id") != org_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not authorized to manage webhooks of this organization"
+        )
+
+
+@router.post("/secret")
+async def create_webhook_secret(
+    payload: WebhookSecretRequest,
+    org_membership: dict = Depends(verify_org_member)
+):
+    """
+    Create or rotate the organization's webhook secret. The previous secret
+    stops working at once; the new one is only shown in this response.
+    """
+    check_member(org_membership, payload.organizationId)
+    secret = secrets.token_urlsafe(32)
+    try:
+        await store.set_webhook(payload.organizationId, {
+            "secret": secret,
+            "created_at": datetime.now(timezone.utc),
+        })
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save webhook secret: {str(e)}"
+        )
+    _secrets[payload.organizationId] = secret
+    return {
+        "status": "success",
+        "secret": secret,
+        "url": f"/webhooks/{payload.organizationId}/alerts",
+    }
+
+
+@router.delete("/secret")
+async def delete_webhook_secret(
+    payload: WebhookSecretRequest,
+    org_membership: dict = Depends(verify_org_member)
+):
+    """Disable the organization's alert webhook."""
+    check_member(org_membership, payload.organizationId)
+    try:
+        await store.set_webhook(payload.organizationId, None)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete webhook secret: {str(e)}"
+        )
+    _secrets[payload.organizationId] = None
+    return {"status": "success"}